@@ -1,11 +1,13 @@
 #-*- coding:utf-8 -*-
 from setting_data import SettingData
 from line_extraction import LineExtraction
+from batch_engine import BatchEngine
+from result_cache import ResultCache
+from image_io import EncodeSetting
+from job_manifest import JobManifest
+from scanner import FileScanner, ScanThread, has_entry
 
-import os, sys, glob
-import cv2
-import numpy as np
-from PIL import Image
+import os, sys, time
 
 from PySide6.QtWidgets import *
 from PySide6.QtCore import *
@@ -15,15 +17,17 @@ from PySide6.QtGui import *
 class EmitObject():
     """ Emitで渡すオブジェクトクラス
     """
-    def __init__(self, file_name=str, pre_img=QPixmap):
+    def __init__(self, file_name=str, error=None, nbytes=0):
         """ コンストラクタ
 
             Args:
                 file_name (str)  : ファイル名
-                pre_img (QPixmap): プレビュー用画像
+                error (str)      : エラー内容(正常時はNone)
+                nbytes (int)     : 読み込んだ変換画像のバイト数(読み込みを省略した場合は0)
         """
         self.file_name = file_name
-        self.pre_img   = pre_img
+        self.error     = error
+        self.nbytes    = nbytes
 
 
     def get_file_name(self):
@@ -34,13 +38,22 @@ class EmitObject():
         """
         return self.file_name
 
-    def get_pre_img(self):
-        """ プレビュー画像を取得する関数
+    def get_error(self):
+        """ エラー内容を取得する関数
 
             Returns:
-                pre_img (QPixmap): プレビュー用画像
+                error (str): エラー内容(正常時はNone)
         """
-        return self.pre_img
+        return self.error
+
+
+    def get_nbytes(self):
+        """ 読み込んだ変換画像のバイト数を取得する関数
+
+            Returns:
+                nbytes (int): バイト数
+        """
+        return self.nbytes
 
 
 class BatchGui(QDialog):
@@ -48,12 +61,23 @@ class BatchGui(QDialog):
     """
     TITLE = "一括処理"
     WINDOW_WIDTH    = 420
-    WINDOW_HEIGHT   = 260
+    WINDOW_HEIGHT   = 385
     PREVIEW_WIDTH   = 160
     PREVIEW_HEIGHT  = 90
     TEXT_BOX_WIDTH  = 230
     TEXT_BOX_HEIGHT = 90
     PB_WIDTH        = 380
+    CACHE_DIR       = "cache" # 変換結果のキャッシュフォルダ(実行ファイルと同じ階層)
+    PREVIEW_INTERVAL = 100 # プレビューと進捗を更新する間隔(ms)
+    LOG_MAX_ROWS    = 1000 # ログに残す最大行数(超えた分は古い行から削除)
+    # 保存形式の表示名 → 保存形式(EncodeSetting.set_format)
+    FORMAT_DICT = {
+        "PNG"              : "png",
+        "PNG(1/2/4bit)"    : "png_packed",
+        "TIFF(白黒2値 G4)" : "tiff_g4",
+        "WebP(可逆圧縮)"   : "webp",
+        "PGM(無圧縮)"      : "pgm",
+    }
 
 
     def __init__(self, parent=QDialog):
@@ -62,7 +86,17 @@ class BatchGui(QDialog):
         super(BatchGui, self).__init__(parent)
 
         self.setting_data = None
+        self.preset_dict  = {} # 設定名 → 設定値オブジェクトの辞書(保存されている設定値)
+        self.preset_list  = [] # 複数の設定値で変換する場合に選択した設定名のリスト
         self.my_dir_path  = os.path.abspath(os.path.dirname(sys.argv[0]))
+        self.line_extraction = LineExtraction() # プレビュー変換用オブジェクト
+        self.pre_img      = None # まだ表示していない最新のプレビュー画像(縮小済みの変換後画像)
+        self.total_num    = 0   # 変換する全件数(ファイル数×設定数)
+        self.total_flg    = False # 全件数が確定したかどうか(走査中はFalse)
+        self.done_num     = 0   # 完了件数(失敗を含む)
+        self.error_num    = 0   # 失敗件数
+        self.done_nbytes  = 0   # 読み込んだ変換画像の合計バイト数
+        self.start_time   = 0.0 # 一括処理の開始時刻(time.perf_counter)
 
         # Widgetsの設定(タイトル、固定横幅、固定縦幅)
         self.setWindowTitle(self.TITLE)
@@ -89,6 +123,28 @@ class BatchGui(QDialog):
         save_layout.addWidget(self.save_path, 5)
         save_layout.addWidget(self.save_select_button, 1)
 
+        # 設定値部分(複数選択した場合は設定ごとに保存フォルダ/設定名に保存)
+        preset_layout = QHBoxLayout()
+        self.preset_label = QLineEdit("")
+        self.preset_label.setEnabled(False) # テキスト入力を禁止
+        self.preset_select_button = QPushButton("選択")
+        self.preset_select_button.clicked.connect(self.preset_dialog)
+        preset_layout.addWidget(QLabel("設定:"), 1)
+        preset_layout.addWidget(self.preset_label, 5)
+        preset_layout.addWidget(self.preset_select_button, 1)
+        self.set_preset_list([])
+
+        # 保存形式部分
+        format_layout = QHBoxLayout()
+        self.format_combo = QComboBox()
+        self.format_combo.addItems(list(self.FORMAT_DICT))
+        self.format_combo.setToolTip("1/2/4bitのPNGとTIFFは、変換後画像の濃淡が多い場合やカラーの場合は8bitで保存する")
+        self.profile_checkbox = QCheckBox("処理時間")
+        self.profile_checkbox.setToolTip("変換の段階ごとの処理時間を記録して、終了時にログに表示する(複数の設定で変換する場合は記録しない)")
+        format_layout.addWidget(QLabel("保存形式:"), 1)
+        format_layout.addWidget(self.format_combo, 4)
+        format_layout.addWidget(self.profile_checkbox, 2)
+
         # 画像プレビュー・テキストボックス部分
         img_layout = QHBoxLayout()
         self.img_label = QLabel()
@@ -110,13 +166,38 @@ class BatchGui(QDialog):
         self.pb.setTextVisible(False)
         pb_layput.addWidget(self.pb)
 
+        # 進捗部分(完了件数/全件数、処理速度、残り時間)
+        self.progress_label = QLabel("")
+
         # ボタン部分
         batch_btn_layout = QHBoxLayout()
+        self.worker_sp = QSpinBox()
+        self.worker_sp.setRange(1, os.cpu_count() or 1)
+        self.worker_sp.setValue(os.cpu_count() or 1)
         self.batch_button = QPushButton("一括処理開始")
         self.batch_button.clicked.connect(self.batch_line_extraction)
-        batch_btn_layout.addWidget(QLabel(""), 1)
-        batch_btn_layout.addWidget(self.batch_button, 1)
-        batch_btn_layout.addWidget(QLabel(""), 1)
+        batch_btn_layout.addWidget(QLabel("並列数:"), 1)
+        batch_btn_layout.addWidget(self.worker_sp, 1)
+        self.cache_checkbox = QCheckBox("キャッシュ")
+        self.cache_checkbox.setToolTip("同じ画像を同じ設定値で変換した結果があれば再変換せずに使用する")
+        batch_btn_layout.addWidget(self.batch_button, 2)
+        batch_btn_layout.addWidget(self.cache_checkbox, 2)
+
+        # 中止・一時停止部分
+        control_layout = QHBoxLayout()
+        self.recursive_checkbox = QCheckBox("サブフォルダ")
+        self.recursive_checkbox.setToolTip("サブフォルダの画像も変換して、保存フォルダに同じフォルダ構成で保存する")
+        self.resume_checkbox = QCheckBox("続きから")
+        self.resume_checkbox.setToolTip("保存フォルダの" + JobManifest.MANIFEST_FILE + "に記録された変換済みのファイルを飛ばして変換する")
+        self.pause_button = QPushButton("一時停止")
+        self.pause_button.clicked.connect(self.pause_process)
+        self.cancel_button = QPushButton("中止")
+        self.cancel_button.clicked.connect(self.cancel_process)
+        control_layout.addWidget(self.recursive_checkbox, 2)
+        control_layout.addWidget(self.resume_checkbox, 2)
+        control_layout.addWidget(self.pause_button, 2)
+        control_layout.addWidget(self.cancel_button, 2)
+        self.set_control_enabled(False)
 
         # レイアウトを作成して各要素を配置
         layout = QVBoxLayout()
@@ -124,26 +205,41 @@ class BatchGui(QDialog):
         layout.addSpacing(6)
         layout.addLayout(save_layout)
         layout.addSpacing(6)
+        layout.addLayout(preset_layout)
+        layout.addSpacing(6)
+        layout.addLayout(format_layout)
+        layout.addSpacing(6)
         layout.addLayout(img_layout)
         layout.addSpacing(6)
         layout.addLayout(pb_layput)
+        layout.addWidget(self.progress_label)
         layout.addSpacing(6)
         layout.addLayout(batch_btn_layout)
+        layout.addLayout(control_layout)
 
         # レイアウトを画面に設定
         self.setLayout(layout)
 
         # 一括実行プロセスの準備
         self.rp = RunProcess()
+        self.rp.total_thread.connect(self.set_total_num)
         self.rp.process_thread.connect(self.update_log)
+        self.rp.preview_thread.connect(self.set_preview)
         self.rp.finished.connect(self.show_result)
 
+        # プレビューと進捗の更新用タイマー(最新のプレビュー画像だけをGUIスレッドでQPixmapにする)
+        self.preview_timer = QTimer(self)
+        self.preview_timer.setInterval(self.PREVIEW_INTERVAL)
+        self.preview_timer.timeout.connect(self.update_preview)
+        self.preview_timer.timeout.connect(self.update_progress)
+
 
     def clear_pre_log(self):
         """ プレビューとログ部分をクリアする関数
         """
         self.img_label.clear()
         self.text_list.removeRows(0, self.text_list.rowCount())
+        self.progress_label.setText("")
 
 
     def set_setting_data(self, setting_data=SettingData):
@@ -155,6 +251,64 @@ class BatchGui(QDialog):
         self.setting_data = setting_data
 
 
+    def set_preset_dict(self, preset_dict):
+        """ 保存されている設定値を設定する関数(選択済みの設定名のうち存在しないものは外す)
+
+            Args:
+                preset_dict (dict): 設定名 → 設定値オブジェクトの辞書
+        """
+        self.preset_dict = preset_dict
+        self.set_preset_list([preset for preset in self.preset_list if preset in preset_dict])
+
+
+    def set_preset_list(self, preset_list):
+        """ 複数の設定値で変換する場合の設定名を設定する関数
+
+            Args:
+                preset_list (list): 設定名のリスト(2件未満の場合は現在の設定値のみで変換)
+        """
+        if len(preset_list) < 2:
+            preset_list = []
+
+        self.preset_list = preset_list
+        if len(preset_list) == 0:
+            self.preset_label.setText("現在の設定値")
+        else:
+            self.preset_label.setText(", ".join(preset_list))
+
+
+    def preset_dialog(self):
+        """ 複数の設定値で変換する場合の設定名を選択するダイアログを表示する関数
+        """
+        dialog = QDialog(self)
+        dialog.setWindowTitle("設定選択")
+
+        list_widget = QListWidget()
+        for preset in self.preset_dict:
+            item = QListWidgetItem(preset)
+            item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+            item.setCheckState(Qt.CheckState.Checked if preset in self.preset_list else Qt.CheckState.Unchecked)
+            list_widget.addItem(item)
+
+        button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        button_box.accepted.connect(dialog.accept)
+        button_box.rejected.connect(dialog.reject)
+
+        layout = QVBoxLayout()
+        layout.addWidget(QLabel("2つ以上選択すると、画像を1回だけ読み込んで設定ごとに変換します。"))
+        layout.addWidget(list_widget)
+        layout.addWidget(button_box)
+        dialog.setLayout(layout)
+
+        if dialog.exec() == QDialog.DialogCode.Accepted:
+            preset_list = []
+            for i in range(list_widget.count()):
+                item = list_widget.item(i)
+                if item.checkState() == Qt.CheckState.Checked:
+                    preset_list.append(item.text())
+            self.set_preset_list(preset_list)
+
+
     def set_close_fnc(self, func, pre_flg, save_flg):
         """ 設定値のオブジェクトを設定する関数
 
@@ -174,6 +328,10 @@ class BatchGui(QDialog):
             Args:
                 event (event) : イベント
         """
+        # 実行中の一括処理は中止して、変換中のファイルの完了を待つ
+        if self.rp.isRunning():
+            self.rp.cancel()
+            self.rp.wait()
         self.func(True, self.pre_flg, self.save_flg)
 
 
@@ -234,8 +392,8 @@ class BatchGui(QDialog):
             QMessageBox.warning(self, "注意", save_path + " フォルダが存在しません。存在するフォルダを選択してください。")
             return
 
-        # 保存フォルダ内のチェック
-        if len(glob.glob(save_path + "/*")) > 0:
+        # 保存フォルダ内のチェック(続きから変換する場合は確認しない)
+        if (not self.resume_checkbox.isChecked()) and has_entry(save_path):
             ok_button = QMessageBox.StandardButton.Ok
             cancel_button = QMessageBox.StandardButton.Cancel
             result = QMessageBox.warning(self, "注意", "保存フォルダ内に同名ファイルが存在する場合、上書きされますがよろしいですか？", ok_button, cancel_button)
@@ -247,14 +405,37 @@ class BatchGui(QDialog):
         self.rp.set_target_path(target_path)
         self.rp.set_save_path(save_path)
         self.rp.set_pre_size(self.PREVIEW_WIDTH, self.PREVIEW_HEIGHT)
+        self.rp.set_worker_num(self.worker_sp.value())
+        self.rp.set_preset_dict({preset: self.preset_dict[preset] for preset in self.preset_list})
+        self.rp.set_resume_flg(self.resume_checkbox.isChecked())
+        self.rp.set_recursive_flg(self.recursive_checkbox.isChecked())
+        self.rp.set_profile_flg(self.profile_checkbox.isChecked())
+        encode_setting = EncodeSetting()
+        encode_setting.set_format(self.FORMAT_DICT[self.format_combo.currentText()])
+        self.rp.set_encode_setting(encode_setting)
+        if self.cache_checkbox.isChecked():
+            self.rp.set_cache(ResultCache(os.path.join(self.my_dir_path, self.CACHE_DIR)))
+        else:
+            self.rp.set_cache(None)
 
         # ボタン非活性化
         self.set_all_enabled(False)
+        self.set_control_enabled(True)
 
-        # プログレスバーの開始
+        # プログレスバーの開始(全件数が分かるまでは0/0で動かし続ける)
         self.pb.setMinimum(0)
         self.pb.setMaximum(0)
-
+        self.pb.setValue(0)
+
+        self.pre_img     = None
+        self.total_num   = 0
+        self.total_flg   = False
+        self.done_num    = 0
+        self.error_num   = 0
+        self.done_nbytes = 0
+        self.start_time  = time.perf_counter()
+        self.progress_label.setText("変換対象を確認中...")
+        self.preview_timer.start()
         self.rp.start() # 一括処理実行
 
 
@@ -266,36 +447,168 @@ class BatchGui(QDialog):
         """
         self.target_select_button.setEnabled(flg)
         self.save_select_button.setEnabled(flg)
+        self.preset_select_button.setEnabled(flg)
         self.batch_button.setEnabled(flg)
+        self.worker_sp.setEnabled(flg)
+        self.cache_checkbox.setEnabled(flg)
+        self.resume_checkbox.setEnabled(flg)
+        self.recursive_checkbox.setEnabled(flg)
+        self.format_combo.setEnabled(flg)
+        self.profile_checkbox.setEnabled(flg)
+
+
+    def set_control_enabled(self, flg):
+        """ 一時停止・中止ボタンの有効/無効を設定する関数
+
+            Args:
+                flg (bool): True/有効化、False/無効化
+        """
+        self.pause_button.setText("一時停止")
+        self.pause_button.setEnabled(flg)
+        self.cancel_button.setEnabled(flg)
+
+
+    def pause_process(self):
+        """ 一括処理を一時停止または再開する関数
+        """
+        if self.rp.is_paused():
+            self.rp.resume()
+            self.pause_button.setText("一時停止")
+        else:
+            self.rp.pause()
+            self.pause_button.setText("再開")
+
+
+    def cancel_process(self):
+        """ 一括処理を中止する関数(変換中のファイルの完了を待って終了する)
+        """
+        self.rp.cancel()
+        self.set_control_enabled(False)
+        self.progress_label.setText("中止しています...")
+
+
+    def set_total_num(self, total_num, total_flg):
+        """ 変換する全件数を設定してプログレスバーを進捗表示にする関数
+
+            Args:
+                total_num (int) : 全件数(ファイル数×設定数、走査中はこれまでに見つかった件数)
+                total_flg (bool): 全件数が確定したかどうか
+        """
+        self.total_num = total_num
+        self.total_flg = total_flg
+        self.pb.setMaximum(max(total_num, 1))
+        self.update_progress()
 
 
     def update_log(self, emit_obj=EmitObject):
-        """ ログを表示させてプレビューも更新する関数
+        """ ログに1行追加して完了件数を数える関数(進捗の表示はupdate_progressでまとめて行う)
 
             Args:
                 emit_obj (EmitObject): Emitで受け取るオブジェクト
         """
-        # プレビューを更新
-        self.img_label.setPixmap(emit_obj.get_pre_img())
-        
-        # ログ表示を更新
-        log_list = self.text_list.stringList()
-        log_list.append("saved: " + emit_obj.get_file_name())
-        self.text_list.setStringList(log_list)
+        self.done_num += 1
+        self.done_nbytes += emit_obj.get_nbytes()
+
+        if emit_obj.get_error() is None:
+            log_str = "saved: " + emit_obj.get_file_name()
+        else:
+            self.error_num += 1
+            log_str = "error: " + emit_obj.get_file_name()
+        self.add_log(log_str)
+
+
+    def add_log(self, log_str):
+        """ ログに1行追加する関数
+
+            Args:
+                log_str (str): 追加する文字列
+        """
+        # 一覧全体を作り直さずに末尾へ1行追加し、上限を超えた古い行は削除する
+        row = self.text_list.rowCount()
+        self.text_list.insertRows(row, 1)
+        self.text_list.setData(self.text_list.index(row), log_str)
+        if row + 1 > self.LOG_MAX_ROWS:
+            self.text_list.removeRows(0, row + 1 - self.LOG_MAX_ROWS)
         self.textbox.scrollToBottom()
 
 
+    def show_profile(self):
+        """ 直前の一括処理の段階ごとの処理時間をログに追加する関数
+        """
+        for name, counter_dict in self.rp.profile_dict.items():
+            count = counter_dict["count"]
+            seconds = counter_dict["seconds"]
+            self.add_log("profile: " + name + " " + str(count) + "件 " + "{:.3f}".format(seconds) + "秒 "
+                         + "(1件 " + "{:.1f}".format(seconds / max(count, 1) * 1000) + "ms)")
+
+
+    def update_progress(self):
+        """ プログレスバーと完了件数、処理速度、残り時間の表示を更新する関数
+        """
+        if self.pb.maximum() == 0:
+            return # 全件数が分かるまでは表示しない
+
+        self.pb.setValue(self.done_num)
+
+        elapsed_time = time.perf_counter() - self.start_time
+        progress_str = str(self.done_num) + "/" + str(self.total_num)
+        if not self.total_flg:
+            progress_str += "+" # 走査中
+        if self.error_num > 0:
+            progress_str += " (失敗 " + str(self.error_num) + ")"
+
+        if (self.done_num > 0) and (elapsed_time > 0):
+            img_rate = self.done_num / elapsed_time
+            progress_str += "  {:.1f} 枚/秒  {:.1f} MB/秒".format(img_rate, self.done_nbytes / elapsed_time / (1024 * 1024))
+            # 残り時間は全件数が確定してから表示する
+            if self.total_flg:
+                remain_time = int(max(self.total_num - self.done_num, 0) / img_rate)
+                progress_str += "  残り {}:{:02d}".format(remain_time // 60, remain_time % 60)
+        self.progress_label.setText(progress_str)
+
+
+    def set_preview(self, pre_img):
+        """ 最新のプレビュー画像を保持する関数(表示はupdate_previewでまとめて行う)
+
+            Args:
+                pre_img (img): 縮小済みの変換後画像
+        """
+        self.pre_img = pre_img
+
+
+    def update_preview(self):
+        """ 最新のプレビュー画像があればQPixmapに変換して表示する関数
+        """
+        if self.pre_img is None:
+            return
+
+        self.img_label.setPixmap(self.line_extraction.get_qpixmap(self.pre_img, self.PREVIEW_WIDTH, self.PREVIEW_HEIGHT))
+        self.pre_img = None
+
+
     def show_result(self):
         """ 書き込み結果を表示する関数
         """
-        if self.rp.error is None:
+        # 最後のプレビューと進捗を表示してタイマーを停止
+        self.preview_timer.stop()
+        self.update_preview()
+        self.update_progress()
+        self.set_control_enabled(False)
+        if self.profile_checkbox.isChecked():
+            self.show_profile()
+
+        if not self.isVisible():
+            pass # 画面を閉じて中止した場合は結果を表示しない
+        elif self.rp.cancel_flg:
+            QMessageBox.information(self, "中止", "一括処理を中止しました。\n\n「続きから」にチェックを入れて実行すると、変換済みのファイルを飛ばして再開できます。")
+        elif self.rp.error is None:
             QMessageBox.information(self, "正常終了", self.save_path.text() + " に一括変換した画像を保存しました。")
         else:
             QMessageBox.warning(self, "注意", "変換に失敗しました。\n\n" + self.rp.error)
 
         # プログレスバーの停止
         self.pb.setMinimum(0)
-        self.pb.setMaximum(100)
+        self.pb.setMaximum(max(self.total_num, 1))
 
         # ボタン活性化
         self.set_all_enabled(True)
@@ -304,8 +617,12 @@ class BatchGui(QDialog):
 class RunProcess(QThread):
     """ 一括処理を実行するプロセスクラス
     """
+    total_thread   = Signal(int, bool) # 変換する全件数(ファイル数×設定数)、全件数が確定したかどうか
     process_thread = Signal(EmitObject)
+    preview_thread = Signal(object) # 縮小済みの変換後画像(ndarray)
     error = None
+    cancel_flg = False # 直前の一括処理が中止されたかどうか
+    PREVIEW_INTERVAL = 0.1 # プレビュー画像を送る最短の間隔(秒)
 
 
     def __init__(self, parent=None):
@@ -315,6 +632,11 @@ class RunProcess(QThread):
         self.setting_data = SettingData()
         self.target_path  = ""
         self.save_path    = ""
+        self.engine       = BatchEngine() # 一括変換エンジン
+        self.profile_dict = {} # 直前の一括処理のLineExtractionの段階ごとの集計結果
+        self.preset_dict  = {} # 複数の設定値で変換する場合の設定名 → 設定値オブジェクトの辞書
+        self.resume_flg   = False # マニフェストに記録された変換済みのファイルを飛ばすかどうか
+        self.recursive_flg = False # サブフォルダも変換するかどうか
 
 
     def set_setting_data(self, setting_data=SettingData):
@@ -326,6 +648,67 @@ class RunProcess(QThread):
         self.setting_data = setting_data
 
 
+    def set_preset_dict(self, preset_dict):
+        """ 複数の設定値で変換する場合の設定値を設定する関数
+
+            Args:
+                preset_dict (dict): 設定名 → 設定値オブジェクトの辞書(空の場合は設定値オブジェクトのみで変換)
+        """
+        self.preset_dict = preset_dict
+
+
+    def set_resume_flg(self, flg):
+        """ 中断した一括処理を続きから再開するかを設定する関数
+
+            Args:
+                flg (bool): True/変換済みのファイルを飛ばす、False/すべて変換する
+        """
+        self.resume_flg = flg
+
+
+    def set_recursive_flg(self, flg):
+        """ サブフォルダも変換するかを設定する関数
+
+            Args:
+                flg (bool): True/サブフォルダも変換して保存フォルダに同じ構成で保存する、False/直下のみ
+        """
+        self.recursive_flg = flg
+
+
+    def start(self):
+        """ 中止要求と一時停止を解除して一括処理を開始する関数
+        """
+        self.engine.reset_control()
+        QThread.start(self)
+
+
+    def cancel(self):
+        """ 一括処理の中止を要求する関数
+        """
+        self.engine.cancel()
+
+
+    def pause(self):
+        """ 一括処理を一時停止する関数
+        """
+        self.engine.pause()
+
+
+    def resume(self):
+        """ 一時停止した一括処理を再開する関数
+        """
+        self.engine.resume()
+
+
+    def is_paused(self):
+        """ 一時停止中かを取得する関数
+
+            Returns:
+                True/False (bool): 一時停止中かどうか
+        """
+        return self.engine.is_paused()
+
+
     def set_target_path(self, path):
         """ 対象フォルダを設定する関数
 
@@ -344,6 +727,42 @@ class RunProcess(QThread):
         self.save_path = path
 
 
+    def set_worker_num(self, worker_num):
+        """ 並列実行するワーカープロセス数を設定する関数
+
+            Args:
+                worker_num (int): ワーカープロセス数
+        """
+        self.engine.set_worker_num(worker_num)
+
+
+    def set_cache(self, cache):
+        """ 変換結果のキャッシュを設定する関数
+
+            Args:
+                cache (ResultCache): 変換結果のキャッシュ(Noneの場合は使用しない)
+        """
+        self.engine.set_cache(cache)
+
+
+    def set_encode_setting(self, encode_setting):
+        """ 変換後画像の保存形式を設定する関数
+
+            Args:
+                encode_setting (EncodeSetting): 保存形式
+        """
+        self.engine.set_encode_setting(encode_setting)
+
+
+    def set_profile_flg(self, flg):
+        """ LineExtractionの段階ごとの処理時間を記録するかを設定する関数
+
+            Args:
+                flg (bool): True/記録する、False/記録しない
+        """
+        self.engine.set_profile_flg(flg)
+
+
     def set_pre_size(self, w, h):
         """ プレビューサイズを設定する関数
 
@@ -355,39 +774,96 @@ class RunProcess(QThread):
         self.height = h
 
 
+    def emit_total(self, scan):
+        """ これまでに見つかった件数から変換する全件数を送る関数
+
+            Args:
+                scan (ScanThread): 変換画像ファイルの走査
+        """
+        self.total_thread.emit(scan.get_found_num() * max(len(self.preset_dict), 1), scan.is_done())
+
+
     def run(self):
         """ 書き込み処理を実行する関数
         """
         self.error = None
+        self.cancel_flg = False
         target_img_flg = False
-        line_extraction = LineExtraction() # 画像変換用オブジェクト
+        manifest = JobManifest(self.save_path)
+        scanner = FileScanner()
+        scanner.set_recursive_flg(self.recursive_flg)
+        scanner.set_save_dir(self.save_path)
+        scan = None
+        error_list = [] # 変換に失敗したファイルのリスト
+        pre_img = None # まだ送っていない最新のプレビュー画像
+        pre_time = 0.0 # 最後にプレビュー画像を送った時刻
+        total_time = 0.0 # 最後に全件数を送った時刻
 
         try:
-            for img_file in glob.glob(self.target_path + "/*"):
-                # ファイルの拡張子を取得
-                extension = os.path.splitext(img_file)[1]
-                extension = extension.lower()
-
-                # 画像ファイルの場合は変換して保存
-                if (extension == ".png") or (extension == ".jpg") or (extension == ".jpeg") or (extension == ".bmp"):
-                    # OpenCVだとパスに日本語が入っているとダメなのでnumpyで開く
-                    img_org = np.array(Image.open(img_file))
-                    # OpenCVのRGBに変換
-                    cv2_img = cv2.cvtColor(img_org, cv2.COLOR_BGR2RGB)
-                    # 処理の実行
-                    line_extraction.set_image_setting(cv2_img, self.setting_data)
-                    result_img = line_extraction.line_extraction()
-                    # 保存
-                    pil_img = Image.fromarray(cv2.cvtColor(result_img, cv2.COLOR_BGR2RGB))
-                    save_file_name = os.path.splitext("ol_" + os.path.basename(img_file))[0] + ".png"
-                    pil_img.save(self.save_path + "/" + save_file_name)
-                    # プレビュー画像作成
-                    pre_img = line_extraction.get_qpixmap(result_img, self.width, self.height)
-                    # オブジェクトを作成して渡す
-                    self.process_thread.emit(EmitObject(save_file_name, pre_img))
-                    target_img_flg = True
+            file_list = scanner.scan(self.target_path)
+
+            # 変換済みのファイルを記録し、続きから再開する場合は記録済みのファイルを飛ばす
+            manifest.open(self.resume_flg)
+            self.engine.set_manifest(manifest)
+            if self.resume_flg:
+                if len(self.preset_dict) == 0:
+                    hash_dict = self.engine.get_hash_dict({None: self.setting_data})
+                else:
+                    hash_dict = self.engine.get_hash_dict(self.preset_dict)
+                file_list = manifest.iter_remaining(file_list, hash_dict)
+
+            # 走査は別スレッドで進めて、見つかったものから変換する(全件数は走査の進み具合に合わせて送る)
+            scan = ScanThread(file_list)
+            scan.start()
+            file_list = scan
+
+            if len(self.preset_dict) == 0:
+                result_iter = self.engine.run(file_list, self.save_path, self.setting_data, self.width, self.height)
+            else:
+                # 画像を1回だけ読み込んで設定名ごとに変換する
+                result_iter = self.engine.run_presets(file_list, self.save_path, self.preset_dict, self.width, self.height)
+
+            for result in result_iter:
+                target_img_flg = True
+                if time.perf_counter() - total_time >= self.PREVIEW_INTERVAL:
+                    self.emit_total(scan)
+                    total_time = time.perf_counter()
+
+                if result.error is None:
+                    self.process_thread.emit(EmitObject(result.save_file_name, None, result.stage_time.get("read", (0.0, 0))[1]))
+
+                    # プレビュー画像は間隔を空けて最新のものだけ送る(キャッシュを使用した場合はなし)
+                    if result.pre_img is not None:
+                        pre_img = result.pre_img
+                    if (pre_img is not None) and (time.perf_counter() - pre_time >= self.PREVIEW_INTERVAL):
+                        self.preview_thread.emit(pre_img)
+                        pre_img = None
+                        pre_time = time.perf_counter()
+                else:
+                    # 失敗したファイルは記録して次のファイルへ進む
+                    file_name = result.sub_dir + os.path.basename(result.file_name)
+                    if result.preset is not None:
+                        file_name = result.preset + "/" + file_name
+                    error_list.append(file_name + ": " + result.error)
+                    self.process_thread.emit(EmitObject(file_name, result.error, result.stage_time.get("read", (0.0, 0))[1]))
         except Exception as e:
             self.error = str(e)
-
-        if not target_img_flg:
+        finally:
+            self.engine.set_manifest(None)
+            manifest.close()
+            if scan is not None:
+                scan.stop()
+                self.emit_total(scan)
+        self.cancel_flg = self.engine.is_cancelled()
+
+        # 間隔の関係で送れていない最後のプレビュー画像を送る
+        if pre_img is not None:
+            self.preview_thread.emit(pre_img)
+
+        # 段階ごとの処理時間を集計結果として保持
+        self.profile_dict = self.engine.get_profile_dict()
+
+        if (not target_img_flg) and (manifest.skip_num == 0) and (not self.cancel_flg):
             self.error = "変換対象の画像がありません。"
+        elif (self.error is None) and (len(error_list) > 0):
+            self.error = str(len(error_list)) + "件のファイルの変換に失敗しました。\n\n" + "\n".join(error_list[:10])
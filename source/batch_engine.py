@@ -0,0 +1,1031 @@
+#-*- coding:utf-8 -*-
+from setting_data import SettingData
+from line_extraction import LineExtraction
+from profiler import StageCounter, StageProfiler
+from stage_pipeline import StagePipeline
+from workspace import Workspace
+from image_io import EncodeSetting, read_image, write_image
+from mapped_image import map_image, create_temp_memmap, create_pgm
+from scanner import IMG_EXTENSIONS, is_image_file
+
+import os, time, queue, threading, functools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+
+
+# ワーカープロセスごとに保持する画像変換用オブジェクト
+worker_line_extraction = None
+# ワーカープロセスごとに保持する変換結果のキャッシュと設定値のハッシュ
+worker_cache = None
+worker_setting_hash = None
+# ワーカープロセスごとに保持する保存形式
+worker_encode_setting = EncodeSetting()
+# 複数の設定値で変換する場合にワーカープロセスごとに保持する途中結果共有用のパイプラインと設定値
+worker_pipeline = None
+worker_preset_dict = None
+
+
+def init_worker(setting_data, strip_height=None, profile_flg=False, cache=None, encode_setting=None):
+    """ ワーカープロセスの初期化関数(プロセスごとにLineExtractionを作成する)
+
+        Args:
+            setting_data (SettingData): 設定値オブジェクト
+            strip_height (int): 帯状に分割して変換する場合の1帯の高さ(Noneの場合は分割しない)
+            profile_flg (bool): 段階ごとの処理時間を記録するかどうか
+            cache (ResultCache): 変換結果のキャッシュ(Noneの場合は使用しない)
+            encode_setting (EncodeSetting): 保存形式(Noneの場合は初期値)
+    """
+    global worker_line_extraction, worker_cache, worker_setting_hash, worker_encode_setting
+    worker_cache = cache
+    worker_encode_setting = encode_setting or EncodeSetting()
+    worker_setting_hash = setting_data.get_hash()
+    worker_line_extraction = LineExtraction()
+    worker_line_extraction.set_setting_data(setting_data)
+    worker_line_extraction.set_strip_height(strip_height)
+    # 同じサイズの画像が続く場合に作業用の配列を使い回す
+    worker_line_extraction.set_workspace(Workspace())
+    if profile_flg:
+        worker_line_extraction.set_profiler(StageProfiler())
+
+
+def init_preset_worker(preset_dict, cache=None, encode_setting=None):
+    """ 複数の設定値で変換するワーカープロセスの初期化関数
+
+        Args:
+            preset_dict (dict): 設定名 → 設定値オブジェクトの辞書
+            cache (ResultCache): 変換結果のキャッシュ(Noneの場合は使用しない)
+            encode_setting (EncodeSetting): 保存形式(Noneの場合は初期値)
+    """
+    global worker_pipeline, worker_preset_dict, worker_cache, worker_encode_setting
+    worker_cache = cache
+    worker_encode_setting = encode_setting or EncodeSetting()
+    worker_preset_dict = preset_dict
+    worker_pipeline = StagePipeline()
+
+
+def get_save_file_name(img_file, sub_dir="", color_flg=False):
+    """ 変換画像ファイルパスから保存ファイル名を取得する関数(拡張子はワーカーの保存形式に合わせる)
+
+        Args:
+            img_file (str)  : 変換画像ファイルパス
+            sub_dir (str)   : 保存フォルダからの相対フォルダ("/"区切りで末尾に"/"を付ける、直下の場合は空文字)
+            color_flg (bool): 変換後画像がカラーかどうか
+
+        Returns:
+            save_file_name (str): 保存フォルダからの相対ファイルパス
+    """
+    return sub_dir + os.path.splitext("ol_" + os.path.basename(img_file))[0] + worker_encode_setting.get_extension(color_flg)
+
+
+def get_output_hash(setting_hash, encode_setting):
+    """ 設定値と保存形式を合わせたハッシュを取得する関数(変換結果のキャッシュや再開判定のキーに使う)
+
+        Args:
+            setting_hash (str): 設定値のハッシュ
+            encode_setting (EncodeSetting): 保存形式
+
+        Returns:
+            output_hash (str): 設定値と保存形式のハッシュ
+    """
+    return setting_hash + "-" + encode_setting.get_hash()
+
+
+def fetch_cache(img_file, save_path, result, setting_data=None):
+    """ 変換結果のキャッシュがあれば保存先にコピーする関数
+
+        Args:
+            img_file (str)      : 変換画像ファイルパス
+            save_path (str)     : 保存フォルダ
+            result (BatchResult): 変換結果(キャッシュのキーと使用有無を設定する)
+            setting_data (SettingData): 設定値オブジェクト(Noneの場合はワーカーの設定値)
+
+        Returns:
+            True/False (bool): キャッシュを使用したかどうか
+    """
+    if worker_cache is None:
+        return False
+
+    if setting_data is None:
+        setting_data = worker_line_extraction.setting_data
+        setting_hash = worker_setting_hash
+    else:
+        setting_hash = setting_data.get_hash()
+    result.cache_key = worker_cache.get_key(img_file, get_output_hash(setting_hash, worker_encode_setting))
+    result.cache_ext = worker_encode_setting.get_extension(setting_data.is_color_output())
+    save_file_name = get_save_file_name(img_file, result.sub_dir, setting_data.is_color_output())
+    if worker_cache.fetch(result.cache_key, save_path + "/" + save_file_name, result.cache_ext):
+        result.save_file_name = save_file_name
+        result.cache_flg = True
+        return True
+
+    return False
+
+
+def store_cache(result, save_file):
+    """ 保存したファイルを変換結果のキャッシュに追加する関数
+
+        Args:
+            result (BatchResult): 変換結果
+            save_file (str)     : 保存ファイルパス
+    """
+    if (worker_cache is not None) and (result.cache_key is not None):
+        worker_cache.store(result.cache_key, save_file, result.cache_ext)
+
+
+def read_input_image(img_file, gray_flg):
+    """ 変換画像を読み込む関数
+
+        帯状に分割して変換する場合、無圧縮の画像(PGM/PPM、TIFF)は全体を読み込まずにnp.memmapで開く。
+
+        Args:
+            img_file (str) : 変換画像ファイルパス
+            gray_flg (bool): グレースケールで読み込むかどうか(np.memmapで開く場合は元の形式のまま)
+
+        Returns:
+            cv2_img (img): 変換画像
+    """
+    if (worker_line_extraction is not None) and (worker_line_extraction.strip_height is not None):
+        mapped_img = map_image(img_file)
+        if mapped_img is not None:
+            return mapped_img
+    return read_image(img_file, gray_flg)
+
+
+def get_mapped_buffer(line_extraction, save_file):
+    """ np.memmapで開いた画像を帯状に分割して変換する場合の、変換後画像の書込先と作業用の配列の作成関数を取得する関数
+
+        作業用の配列は保存フォルダの一時ファイルに置き、保存形式がPGMの場合は保存ファイルに直接書き込む
+        (変換後画像がカラーの場合は元画像をそのまま返すため書き込まない)。
+        それ以外の場合はどちらもNone(メモリ上に作成)を返す。
+
+        Args:
+            line_extraction (LineExtraction): 変換画像を設定済みの画像変換用オブジェクト
+            save_file (str): 保存ファイルパス
+
+        Returns:
+            dst (memmap): 変換後画像の書込先(Noneの場合は作成する)
+            create_buffer (function): 作業用の配列の作成関数
+    """
+    if (not isinstance(line_extraction.cv2_img, np.memmap)) or (not line_extraction.is_strip()):
+        return None, None
+
+    create_buffer = functools.partial(create_temp_memmap, temp_dir=os.path.dirname(os.path.abspath(save_file)))
+    dst = None
+    if (worker_encode_setting.format == "pgm") and (not line_extraction.setting_data.is_color_output()):
+        dst = create_pgm(save_file, line_extraction.cv2_img.shape[:2])
+    return dst, create_buffer
+
+
+def convert_image(line_extraction, cv2_img, result, pre_w, pre_h, save_file=None):
+    """ 読み込んだ画像を変換してプレビュー画像を結果に設定する関数
+
+        Args:
+            line_extraction (LineExtraction): 画像変換用オブジェクト
+            cv2_img (img)       : 変換画像
+            result (BatchResult): 変換結果(プレビュー画像を設定する)
+            pre_w (int): プレビュー画像のwidth(Noneの場合はプレビューを作成しない)
+            pre_h (int): プレビュー画像のheight
+            save_file (str): 保存ファイルパス(np.memmapで開いた画像の場合に使用)
+
+        Returns:
+            result_img (img): 変換後画像
+    """
+    line_extraction.set_image(cv2_img)
+    dst, create_buffer = get_mapped_buffer(line_extraction, save_file) if save_file is not None else (None, None)
+    if line_extraction.profiler is None:
+        result_img = line_extraction.line_extraction(dst, create_buffer)
+    else:
+        # 1ファイル分の記録を結果に入れて呼び出し元で集計する
+        line_extraction.profiler.clear()
+        result_img = line_extraction.run_stage("line_extraction", line_extraction.line_extraction, dst, create_buffer)
+        result.profile_dict = line_extraction.profiler.get_raw_dict()
+    # プレビュー用に縮小した画像だけを返す(QPixmapは呼び出し側で作成)
+    if pre_w is not None:
+        result.pre_img = line_extraction.resize_preview(result_img, pre_w, pre_h)
+    return result_img
+
+
+def convert_file(img_file, save_path, pre_w, pre_h, sub_dir=""):
+    """ 1ファイルを変換して保存する関数(ワーカープロセスで実行される)
+
+        Args:
+            img_file (str) : 変換画像ファイルパス
+            save_path (str): 保存フォルダ
+            pre_w (int)    : プレビュー画像のwidth(Noneの場合はプレビューを作成しない)
+            pre_h (int)    : プレビュー画像のheight
+            sub_dir (str)  : 保存フォルダからの相対フォルダ(直下の場合は空文字)
+
+        Returns:
+            result (BatchResult): 変換結果
+    """
+    result = BatchResult(img_file, sub_dir)
+
+    # ファイル単位でエラーを閉じ込めて、1ファイルの失敗で全体が止まらないようにする
+    try:
+        if fetch_cache(img_file, save_path, result):
+            return result
+
+        start_time = time.perf_counter()
+        # 変換後画像に色を使わない場合はグレースケールで読み込む
+        color_flg = worker_line_extraction.setting_data.is_color_output()
+        cv2_img = read_input_image(img_file, not color_flg)
+        result.add_stage_time("read", start_time, os.path.getsize(img_file))
+
+        start_time = time.perf_counter()
+        save_file_name = get_save_file_name(img_file, sub_dir, color_flg)
+        result_img = convert_image(worker_line_extraction, cv2_img, result, pre_w, pre_h, save_path + "/" + save_file_name)
+        result.add_stage_time("process", start_time, cv2_img.nbytes)
+
+        start_time = time.perf_counter()
+        write_image(result_img, save_path + "/" + save_file_name, worker_encode_setting)
+        result.save_file_name = save_file_name
+        result.add_stage_time("write", start_time, result_img.nbytes)
+        store_cache(result, save_path + "/" + save_file_name)
+    except Exception as e:
+        result.error = str(e)
+
+    return result
+
+
+def get_preset_save_path(save_path, preset):
+    """ 複数の設定値で変換する場合の設定名ごとの保存フォルダを取得する関数
+
+        Args:
+            save_path (str): 保存フォルダ
+            preset (str)   : 設定名
+
+        Returns:
+            preset_save_path (str): 設定名ごとの保存フォルダ
+    """
+    return save_path + "/" + preset
+
+
+def convert_file_presets(img_file, save_path, pre_w, pre_h, sub_dir=""):
+    """ 1ファイルを読み込んで設定値ごとに変換して保存する関数(ワーカープロセスで実行される)
+
+        画像の読込は1回だけ行い、グレースケール化やぼかし、輪郭線抽出などの途中結果は
+        依存する設定値が同じ設定どうしで共有する。
+
+        Args:
+            img_file (str) : 変換画像ファイルパス
+            save_path (str): 保存フォルダ(設定名ごとのサブフォルダに保存する)
+            pre_w (int)    : プレビュー画像のwidth(Noneの場合はプレビューを作成しない)
+            pre_h (int)    : プレビュー画像のheight
+            sub_dir (str)  : 設定名ごとの保存フォルダからの相対フォルダ(直下の場合は空文字)
+
+        Returns:
+            result_list (list): 設定名ごとの変換結果(BatchResult)のリスト
+    """
+    result_list = []
+    target_list = [] # キャッシュがなく変換が必要な(設定名, 設定値, 変換結果)のリスト
+    for preset, setting_data in worker_preset_dict.items():
+        result = BatchResult(img_file, sub_dir)
+        result.preset = preset
+        result_list.append(result)
+        try:
+            if fetch_cache(img_file, get_preset_save_path(save_path, preset), result, setting_data):
+                result.save_file_name = preset + "/" + result.save_file_name
+            else:
+                target_list.append((preset, setting_data, result))
+        except Exception as e:
+            result.error = str(e)
+
+    # すべてキャッシュを使用した場合は読み込まない
+    if len(target_list) == 0:
+        return result_list
+
+    try:
+        start_time = time.perf_counter()
+        # どの設定値も変換後画像に色を使わない場合はグレースケールで読み込む
+        gray_flg = not any(setting_data.is_color_output() for _, setting_data, _ in target_list)
+        cv2_img = read_image(img_file, gray_flg)
+        read_time = (time.perf_counter() - start_time, os.path.getsize(img_file))
+        worker_pipeline.set_image(cv2_img)
+    except Exception as e:
+        for _, _, result in target_list:
+            result.error = str(e)
+        return result_list
+
+    for i, (preset, setting_data, result) in enumerate(target_list):
+        # ファイル単位・設定単位でエラーを閉じ込める
+        try:
+            if i == 0:
+                result.stage_time["read"] = read_time
+
+            start_time = time.perf_counter()
+            worker_pipeline.set_setting_data(setting_data)
+            result_img = worker_pipeline.line_extraction()
+            if pre_w is not None:
+                result.pre_img = worker_pipeline.extraction.resize_preview(result_img, pre_w, pre_h)
+            result.add_stage_time("process", start_time, cv2_img.nbytes)
+
+            start_time = time.perf_counter()
+            save_file_name = get_save_file_name(img_file, sub_dir, setting_data.is_color_output())
+            save_file = get_preset_save_path(save_path, preset) + "/" + save_file_name
+            write_image(result_img, save_file, worker_encode_setting)
+            result.save_file_name = preset + "/" + save_file_name
+            result.add_stage_time("write", start_time, result_img.nbytes)
+            store_cache(result, save_file)
+        except Exception as e:
+            result.error = str(e)
+
+    # 次の画像まで途中結果を持ち越さない
+    worker_pipeline.clear()
+    return result_list
+
+
+def create_error_result(img_file, sub_dir, error):
+    """ 変換関数が戻り値を返せなかった場合のエラーの変換結果を作成する関数(convert_file用)
+
+        Args:
+            img_file (str): 変換画像ファイルパス
+            sub_dir (str) : 保存フォルダからの相対フォルダ(直下の場合は空文字)
+            error (str)   : エラーメッセージ
+
+        Returns:
+            result (BatchResult): 変換結果
+    """
+    result = BatchResult(img_file, sub_dir)
+    result.error = error
+    return result
+
+
+def create_error_result_presets(preset_list, img_file, sub_dir, error):
+    """ 変換関数が戻り値を返せなかった場合のエラーの変換結果を作成する関数(convert_file_presets用)
+
+        Args:
+            preset_list (list): 設定名のリスト
+            img_file (str)    : 変換画像ファイルパス
+            sub_dir (str)     : 設定名ごとの保存フォルダからの相対フォルダ(直下の場合は空文字)
+            error (str)       : エラーメッセージ
+
+        Returns:
+            result_list (list): 設定名ごとの変換結果(BatchResult)のリスト
+    """
+    result_list = []
+    for preset in preset_list:
+        result = create_error_result(img_file, sub_dir, error)
+        result.preset = preset
+        result_list.append(result)
+    return result_list
+
+
+class BatchResult():
+    """ 1ファイル分の変換結果を保持するクラス
+    """
+
+    def __init__(self, file_name=str, sub_dir=""):
+        """ コンストラクタ
+
+            Args:
+                file_name (str): 変換画像ファイルパス
+                sub_dir (str)  : 保存フォルダからの相対フォルダ(直下の場合は空文字)
+        """
+        self.file_name      = file_name
+        self.sub_dir        = sub_dir
+        self.save_file_name = None
+        self.pre_img        = None
+        self.error          = None
+        self.stage_time     = {} # 段階名 → (処理時間(秒), 処理したバイト数)
+        self.profile_dict   = None # LineExtractionの段階ごとの記録(StageProfiler.get_raw_dict)
+        self.cache_key      = None  # 変換結果のキャッシュのキー
+        self.cache_ext      = None  # 変換結果のキャッシュファイルの拡張子(保存形式に合わせる)
+        self.cache_flg      = False # キャッシュを使用して変換を省略したかどうか
+        self.preset         = None  # 複数の設定値で変換した場合の設定名
+
+
+    def add_stage_time(self, name, start_time, nbytes):
+        """ 段階の処理時間を記録する関数
+
+            Args:
+                name (str)        : 段階名
+                start_time (float): 段階の開始時刻(time.perf_counter)
+                nbytes (int)      : 処理したバイト数
+        """
+        self.stage_time[name] = (time.perf_counter() - start_time, nbytes)
+
+
+class StreamPipeline():
+    """ 読込・変換・保存を別スレッドで並行して行う一括変換クラス
+
+        読込スレッド → (読込キュー) → 変換(呼び出し元スレッド) → (保存キュー) → 保存スレッド
+        の順に流し、N+1番目の読込とN-1番目の保存をN番目の変換と重ねて実行する。
+        キューの長さで同時にメモリに載る画像の枚数を制限する。
+    """
+    END = None # キューの終端を表す値
+
+
+    def __init__(self, read_queue_size=4, write_queue_size=4):
+        """ コンストラクタ
+
+            Args:
+                read_queue_size (int) : 読込済み画像を溜めておける枚数
+                write_queue_size (int): 保存待ちの画像を溜めておける枚数
+        """
+        self.read_queue_size  = read_queue_size
+        self.write_queue_size = write_queue_size
+        self.read_error       = None # 読込スレッドでファイルリストの取得中に起きた例外
+
+
+    def put(self, target_queue, item, stop_event):
+        """ 停止要求を確認しながらキューに追加する関数
+
+            Args:
+                target_queue (Queue): 追加するキュー
+                item (object)       : 追加する値
+                stop_event (Event)  : 停止要求
+
+            Returns:
+                True/False (bool): 追加できたかどうか(停止要求があればFalse)
+        """
+        while not stop_event.is_set():
+            try:
+                target_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+
+    def clear_queue(self, target_queue):
+        """ キューに残っている値をすべて捨てる関数
+
+            Args:
+                target_queue (Queue): 対象のキュー
+        """
+        while True:
+            try:
+                target_queue.get_nowait()
+            except queue.Empty:
+                return
+
+
+    def read_worker(self, file_list, save_path, gray_flg, read_queue, stop_event):
+        """ 画像を読み込んで読込キューに追加するスレッドの関数
+
+            Args:
+                file_list (iterable): (変換画像ファイルパス, 保存フォルダからの相対フォルダ)のリスト
+                save_path (str)     : 保存フォルダ
+                gray_flg (bool)     : グレースケールで読み込むかどうか
+                read_queue (Queue)  : 読込キュー
+                stop_event (Event)  : 停止要求
+        """
+        try:
+            for img_file, sub_dir in file_list:
+                result = BatchResult(img_file, sub_dir)
+                cv2_img = None
+                try:
+                    if fetch_cache(img_file, save_path, result):
+                        # キャッシュを使用した場合は読込・変換・保存を省略
+                        if not self.put(read_queue, (result, None), stop_event):
+                            return
+                        continue
+
+                    start_time = time.perf_counter()
+                    cv2_img = read_input_image(img_file, gray_flg)
+                    result.add_stage_time("read", start_time, os.path.getsize(img_file))
+                except Exception as e:
+                    result.error = str(e)
+
+                if not self.put(read_queue, (result, cv2_img), stop_event):
+                    return
+        except Exception as e:
+            # ファイルリストの取得で起きた例外(フォルダの作成・走査の失敗など)はスレッドの終了後にrunで送出する
+            self.read_error = e
+        finally:
+            # 例外で終了した場合も変換側が待ち続けないように終端を追加する
+            self.put(read_queue, self.END, stop_event)
+
+
+    def write_worker(self, save_path, color_flg, write_queue, done_queue):
+        """ 保存キューの画像を保存して完了キューに追加するスレッドの関数
+
+            Args:
+                save_path (str)    : 保存フォルダ
+                color_flg (bool)   : 変換後画像がカラーかどうか
+                write_queue (Queue): 保存キュー
+                done_queue (Queue) : 完了キュー
+        """
+        while True:
+            item = write_queue.get()
+            if item is self.END:
+                done_queue.put(self.END)
+                return
+
+            result, result_img = item
+            if (result.error is None) and (not result.cache_flg):
+                try:
+                    start_time = time.perf_counter()
+                    save_file_name = get_save_file_name(result.file_name, result.sub_dir, color_flg)
+                    write_image(result_img, save_path + "/" + save_file_name, worker_encode_setting)
+                    result.save_file_name = save_file_name
+                    result.add_stage_time("write", start_time, result_img.nbytes)
+                    store_cache(result, save_path + "/" + save_file_name)
+                except Exception as e:
+                    result.error = str(e)
+
+            done_queue.put(result)
+
+
+    def run(self, file_list, save_path, line_extraction, pre_w, pre_h, cancel_event=None):
+        """ 一括変換を実行して結果を1件ずつ返すジェネレータ関数
+
+            中止要求があった場合は読込キューに残っている画像は変換せずに捨て、変換済みの画像の保存だけ待つ。
+
+            Args:
+                file_list (iterable): (変換画像ファイルパス, 保存フォルダからの相対フォルダ)のリスト
+                save_path (str)     : 保存フォルダ
+                line_extraction (LineExtraction): 設定値を設定済みの画像変換用オブジェクト
+                pre_w (int): プレビュー画像のwidth(Noneの場合はプレビューを作成しない)
+                pre_h (int): プレビュー画像のheight
+                cancel_event (Event): 中止要求(Noneの場合は中止しない)
+
+            Yields:
+                result (BatchResult): 変換結果(入力順)
+
+            Raises:
+                Exception: ファイルリストの取得で起きた例外(それまでの変換結果を返してから送出する)
+        """
+        self.read_error = None
+        read_queue  = queue.Queue(maxsize=self.read_queue_size)
+        write_queue = queue.Queue(maxsize=self.write_queue_size)
+        done_queue  = queue.Queue()
+        stop_event  = threading.Event()
+
+        # 変換後画像に色を使わない場合はグレースケールで読み込む
+        gray_flg = not line_extraction.setting_data.is_color_output()
+        reader = threading.Thread(target=self.read_worker, args=(file_list, save_path, gray_flg, read_queue, stop_event), daemon=True)
+        writer = threading.Thread(target=self.write_worker, args=(save_path, not gray_flg, write_queue, done_queue), daemon=True)
+        reader.start()
+        writer.start()
+
+        try:
+            while True:
+                item = read_queue.get()
+                if item is self.END:
+                    break
+                if (cancel_event is not None) and cancel_event.is_set():
+                    # 読込スレッドを止めて、先読みした画像を捨てる
+                    stop_event.set()
+                    self.clear_queue(read_queue)
+                    break
+
+                result, cv2_img = item
+                result_img = None
+                if (result.error is None) and (not result.cache_flg):
+                    try:
+                        start_time = time.perf_counter()
+                        save_file = save_path + "/" + get_save_file_name(result.file_name, result.sub_dir, not gray_flg)
+                        result_img = convert_image(line_extraction, cv2_img, result, pre_w, pre_h, save_file)
+                        result.add_stage_time("process", start_time, cv2_img.nbytes)
+                    except Exception as e:
+                        result.error = str(e)
+                del cv2_img
+
+                write_queue.put((result, result_img))
+
+                # 保存まで終わったものを返す
+                while not done_queue.empty():
+                    yield done_queue.get()
+
+            write_queue.put(self.END)
+            while True:
+                result = done_queue.get()
+                if result is self.END:
+                    break
+                yield result
+        finally:
+            # 途中で中断された場合もスレッドを終了させる
+            stop_event.set()
+            if writer.is_alive():
+                write_queue.put(self.END)
+            reader.join()
+            writer.join()
+
+        if self.read_error is not None:
+            raise self.read_error
+
+
+class BatchEngine():
+    """ プロセスプールで一括変換を行うクラス
+    """
+    PENDING_RATE = 4 # ワーカー数に対する投入済みタスク数の上限倍率
+
+
+    def __init__(self, worker_num=None):
+        """ コンストラクタ
+
+            Args:
+                worker_num (int): ワーカープロセス数(Noneの場合はCPU数)
+        """
+        self.worker_num       = 1
+        self.ordered_flg      = True
+        self.strip_height     = None
+        self.read_queue_size  = 4
+        self.write_queue_size = 4
+        self.profile_flg      = False
+        self.cache            = None # 変換結果のキャッシュ
+        self.manifest         = None # 変換が完了したファイルの記録
+        self.encode_setting   = EncodeSetting() # 保存形式
+        self.hash_dict        = {}   # 実行中の設定名 → 設定値のハッシュの辞書(マニフェストの記録用)
+        self.cancel_event     = threading.Event() # 中止要求
+        self.run_event        = threading.Event() # 一時停止していない間はset
+        self.run_event.set()
+        self.profiler         = StageProfiler() # LineExtractionの段階ごとの記録の集計
+        self.stage_counter_dict = {}
+        self.reset_stage_counter()
+        self.set_worker_num(worker_num)
+
+
+    def set_worker_num(self, worker_num):
+        """ ワーカープロセス数を設定する関数
+
+            Args:
+                worker_num (int): ワーカープロセス数(Noneの場合はCPU数)
+        """
+        if worker_num is None:
+            worker_num = os.cpu_count() or 1
+        self.worker_num = max(1, int(worker_num))
+
+
+    def set_ordered_flg(self, flg):
+        """ 結果を返す順番を設定する関数
+
+            Args:
+                flg (bool): True/入力順、False/完了順
+        """
+        self.ordered_flg = flg
+
+
+    def set_strip_height(self, strip_height):
+        """ 大きな画像を帯状に分割して変換する場合の1帯の高さを設定する関数
+
+            Args:
+                strip_height (int): 1帯の高さ(Noneの場合は分割しない)
+        """
+        self.strip_height = strip_height
+
+
+    def set_queue_size(self, read_queue_size, write_queue_size):
+        """ 1プロセスで実行する場合の読込・保存キューの長さを設定する関数
+
+            Args:
+                read_queue_size (int) : 読込済み画像を溜めておける枚数
+                write_queue_size (int): 保存待ちの画像を溜めておける枚数
+        """
+        self.read_queue_size  = max(1, read_queue_size)
+        self.write_queue_size = max(1, write_queue_size)
+
+
+    def set_cache(self, cache):
+        """ 変換結果のキャッシュを設定する関数
+
+            Args:
+                cache (ResultCache): 変換結果のキャッシュ(Noneの場合は使用しない)
+        """
+        self.cache = cache
+
+
+    def set_encode_setting(self, encode_setting):
+        """ 変換後画像の保存形式を設定する関数
+
+            Args:
+                encode_setting (EncodeSetting): 保存形式
+        """
+        self.encode_setting = encode_setting
+
+
+    def get_hash_dict(self, preset_dict):
+        """ 設定名 → 設定値と保存形式のハッシュの辞書を取得する関数(マニフェストの記録・再開判定用)
+
+            Args:
+                preset_dict (dict): 設定名 → 設定値オブジェクトの辞書(1つの設定値のみで変換する場合の設定名はNone)
+
+            Returns:
+                hash_dict (dict): 設定名 → ハッシュの辞書
+        """
+        return {preset: get_output_hash(setting_data.get_hash(), self.encode_setting) for preset, setting_data in preset_dict.items()}
+
+
+    def set_manifest(self, manifest):
+        """ 変換が完了したファイルを記録するマニフェストを設定する関数
+
+            Args:
+                manifest (JobManifest): 開いた状態のマニフェスト(Noneの場合は記録しない)
+        """
+        self.manifest = manifest
+
+
+    def set_profile_flg(self, flg):
+        """ LineExtractionの段階ごとの処理時間を記録するかを設定する関数
+
+            Args:
+                flg (bool): True/記録する、False/記録しない
+        """
+        self.profile_flg = flg
+
+
+    def reset_control(self):
+        """ 中止要求と一時停止を解除する関数(一括変換を開始する前に呼び出す)
+        """
+        self.cancel_event.clear()
+        self.run_event.set()
+
+
+    def cancel(self):
+        """ 一括変換の中止を要求する関数(別スレッドから呼び出せる)
+
+            新しいファイルの変換は開始せず、変換中のファイルの完了を待って終了する。
+        """
+        self.cancel_event.set()
+        self.run_event.set() # 一時停止中でも中止できるようにする
+
+
+    def pause(self):
+        """ 一括変換を一時停止する関数(別スレッドから呼び出せる)
+
+            新しいファイルの変換を開始しないようにする。変換中のファイルはそのまま完了する。
+        """
+        self.run_event.clear()
+
+
+    def resume(self):
+        """ 一時停止した一括変換を再開する関数(別スレッドから呼び出せる)
+        """
+        self.run_event.set()
+
+
+    def is_cancelled(self):
+        """ 中止要求があったかを取得する関数
+
+            Returns:
+                True/False (bool): 中止要求があったかどうか
+        """
+        return self.cancel_event.is_set()
+
+
+    def is_paused(self):
+        """ 一時停止中かを取得する関数
+
+            Returns:
+                True/False (bool): 一時停止中かどうか
+        """
+        return not self.run_event.is_set()
+
+
+    def iter_file_list(self, file_list, save_path_list):
+        """ 一時停止中は待機し、中止要求があれば終了するファイルリストのジェネレータ関数
+
+            サブフォルダに保存するファイルがあれば、変換を始める前に保存フォルダ側にも同じフォルダを作成する。
+
+            Args:
+                file_list (iterable) : 変換画像ファイルパス、または(変換画像ファイルパス, 保存フォルダからの相対フォルダ)のリスト
+                save_path_list (list): 保存フォルダのリスト(複数の設定値で変換する場合は設定名ごとの保存フォルダ)
+
+            Yields:
+                img_file (str): 変換画像ファイルパス
+                sub_dir (str) : 保存フォルダからの相対フォルダ(直下の場合は空文字)
+        """
+        made_dir_set = set() # 作成済みの相対フォルダ
+        for item in file_list:
+            self.run_event.wait()
+            if self.cancel_event.is_set():
+                return
+
+            if isinstance(item, str):
+                item = (item, "")
+            sub_dir = item[1]
+            if (sub_dir != "") and (sub_dir not in made_dir_set):
+                for save_path in save_path_list:
+                    os.makedirs(save_path + "/" + sub_dir, exist_ok=True)
+                made_dir_set.add(sub_dir)
+            yield item
+
+
+    def reset_stage_counter(self):
+        """ 段階ごとの集計をリセットする関数
+        """
+        self.stage_counter_dict = {name: StageCounter(name) for name in ["read", "process", "write"]}
+        self.profiler.clear()
+
+
+    def get_profile_dict(self):
+        """ LineExtractionの段階ごとの記録の集計結果を取得する関数
+
+            Returns:
+                profile_dict (dict): 段階名 → 集計結果の辞書(記録しない設定の場合は空)
+        """
+        return self.profiler.get_dict()
+
+
+    def get_stage_counter_dict(self):
+        """ 段階ごとの集計結果を取得する関数
+
+            Returns:
+                counter_dict (dict): 段階名 → 集計結果の辞書
+        """
+        return {name: counter.get_dict() for name, counter in self.stage_counter_dict.items()}
+
+
+    def count_result(self, result):
+        """ 変換結果の処理時間を段階ごとに集計して、保存できたものをマニフェストに記録する関数
+
+            Args:
+                result (BatchResult): 変換結果
+
+            Returns:
+                result (BatchResult): 変換結果(そのまま返す)
+        """
+        for name, (seconds, nbytes) in result.stage_time.items():
+            self.stage_counter_dict[name].add(seconds, nbytes)
+        if result.profile_dict is not None:
+            self.profiler.merge(result.profile_dict)
+        if (self.manifest is not None) and (result.error is None):
+            try:
+                self.manifest.add(result, self.hash_dict[result.preset])
+            except OSError as e:
+                # 変換中に入力ファイルが削除された場合など(記録できなかったものは再開時に再変換する)
+                result.error = str(e)
+        return result
+
+
+    def run(self, file_list, save_path, setting_data: SettingData, pre_w, pre_h):
+        """ 一括変換を実行して結果を1件ずつ返すジェネレータ関数
+
+            Args:
+                file_list (iterable): 変換画像ファイルパス、または(変換画像ファイルパス, 保存フォルダからの相対フォルダ)のリスト
+                save_path (str)     : 保存フォルダ
+                setting_data (SettingData): 設定値オブジェクト
+                pre_w (int): プレビュー画像のwidth(Noneの場合はプレビューを作成しない)
+                pre_h (int): プレビュー画像のheight
+
+            Yields:
+                result (BatchResult): 変換結果
+        """
+        self.reset_stage_counter()
+        self.hash_dict = self.get_hash_dict({None: setting_data})
+        file_list = self.iter_file_list(file_list, [save_path])
+
+        if self.worker_num == 1:
+            # 1プロセスの場合はプールを作らずに、読込・変換・保存を重ねて実行
+            init_worker(setting_data, self.strip_height, self.profile_flg, self.cache, self.encode_setting)
+            pipeline = StreamPipeline(self.read_queue_size, self.write_queue_size)
+            for result in pipeline.run(file_list, save_path, worker_line_extraction, pre_w, pre_h, self.cancel_event):
+                yield self.count_result(result)
+            self.evict_cache()
+            return
+
+        initargs = (setting_data, self.strip_height, self.profile_flg, self.cache, self.encode_setting)
+        for result in self.run_pool(convert_file, file_list, save_path, pre_w, pre_h, init_worker, initargs, create_error_result):
+            yield self.count_result(result)
+
+        self.evict_cache()
+
+
+    def run_presets(self, file_list, save_path, preset_dict, pre_w, pre_h):
+        """ 複数の設定値で一括変換を実行して結果を1件ずつ返すジェネレータ関数
+
+            画像ごとに1回だけ読み込み、設定名ごとのサブフォルダ(保存フォルダ/設定名)に保存する。
+            帯状に分割しての変換とLineExtractionの段階ごとの記録には対応しない。
+
+            Args:
+                file_list (iterable): 変換画像ファイルパス、または(変換画像ファイルパス, 保存フォルダからの相対フォルダ)のリスト
+                save_path (str)     : 保存フォルダ
+                preset_dict (dict)  : 設定名 → 設定値オブジェクトの辞書
+                pre_w (int): プレビュー画像のwidth(Noneの場合はプレビューを作成しない)
+                pre_h (int): プレビュー画像のheight
+
+            Yields:
+                result (BatchResult): 設定名ごとの変換結果
+        """
+        self.reset_stage_counter()
+        self.hash_dict = self.get_hash_dict(preset_dict)
+        save_path_list = [get_preset_save_path(save_path, preset) for preset in preset_dict]
+        file_list = self.iter_file_list(file_list, save_path_list)
+
+        for preset_save_path in save_path_list:
+            os.makedirs(preset_save_path, exist_ok=True)
+
+        if self.worker_num == 1:
+            init_preset_worker(preset_dict, self.cache, self.encode_setting)
+            result_list_iter = (convert_file_presets(img_file, save_path, pre_w, pre_h, sub_dir) for img_file, sub_dir in file_list)
+        else:
+            initargs   = (preset_dict, self.cache, self.encode_setting)
+            error_func = functools.partial(create_error_result_presets, list(preset_dict))
+            result_list_iter = self.run_pool(convert_file_presets, file_list, save_path, pre_w, pre_h, init_preset_worker, initargs, error_func)
+
+        for result_list in result_list_iter:
+            for result in result_list:
+                yield self.count_result(result)
+
+        self.evict_cache()
+
+
+    def run_pool(self, func, file_list, save_path, pre_w, pre_h, initializer, initargs, error_func):
+        """ プロセスプールでファイルごとの変換関数を実行して結果を1件ずつ返すジェネレータ関数
+
+            変換関数の外で起きた例外(ワーカープロセスへの受け渡しの失敗など)はファイル単位のエラーにする。
+            ワーカープロセスが異常終了してプールが使えなくなった場合は、残りのファイルをすべてエラーにして終了する。
+
+            Args:
+                func (function)     : ファイルごとの変換関数(convert_file / convert_file_presets)
+                file_list (iterable): (変換画像ファイルパス, 保存フォルダからの相対フォルダ)のリスト
+                save_path (str)     : 保存フォルダ
+                pre_w (int): プレビュー画像のwidth(Noneの場合はプレビューを作成しない)
+                pre_h (int): プレビュー画像のheight
+                initializer (function): ワーカープロセスの初期化関数
+                initargs (tuple)      : 初期化関数の引数
+                error_func (function) : エラーの変換結果を作成する関数(変換関数と同じ形式の戻り値を返す)
+
+            Yields:
+                ret (object): 変換関数の戻り値
+        """
+        max_pending = self.worker_num * self.PENDING_RATE
+        file_iter = iter(file_list)
+        broken = None # プールが使えなくなった場合の(投入できなかったファイル, 相対フォルダ, エラーメッセージ)
+
+        with ProcessPoolExecutor(max_workers=self.worker_num, initializer=initializer, initargs=initargs) as executor:
+            if self.ordered_flg:
+                # 入力順に返す(先頭のタスクの完了を待つ)
+                pending = deque() # (タスク, 変換画像ファイルパス, 相対フォルダ)
+                for img_file, sub_dir in file_iter:
+                    try:
+                        pending.append((executor.submit(func, img_file, save_path, pre_w, pre_h, sub_dir), img_file, sub_dir))
+                    except BrokenProcessPool as e:
+                        broken = (img_file, sub_dir, str(e))
+                        break
+                    if len(pending) >= max_pending:
+                        yield self.get_future_result(*pending.popleft(), error_func)
+
+                # 中止要求があった場合は開始前のタスクを取り消して、変換中のものだけ待つ
+                self.cancel_pending(future for future, _, _ in pending)
+                while pending:
+                    future, img_file, sub_dir = pending.popleft()
+                    if not future.cancelled():
+                        yield self.get_future_result(future, img_file, sub_dir, error_func)
+            else:
+                # 完了した順に返す
+                pending = {} # タスク → (変換画像ファイルパス, 相対フォルダ)
+                for img_file, sub_dir in file_iter:
+                    try:
+                        pending[executor.submit(func, img_file, save_path, pre_w, pre_h, sub_dir)] = (img_file, sub_dir)
+                    except BrokenProcessPool as e:
+                        broken = (img_file, sub_dir, str(e))
+                        break
+                    if len(pending) >= max_pending:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            yield self.get_future_result(future, *pending.pop(future), error_func)
+
+                self.cancel_pending(pending)
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        img_file, sub_dir = pending.pop(future)
+                        if not future.cancelled():
+                            yield self.get_future_result(future, img_file, sub_dir, error_func)
+
+        if broken is not None:
+            # プールを作り直すと同じファイルで再び異常終了する可能性があるため、残りは変換しない
+            img_file, sub_dir, error = broken
+            yield error_func(img_file, sub_dir, error)
+            for img_file, sub_dir in file_iter:
+                yield error_func(img_file, sub_dir, error)
+
+
+    def get_future_result(self, future, img_file, sub_dir, error_func):
+        """ タスクの戻り値を取得する関数(例外はファイル単位のエラーの変換結果にする)
+
+            Args:
+                future (Future)      : 完了したタスク
+                img_file (str)       : 変換画像ファイルパス
+                sub_dir (str)        : 保存フォルダからの相対フォルダ(直下の場合は空文字)
+                error_func (function): エラーの変換結果を作成する関数
+
+            Returns:
+                ret (object): 変換関数の戻り値
+        """
+        try:
+            return future.result()
+        except Exception as e:
+            return error_func(img_file, sub_dir, str(e) or type(e).__name__)
+
+
+    def cancel_pending(self, pending):
+        """ 中止要求があれば開始前のタスクを取り消す関数
+
+            Args:
+                pending (iterable): 完了していないタスク(Future)
+        """
+        if self.cancel_event.is_set():
+            for future in pending:
+                future.cancel()
+
+
+    def evict_cache(self):
+        """ 変換結果のキャッシュが上限を超えていたら古いものから削除する関数
+        """
+        if self.cache is not None:
+            self.cache.evict()
@@ -0,0 +1,257 @@
+#-*- coding:utf-8 -*-
+from setting_data import SettingData
+from line_extraction import LineExtraction
+from batch_engine import BatchEngine
+
+import os, sys, time, json, shutil, platform, argparse, tempfile, statistics
+import multiprocessing
+import cv2
+import numpy as np
+from PIL import Image
+
+
+SEED = 0 # 合成画像の乱数シード(毎回同じ画像にするため固定)
+ASPECT = 4 / 3 # 合成画像の縦横比(width / height)
+FLAG_LIST = [(True, True), (True, False), (False, True), (False, False)] # (線出力, 影出力)
+
+
+def create_setting_data(line_flg, shadow_flg):
+    """ ベンチマーク用の設定値オブジェクトを作成する関数(default.jsonと同じ値)
+
+        Args:
+            line_flg (bool)  : 線出力
+            shadow_flg (bool): 影出力
+
+        Returns:
+            setting_data (SettingData): 設定値オブジェクト
+    """
+    setting_data = SettingData()
+    setting_data.set_outline_range(70, 110)
+    setting_data.set_outline_rough_blur(5, 5)
+    setting_data.set_img_blur_blur(10)
+    setting_data.set_contrast_range(50, 230)
+    setting_data.set_checkbox_line_shadow(line_flg, shadow_flg)
+    return setting_data
+
+
+def create_image(mega_pixel, seed=SEED):
+    """ 線や塗りを含む合成画像を作成する関数
+
+        Args:
+            mega_pixel (float): 画素数(メガピクセル)
+            seed (int)        : 乱数シード
+
+        Returns:
+            cv2_img (img): 合成画像(BGR)
+    """
+    height = int((mega_pixel * 1000000 / ASPECT) ** 0.5)
+    width  = int(height * ASPECT)
+    rng = np.random.default_rng(seed)
+
+    # 低周波のグラデーションにノイズを乗せた背景
+    small = rng.integers(0, 256, (8, 8, 3), dtype=np.uint8)
+    cv2_img = cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+    noise = rng.integers(0, 32, (height, width, 3), dtype=np.uint8)
+    cv2.add(cv2_img, noise, dst=cv2_img)
+
+    # 輪郭線が出るように図形を描画
+    scale = max(1, width // 640)
+    for _ in range(200):
+        color = tuple(int(c) for c in rng.integers(0, 256, 3))
+        x0, x1 = (int(v) for v in rng.integers(0, width, 2))
+        y0, y1 = (int(v) for v in rng.integers(0, height, 2))
+        cv2.line(cv2_img, (x0, y0), (x1, y1), color, scale)
+        cv2.circle(cv2_img, (x0, y1), int(rng.integers(1, 40)) * scale, color, -1)
+
+    return cv2_img
+
+
+def measure(func, repeat):
+    """ 関数の実行時間を計測する関数
+
+        Args:
+            func (function): 引数なしの計測対象の関数
+            repeat (int)   : 繰り返し回数
+
+        Returns:
+            result (tuple): (計測結果の辞書, 最後の実行結果)
+    """
+    time_list = []
+    ret = None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        ret = func()
+        time_list.append(time.perf_counter() - start_time)
+
+    return {"min": min(time_list), "median": statistics.median(time_list)}, ret
+
+
+def bench_stages(cv2_img, setting_data, repeat, qt_flg):
+    """ line_extractionの各段階の処理時間を計測する関数
+
+        Args:
+            cv2_img (img): 変換画像
+            setting_data (SettingData): 設定値オブジェクト
+            repeat (int): 繰り返し回数
+            qt_flg (bool): get_qpixmapも計測するかどうか
+
+        Returns:
+            stage_dict (dict): 段階名 → 計測結果の辞書
+    """
+    lx = LineExtraction()
+    lx.set_image_setting(cv2_img, setting_data)
+    stage_dict = {}
+
+    stage_dict["gray_scale"], gray_img    = measure(lambda: lx.gray_scale(cv2_img), repeat)
+    stage_dict["img_blur"], blur_img      = measure(lambda: lx.img_blur(gray_img), repeat)
+    stage_dict["outine"], outline_img     = measure(lambda: lx.outine(blur_img), repeat)
+    stage_dict["line_blur"], outline_img  = measure(lambda: lx.line_blur(outline_img), repeat)
+    stage_dict["threshold"], outline_img  = measure(lambda: lx.img_threshold(outline_img), repeat)
+    stage_dict["shadow_blur"], shadow_img = measure(lambda: lx.img_blur(blur_img), repeat)
+    threshold_img = lx.img_threshold(shadow_img)
+    stage_dict["low_contrast"], _ = measure(lambda: lx.low_contrast(threshold_img), repeat)
+    stage_dict["shadow_threshold"], shadow_img = measure(lambda: lx.shadow_threshold(shadow_img), repeat)
+    stage_dict["bitwise_and"], result_img  = measure(lambda: lx.merge_img(outline_img, shadow_img), repeat)
+    stage_dict["line_extraction"], _       = measure(lx.line_extraction, repeat)
+
+    if qt_flg:
+        stage_dict["get_qpixmap"], _ = measure(lambda: lx.get_qpixmap(result_img, 640, 360), repeat)
+
+    return stage_dict
+
+
+def bench_batch(mega_pixel, file_num, worker_list, work_dir):
+    """ RunProcessと同じ一括変換のスループットを計測する関数
+
+        Args:
+            mega_pixel (float): 画素数(メガピクセル)
+            file_num (int)    : 変換するファイル数
+            worker_list (list): 計測するワーカープロセス数のリスト
+            work_dir (str)    : 作業フォルダ
+
+        Returns:
+            batch_dict (dict): ワーカー数 → 計測結果の辞書
+    """
+    target_path = os.path.join(work_dir, "target")
+    save_path   = os.path.join(work_dir, "save")
+    os.makedirs(target_path, exist_ok=True)
+    os.makedirs(save_path, exist_ok=True)
+
+    file_list = []
+    for i in range(file_num):
+        img_file = os.path.join(target_path, "img_" + str(i) + ".png")
+        Image.fromarray(cv2.cvtColor(create_image(mega_pixel, SEED + i), cv2.COLOR_BGR2RGB)).save(img_file)
+        file_list.append(img_file)
+
+    batch_dict = {}
+    for worker_num in worker_list:
+        engine = BatchEngine(worker_num)
+        start_time = time.perf_counter()
+        error_num = sum(1 for result in engine.run(file_list, save_path, create_setting_data(True, True), 160, 90) if result.error is not None)
+        seconds = time.perf_counter() - start_time
+
+        batch_dict[str(worker_num)] = {
+            "seconds": seconds,
+            "files_per_sec": file_num / seconds,
+            "mega_pixel_per_sec": file_num * mega_pixel / seconds,
+            "error": error_num,
+            "stage": engine.get_stage_counter_dict(),
+        }
+
+    return batch_dict
+
+
+def init_qt():
+    """ get_qpixmapの計測用にQtを初期化する関数
+
+        Returns:
+            app (QGuiApplication): Qtアプリケーション(PySide6がない場合はNone)
+    """
+    try:
+        from PySide6.QtGui import QGuiApplication
+    except ImportError:
+        return None
+
+    # ディスプレイがない環境でも動くようにする
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    return QGuiApplication.instance() or QGuiApplication(sys.argv[:1])
+
+
+def get_environment():
+    """ 計測環境の情報を取得する関数
+
+        Returns:
+            env_dict (dict): 計測環境の情報
+    """
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "opencv_threads": cv2.getNumThreads(),
+    }
+
+
+def create_parser():
+    """ コマンドライン引数のパーサーを作成する関数
+
+        Returns:
+            parser (ArgumentParser): パーサー
+    """
+    parser = argparse.ArgumentParser(description="LineExtractionの段階別処理時間と一括変換のスループットを計測する")
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 4, 16], help="計測する画素数(メガピクセル、例: 1 4 16 100)")
+    parser.add_argument("--repeat", type=int, default=3, help="各段階の繰り返し回数")
+    parser.add_argument("--batch-files", type=int, default=16, help="一括変換で変換するファイル数(0で一括変換は計測しない)")
+    parser.add_argument("--batch-size", type=float, default=1, help="一括変換で変換する画像の画素数(メガピクセル)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1], help="一括変換で計測するワーカープロセス数")
+    parser.add_argument("-o", "--output", default=None, help="結果を保存するJSONファイルパス(省略時は標準出力)")
+    return parser
+
+
+def main(argv=None):
+    """ ベンチマークを実行する関数
+
+        Args:
+            argv (list): コマンドライン引数(Noneの場合はsys.argv)
+    """
+    args = create_parser().parse_args(argv)
+    qt_app = init_qt()
+
+    result_dict = {
+        "environment": get_environment(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "repeat": args.repeat,
+        "stage": {},
+        "batch": {},
+    }
+
+    for mega_pixel in args.sizes:
+        cv2_img = create_image(mega_pixel)
+        size_dict = {"width": cv2_img.shape[1], "height": cv2_img.shape[0], "flag": {}}
+        for line_flg, shadow_flg in FLAG_LIST:
+            setting_data = create_setting_data(line_flg, shadow_flg)
+            flag_name = "line=" + str(line_flg) + ",shadow=" + str(shadow_flg)
+            size_dict["flag"][flag_name] = bench_stages(cv2_img, setting_data, args.repeat, qt_app is not None)
+        result_dict["stage"][str(mega_pixel) + "MP"] = size_dict
+        del cv2_img
+
+    if args.batch_files > 0:
+        work_dir = tempfile.mkdtemp(prefix="line_extraction_bench_")
+        try:
+            result_dict["batch"] = bench_batch(args.batch_size, args.batch_files, args.workers, work_dir)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    json_str = json.dumps(result_dict, indent=4)
+    if args.output is None:
+        print(json_str)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(json_str)
+
+
+if __name__ == '__main__':
+    # exe化した環境でワーカープロセスを起動するために必要
+    multiprocessing.freeze_support()
+    main()
@@ -0,0 +1,211 @@
+#-*- coding:utf-8 -*-
+from setting_data import load_setting_data
+from batch_engine import BatchEngine
+from result_cache import ResultCache
+from job_manifest import JobManifest
+from scanner import FileScanner
+from image_io import EncodeSetting, ENCODE_FORMAT_DICT, PNG_STRATEGY_DICT
+
+import os, sys, glob, json, argparse, datetime
+import multiprocessing
+
+
+def iter_input_files(input_list, scanner):
+    """ 入力フォルダまたはglobパターンから変換対象のファイルを1件ずつ返すジェネレータ関数
+
+        Args:
+            input_list (list)    : フォルダパスまたはglobパターンのリスト
+            scanner (FileScanner): 変換対象のファイルの絞り込み条件を設定したオブジェクト
+
+        Yields:
+            img_file (str): 変換画像ファイルパス
+            sub_dir (str) : 保存フォルダからの相対フォルダ(フォルダを指定した場合のみサブフォルダの構成を保つ)
+
+        globパターンは保存したファイルに一致しないように、最初の1件を返す前に一覧を作成する。
+    """
+    for input_path in input_list:
+        if os.path.isdir(input_path):
+            yield from scanner.scan(input_path)
+            continue
+
+        for img_file in glob.glob(input_path, recursive=scanner.recursive_flg):
+            name = os.path.basename(img_file)
+            if os.path.isfile(img_file) and scanner.is_target(name, name, lambda: os.stat(img_file)):
+                yield img_file, ""
+
+
+def parse_time(time_str):
+    """ 日時の文字列をUNIX時間に変換する関数
+
+        Args:
+            time_str (str): ISO形式の日時(例: 2024-01-31、2024-01-31T12:00、Noneの場合は制限なし)
+
+        Returns:
+            unix_time (float): UNIX時間(Noneの場合はNone)
+    """
+    if time_str is None:
+        return None
+    return datetime.datetime.fromisoformat(time_str).timestamp()
+
+
+def parse_size(size_kb):
+    """ KB単位のサイズをbyteに変換する関数
+
+        Args:
+            size_kb (int): サイズ(KB、Noneの場合は制限なし)
+
+        Returns:
+            size (int): サイズ(byte、Noneの場合はNone)
+    """
+    if size_kb is None:
+        return None
+    return size_kb * 1024
+
+
+def get_result_name(result):
+    """ ログに表示する変換結果の名前を取得する関数
+
+        Args:
+            result (BatchResult): 変換結果
+
+        Returns:
+            name (str): 入力ファイル名(サブフォルダの場合は相対フォルダ/入力ファイル名、複数の設定値で変換した場合は設定名/入力ファイル名)
+    """
+    name = result.sub_dir + os.path.basename(result.file_name)
+    if result.preset is not None:
+        name = result.preset + "/" + name
+    return name
+
+
+def create_parser():
+    """ コマンドライン引数のパーサーを作成する関数
+
+        Returns:
+            parser (ArgumentParser): パーサー
+    """
+    parser = argparse.ArgumentParser(description="画像から線や影を抽出した画像を一括で生成する")
+    parser.add_argument("-i", "--input", nargs="+", required=True, help="変換フォルダまたはglobパターン")
+    parser.add_argument("-r", "--recursive", action="store_true", help="サブフォルダの画像も変換して、保存フォルダに同じフォルダ構成で保存する")
+    parser.add_argument("--include", nargs="+", default=[], help="対象にするファイル名または相対パスのパターン(例: *.png)")
+    parser.add_argument("--exclude", nargs="+", default=[], help="除外するファイル・フォルダ名または相対パスのパターン")
+    parser.add_argument("--min-size", type=int, default=None, help="対象にする最小ファイルサイズ(KB)")
+    parser.add_argument("--max-size", type=int, default=None, help="対象にする最大ファイルサイズ(KB)")
+    parser.add_argument("--newer", default=None, help="指定した日時以降に更新されたファイルのみ対象にする(例: 2024-01-31T12:00)")
+    parser.add_argument("--older", default=None, help="指定した日時以前に更新されたファイルのみ対象にする")
+    parser.add_argument("-o", "--output", required=True, help="保存フォルダ")
+    parser.add_argument("-p", "--preset", nargs="+", default=["default"], help="設定名(デフォルト: default、複数指定した場合は保存フォルダ/設定名に保存)")
+    parser.add_argument("-s", "--setting", default=None, help="設定ファイルパス(デフォルト: setting.json → default.json)")
+    parser.add_argument("-f", "--format", choices=list(ENCODE_FORMAT_DICT), default="png", help="保存形式(png/png_packed: 1・2・4bitのPNG/tiff_g4: 白黒2値のTIFF/webp: 可逆圧縮のWebP/pgm: 無圧縮のPGM(カラーの場合はPPM))")
+    parser.add_argument("--png-level", type=int, default=3, help="PNGの圧縮レベル(0～9、大きいほど小さく遅い)")
+    parser.add_argument("--png-strategy", choices=list(PNG_STRATEGY_DICT), default="rle", help="PNGの圧縮方式")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="ワーカープロセス数(デフォルト: CPU数)")
+    parser.add_argument("--strip-height", type=int, default=None, help="大きな画像を指定した行数の帯に分割して変換する(無圧縮のPGM/PPM・TIFFはnp.memmapで開く)")
+    parser.add_argument("--read-queue", type=int, default=4, help="1プロセス実行時に読込済み画像を溜めておける枚数")
+    parser.add_argument("--write-queue", type=int, default=4, help="1プロセス実行時に保存待ちの画像を溜めておける枚数")
+    parser.add_argument("--stats", action="store_true", help="段階ごとの処理件数・時間・スループットをJSONで出力する")
+    parser.add_argument("--profile", action="store_true", help="LineExtractionの段階ごとの処理時間と出力サイズをJSONで出力する")
+    parser.add_argument("--unordered", action="store_true", help="完了した順に結果を出力する")
+    parser.add_argument("--cache-dir", default=None, help="変換結果のキャッシュフォルダ(指定した場合のみキャッシュを使用する)")
+    parser.add_argument("--cache-size", type=int, default=1024, help="キャッシュの上限サイズ(MB)")
+    parser.add_argument("--cache-content-hash", action="store_true", help="更新日時ではなくファイル内容のハッシュで同じ入力かを判定する")
+    parser.add_argument("--resume", action="store_true", help="保存フォルダの" + JobManifest.MANIFEST_FILE + "に記録された変換済みのファイルを飛ばして続きから変換する")
+    return parser
+
+
+def main(argv=None):
+    """ コマンドラインから一括処理を実行する関数
+
+        Args:
+            argv (list): コマンドライン引数(Noneの場合はsys.argv)
+
+        Returns:
+            exit_code (int): 終了コード(0/正常終了、1/失敗あり)
+    """
+    args = create_parser().parse_args(argv)
+
+    try:
+        preset_dict = {preset: load_setting_data(preset, args.setting) for preset in args.preset}
+    except Exception as e:
+        print(str(e), file=sys.stderr)
+        return 1
+
+    if not os.path.isdir(args.output):
+        print(args.output + " フォルダが存在しません。", file=sys.stderr)
+        return 1
+
+    scanner = FileScanner()
+    scanner.set_recursive_flg(args.recursive)
+    scanner.set_save_dir(args.output)
+    scanner.set_pattern(args.include, args.exclude)
+    scanner.set_size_range(parse_size(args.min_size), parse_size(args.max_size))
+    try:
+        scanner.set_mtime_range(parse_time(args.newer), parse_time(args.older))
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+
+    # 一覧の作成を待たずに、見つかったファイルから変換する
+    file_list = iter_input_files(args.input, scanner)
+
+    engine = BatchEngine(args.workers)
+    engine.set_ordered_flg(not args.unordered)
+    engine.set_strip_height(args.strip_height)
+    engine.set_queue_size(args.read_queue, args.write_queue)
+    engine.set_profile_flg(args.profile)
+    encode_setting = EncodeSetting()
+    encode_setting.set_format(args.format)
+    encode_setting.set_png_compression(args.png_level, args.png_strategy)
+    engine.set_encode_setting(encode_setting)
+    if args.cache_dir is not None:
+        engine.set_cache(ResultCache(args.cache_dir, args.cache_size * 1024 * 1024, args.cache_content_hash))
+
+    # 変換済みのファイルを記録し、続きから再開する場合は記録済みのファイルを飛ばす
+    manifest = JobManifest(args.output)
+    manifest.open(args.resume)
+    engine.set_manifest(manifest)
+    if args.resume:
+        if len(preset_dict) == 1:
+            hash_dict = engine.get_hash_dict({None: preset_dict[args.preset[0]]})
+        else:
+            hash_dict = engine.get_hash_dict(preset_dict)
+        file_list = manifest.iter_remaining(file_list, hash_dict)
+
+    if len(preset_dict) == 1:
+        result_iter = engine.run(file_list, args.output, preset_dict[args.preset[0]], None, None)
+    else:
+        # 画像を1回だけ読み込んで設定名ごとに変換する
+        result_iter = engine.run_presets(file_list, args.output, preset_dict, None, None)
+
+    error_num = 0
+    total_num = 0
+    try:
+        for result in result_iter:
+            total_num = total_num + 1
+            if result.error is not None:
+                error_num = error_num + 1
+                print("error: " + get_result_name(result) + ": " + result.error, file=sys.stderr)
+            elif result.cache_flg:
+                print("cached: " + result.save_file_name)
+            else:
+                print("saved: " + result.save_file_name)
+    finally:
+        # Ctrl+Cなどで中断した場合もそれまでの記録を残す
+        manifest.close()
+
+    if args.resume:
+        print("skipped: " + str(manifest.skip_num) + " files already converted.")
+    if (total_num == 0) and (manifest.skip_num == 0):
+        print("変換対象の画像がありません。", file=sys.stderr)
+        return 1
+    print(str(total_num - error_num) + "/" + str(total_num) + " files converted.")
+    if args.stats:
+        print(json.dumps(engine.get_stage_counter_dict(), indent=4))
+    if args.profile:
+        print(json.dumps(engine.get_profile_dict(), indent=4))
+    return 0 if error_num == 0 else 1
+
+
+if __name__ == '__main__':
+    # exe化した環境でワーカープロセスを起動するために必要
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,463 @@
+#-*- coding:utf-8 -*-
+import io, os, json, hashlib
+import cv2
+import numpy as np
+from PIL import Image
+
+
+JPEG_EXTENSIONS = (".jpg", ".jpeg") # 縮小読込・グレースケール読込で高速化できる拡張子
+REDUCE_NUM_LIST = (8, 4, 2) # JPEGの縮小読込で使える縮小率(1/n)
+
+# 縮小率 → (カラー、グレースケール)の読込フラグ
+REDUCED_FLAG_DICT = {
+    1: (cv2.IMREAD_COLOR,           cv2.IMREAD_GRAYSCALE),
+    2: (cv2.IMREAD_REDUCED_COLOR_2, cv2.IMREAD_REDUCED_GRAYSCALE_2),
+    4: (cv2.IMREAD_REDUCED_COLOR_4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+    8: (cv2.IMREAD_REDUCED_COLOR_8, cv2.IMREAD_REDUCED_GRAYSCALE_8),
+}
+
+# 保存形式 → 拡張子
+ENCODE_FORMAT_DICT = {
+    "png"       : ".png",  # 8bitのPNG(圧縮レベル・圧縮方式を指定可)
+    "png_packed": ".png",  # 濃淡の数に合わせて1/2/4bitに詰めたパレットPNG
+    "tiff_g4"   : ".tif",  # 白黒2値のTIFF(CCITT Group4圧縮)
+    "webp"      : ".webp", # 可逆圧縮のWebP
+    "pgm"       : ".pgm",  # 無圧縮のPGM(帯状に分割して変換する場合はファイルに直接書き込む)
+}
+
+# 変換後画像がカラーの場合に拡張子を変える保存形式 → 拡張子
+COLOR_EXTENSION_DICT = {
+    "pgm": ".ppm", # カラーの場合は無圧縮のPPM
+}
+
+# PNGの圧縮方式(zlibのstrategy)
+PNG_STRATEGY_DICT = {
+    "default" : cv2.IMWRITE_PNG_STRATEGY_DEFAULT,
+    "filtered": cv2.IMWRITE_PNG_STRATEGY_FILTERED,
+    "huffman" : cv2.IMWRITE_PNG_STRATEGY_HUFFMAN_ONLY,
+    "rle"     : cv2.IMWRITE_PNG_STRATEGY_RLE,
+    "fixed"   : cv2.IMWRITE_PNG_STRATEGY_FIXED,
+}
+
+
+def is_jpeg_file(img_file):
+    """ JPEGファイルかどうかを拡張子で判定する関数
+
+        Args:
+            img_file (str): 画像ファイルパス
+
+        Returns:
+            True/False (bool): JPEGファイルかどうか
+    """
+    return img_file.lower().endswith(JPEG_EXTENSIONS)
+
+
+def to_uint8(img):
+    """ 8bit以外の画像を8bitに変換する関数(8bitの場合はそのまま返す)
+
+        Args:
+            img (ndarray): 画像(16bit・32bit整数は0～65535、浮動小数点は0～1の範囲とみなす)
+
+        Returns:
+            img (ndarray): 8bitの画像
+    """
+    if img.dtype == np.uint8:
+        return img
+    if img.dtype == np.bool_:
+        return img.view(np.uint8) * np.uint8(255)
+    if np.issubdtype(img.dtype, np.floating):
+        return cv2.convertScaleAbs(img, alpha=255)
+    # 16bit(PILの"I"モードの32bit整数も中身は16bit)は四捨五入して1/257にする
+    if img.dtype not in (np.uint16, np.int16, np.int32):
+        img = img.astype(np.float32) # OpenCVで扱えない型(ビッグエンディアンなど)
+    return cv2.convertScaleAbs(img, alpha=1 / 257)
+
+
+def composite_white(img, alpha):
+    """ 透過部分を白背景と合成する関数(imgを上書きする)
+
+        Args:
+            img (ndarray)  : 8bitのグレースケールまたは3チャンネルの画像
+            alpha (ndarray): 8bitの透過度(255が不透明)
+
+        Returns:
+            img (ndarray): 合成後の画像(imgと同じ配列)
+    """
+    if img.ndim == 3:
+        alpha = cv2.cvtColor(alpha, cv2.COLOR_GRAY2BGR)
+    # 白 - (白 - 色) * 透過度
+    np.subtract(255, img, out=img)
+    cv2.multiply(img, alpha, dst=img, scale=1 / 255)
+    np.subtract(255, img, out=img)
+    return img
+
+
+def normalize_image(img, gray_flg, rgb_flg=False):
+    """ 読み込んだ画像を変換に使う形式(8bitのBGR、またはグレースケール)にする関数
+
+        ビット数の変換、透過部分の白背景との合成、グレースケール化(またはカラー化)を
+        それぞれ必要な場合だけ1回ずつ行う。
+
+        Args:
+            img (ndarray)  : 読み込んだ画像(グレースケール、3チャンネル、4チャンネル。8bit以外も可)
+            gray_flg (bool): True/グレースケールにする、False/BGRにする
+            rgb_flg (bool) : True/チャンネル順がRGB(A)、False/BGR(A)
+
+        Returns:
+            cv2_img (img): 変換に使う画像(BGR、またはグレースケールの2次元)
+    """
+    img = to_uint8(img)
+    if (img.ndim == 3) and (img.shape[2] == 1):
+        img = img[:, :, 0]
+
+    if img.ndim == 2:
+        return img if gray_flg else cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+
+    if img.shape[2] == 2:
+        # グレースケール+透過度
+        alpha = img[:, :, 1]
+        img = np.ascontiguousarray(img[:, :, 0]) if gray_flg else cv2.cvtColor(np.ascontiguousarray(img[:, :, 0]), cv2.COLOR_GRAY2BGR)
+    elif img.shape[2] == 4:
+        alpha = img[:, :, 3]
+        if gray_flg:
+            img = cv2.cvtColor(img, cv2.COLOR_RGBA2GRAY if rgb_flg else cv2.COLOR_BGRA2GRAY)
+        else:
+            img = cv2.cvtColor(img, cv2.COLOR_RGBA2BGR if rgb_flg else cv2.COLOR_BGRA2BGR)
+    else:
+        if gray_flg:
+            return cv2.cvtColor(img, cv2.COLOR_RGB2GRAY if rgb_flg else cv2.COLOR_BGR2GRAY)
+        return cv2.cvtColor(img, cv2.COLOR_RGB2BGR) if rgb_flg else img
+
+    # 不透明な画像は合成を省略
+    if alpha.min() < 255:
+        composite_white(img, alpha)
+    return img
+
+
+def read_image_pil(img_file, gray_flg=False):
+    """ PILで画像ファイルを読み込む関数(OpenCVで読み込めない形式用)
+
+        Args:
+            img_file (str) : 画像ファイルパス(またはファイルオブジェクト)
+            gray_flg (bool): True/グレースケールで読み込む、False/カラーで読み込む
+
+        Returns:
+            cv2_img (img): 読み込んだ画像(カラーの場合はBGR、グレースケールの場合は2次元)
+    """
+    pil_img = Image.open(img_file)
+    if pil_img.mode == "P":
+        # パレットは透過色があれば透過度付きで展開する
+        pil_img = pil_img.convert("RGBA" if "transparency" in pil_img.info else "RGB")
+    elif pil_img.mode not in ("L", "LA", "RGB", "RGBA", "I", "I;16", "I;16B", "I;16L", "F"):
+        # 1bit、CMYKなどはPILで8bitに展開する
+        pil_img = pil_img.convert("LA" if "A" in pil_img.getbands() else ("L" if len(pil_img.getbands()) == 1 else "RGB"))
+    return normalize_image(np.asarray(pil_img), gray_flg, True)
+
+
+def read_image(img_file, gray_flg=False, reduce_num=1):
+    """ 画像ファイルを読み込む関数
+
+        OpenCVだとパスに日本語が入っているとダメなので、np.fromfileで読み込んだバイト列をcv2.imdecodeで展開する。
+        JPEGはグレースケールや縮小した状態で直接展開する(色差や高周波成分の展開を省略できる)。
+        それ以外の形式は元のビット数・チャンネル数のまま展開してからnormalize_imageで変換に使う形式にする
+        (透過部分は白背景と合成、16bitは8bitに変換)。縮小読込はJPEGの場合のみ行う。
+
+        Args:
+            img_file (str)  : 画像ファイルパス
+            gray_flg (bool) : True/グレースケールで読み込む(変換後画像が色を使わない場合)、False/カラーで読み込む
+            reduce_num (int): JPEGを読み込む時の縮小率(1/2/4/8、1の場合は縮小しない)
+
+        Returns:
+            cv2_img (img): 読み込んだ画像(カラーの場合は8bitのBGR、グレースケールの場合は8bitの2次元)
+    """
+    buf = np.fromfile(img_file, dtype=np.uint8)
+    cv2_img = decode_buffer(buf, is_jpeg_file(img_file), gray_flg, reduce_num)
+    if cv2_img is None:
+        # OpenCVで展開できない形式はPILで読み込む
+        return read_image_pil(img_file, gray_flg)
+    return cv2_img
+
+
+def decode_buffer(buf, jpeg_flg, gray_flg=False, reduce_num=1):
+    """ 画像ファイルのバイト列をcv2.imdecodeで展開する関数(read_imageを参照)
+
+        Args:
+            buf (ndarray)   : 画像ファイルのバイト列(uint8の1次元配列)
+            jpeg_flg (bool) : JPEGかどうか
+            gray_flg (bool) : True/グレースケールで展開する、False/カラーで展開する
+            reduce_num (int): JPEGを展開する時の縮小率(1/2/4/8、1の場合は縮小しない)
+
+        Returns:
+            cv2_img (img): 展開した画像(OpenCVで展開できない場合はNone)
+    """
+    if jpeg_flg:
+        # EXIFの回転情報はこれまでどおり無視する
+        flags = REDUCED_FLAG_DICT[reduce_num][1 if gray_flg else 0] | cv2.IMREAD_IGNORE_ORIENTATION
+        return cv2.imdecode(buf, flags)
+
+    cv2_img = cv2.imdecode(buf, cv2.IMREAD_UNCHANGED)
+    if cv2_img is not None:
+        cv2_img = normalize_image(cv2_img, gray_flg)
+    return cv2_img
+
+
+def decode_image(data, gray_flg=False):
+    """ メモリ上の画像ファイルのデータを展開する関数(ファイルを介さずに受け取った画像用)
+
+        Args:
+            data (bytes)   : 画像ファイルのデータ
+            gray_flg (bool): True/グレースケールで展開する、False/カラーで展開する
+
+        Returns:
+            cv2_img (img): 展開した画像(カラーの場合は8bitのBGR、グレースケールの場合は8bitの2次元)
+    """
+    # JPEGは先頭の2バイトで判定する
+    cv2_img = decode_buffer(np.frombuffer(data, dtype=np.uint8), data[:2] == b"\xff\xd8", gray_flg)
+    if cv2_img is None:
+        return read_image_pil(io.BytesIO(data), gray_flg)
+    return cv2_img
+
+
+def get_reduce_num(width, height, w, h):
+    """ 縮小プレビュー用に、プレビューサイズを下回らない最大の縮小率を取得する関数
+
+        Args:
+            width (int) : 画像のwidth
+            height (int): 画像のheight
+            w (int): プレビューのwidth
+            h (int): プレビューのheight
+
+        Returns:
+            reduce_num (int): 縮小率(1/2/4/8)
+    """
+    # プレビュー画面に収まるように縮小する時の縮小率(get_preview_sizeと同じ)
+    ratio = max(width / w, height / h)
+    for reduce_num in REDUCE_NUM_LIST:
+        if reduce_num <= ratio:
+            return reduce_num
+    return 1
+
+
+class EncodeSetting():
+    """ 変換後画像の保存形式を保持するクラス
+
+        変換後画像はほぼ白黒の線画なので、初期値は圧縮率より速度を優先した
+        圧縮レベル3・RLE方式の8bitのPNGにする。
+    """
+
+    def __init__(self):
+        """ コンストラクタ
+        """
+        self.format       = "png"
+        self.png_level    = 3     # PNGの圧縮レベル(0～9)
+        self.png_strategy = "rle" # PNGの圧縮方式(PNG_STRATEGY_DICTのキー)
+
+
+    def set_format(self, format_name):
+        """ 保存形式を設定する関数
+
+            Args:
+                format_name (str): 保存形式(ENCODE_FORMAT_DICTのキー)
+
+            Raises:
+                ValueError: 対応していない保存形式の場合
+        """
+        if format_name not in ENCODE_FORMAT_DICT:
+            raise ValueError("unknown format: " + str(format_name))
+        self.format = format_name
+
+
+    def set_png_compression(self, png_level, png_strategy):
+        """ PNGの圧縮レベルと圧縮方式を設定する関数
+
+            Args:
+                png_level (int)   : 圧縮レベル(0～9)
+                png_strategy (str): 圧縮方式(PNG_STRATEGY_DICTのキー)
+
+            Raises:
+                ValueError: 対応していない圧縮方式の場合
+        """
+        if png_strategy not in PNG_STRATEGY_DICT:
+            raise ValueError("unknown png strategy: " + str(png_strategy))
+        self.png_level    = min(max(int(png_level), 0), 9)
+        self.png_strategy = png_strategy
+
+
+    def get_extension(self, color_flg=False):
+        """ 保存形式の拡張子を取得する関数
+
+            Args:
+                color_flg (bool): 変換後画像がカラーかどうか
+
+            Returns:
+                extension (str): 拡張子(.付き)
+        """
+        if color_flg and (self.format in COLOR_EXTENSION_DICT):
+            return COLOR_EXTENSION_DICT[self.format]
+        return ENCODE_FORMAT_DICT[self.format]
+
+
+    def to_dict(self):
+        """ 保存形式を辞書型で取得する関数
+
+            Returns:
+                encode_dict (dict): 保存形式の辞書
+        """
+        return {"format": self.format, "png_level": self.png_level, "png_strategy": self.png_strategy}
+
+
+    def get_hash(self):
+        """ 保存形式のハッシュを取得する関数(変換結果のキャッシュや再開判定のキーに使う)
+
+            Returns:
+                hash (str): 保存形式のハッシュ文字列
+        """
+        json_str = json.dumps(self.to_dict(), sort_keys=True)
+        return hashlib.sha1(json_str.encode("utf-8")).hexdigest()
+
+
+def get_gray_levels(img):
+    """ グレースケール画像に使われている濃淡の値の一覧を取得する関数
+
+        Args:
+            img (ndarray): 8bitのグレースケール画像
+
+        Returns:
+            level_list (ndarray): 使われている値(昇順)
+    """
+    hist = cv2.calcHist([img], [0], None, [256], [0, 256])
+    return np.flatnonzero(hist)
+
+
+def encode_png(img, encode_setting):
+    """ OpenCVで8bitのPNGに圧縮する関数(RGBへの変換はせず、グレースケールはそのまま1チャンネルで保存する)
+
+        Args:
+            img (ndarray): 8bitのBGR、またはグレースケールの画像
+            encode_setting (EncodeSetting): 保存形式
+
+        Returns:
+            buf (ndarray): 圧縮したバイト列
+    """
+    params = [cv2.IMWRITE_PNG_COMPRESSION, encode_setting.png_level,
+              cv2.IMWRITE_PNG_STRATEGY, PNG_STRATEGY_DICT[encode_setting.png_strategy]]
+    ret, buf = cv2.imencode(".png", img, params)
+    if not ret:
+        raise IOError("png encode failed")
+    return buf
+
+
+def write_packed_png(img, level_list, save_file, encode_setting):
+    """ 濃淡の数に合わせて1/2/4bitに詰めたパレットPNGで保存する関数
+
+        Args:
+            img (ndarray)       : 8bitのグレースケール画像
+            level_list (ndarray): 使われている値(16個以下)
+            save_file (str)     : 保存ファイルパス(またはファイルオブジェクト)
+            encode_setting (EncodeSetting): 保存形式
+    """
+    bits = 1 if len(level_list) <= 2 else (2 if len(level_list) <= 4 else 4)
+    # 値 → パレット番号の変換表
+    lut = np.zeros(256, dtype=np.uint8)
+    lut[level_list] = np.arange(len(level_list), dtype=np.uint8)
+    index_img = cv2.LUT(img, lut)
+
+    pil_img = Image.frombuffer("P", (img.shape[1], img.shape[0]), index_img, "raw", "P", 0, 1)
+    pil_img.putpalette(np.repeat(level_list, 3).astype(np.uint8).tobytes())
+    pil_img.save(save_file, format="PNG", bits=bits, compress_level=encode_setting.png_level)
+
+
+def write_tiff_g4(img, level_list, save_file):
+    """ 白黒2値のTIFF(CCITT Group4圧縮)で保存する関数
+
+        2値の場合は暗い方を黒、明るい方を白にする。
+
+        Args:
+            img (ndarray)       : 8bitのグレースケール画像
+            level_list (ndarray): 使われている値(2個以下)
+            save_file (str)     : 保存ファイルパス(またはファイルオブジェクト)
+    """
+    bw_img = img >= level_list[-1] if len(level_list) == 2 else img >= 128
+    pil_img = Image.fromarray(bw_img)
+    pil_img.save(save_file, format="TIFF", compression="group4")
+
+
+def write_buffer(buf, save_file):
+    """ 圧縮したバイト列を書き込む関数
+
+        Args:
+            buf (ndarray)  : 圧縮したバイト列
+            save_file (str): 保存ファイルパス(またはファイルオブジェクト)
+    """
+    if isinstance(save_file, str):
+        buf.tofile(save_file)
+    else:
+        save_file.write(buf.tobytes())
+
+
+def write_image(result_img, save_file, encode_setting=None):
+    """ 変換後画像を保存形式に合わせて保存する関数
+
+        OpenCVだとパスに日本語が入っているとダメなので、cv2.imencodeで圧縮したバイト列をtofileで書き込む。
+        1/2/4bitのPNGは濃淡が16個以下、TIFF(Group4)は2値のグレースケール画像の場合のみで、
+        それ以外の画像は8bitのPNG(TIFFの場合はLZW圧縮のTIFF)で保存する。
+        PGMはカラー画像の場合はPPM(P6)で保存し、保存ファイルに対応付けたnp.memmapの場合は書き出すだけにする。
+
+        Args:
+            result_img (img): 変換後画像(BGR、またはグレースケールの2次元)
+            save_file (str) : 保存ファイルパス(またはファイルオブジェクト)
+            encode_setting (EncodeSetting): 保存形式(Noneの場合は初期値)
+    """
+    if encode_setting is None:
+        encode_setting = EncodeSetting()
+
+    gray_flg = result_img.ndim == 2
+    if encode_setting.format == "png_packed" and gray_flg:
+        level_list = get_gray_levels(result_img)
+        if len(level_list) <= 16:
+            write_packed_png(result_img, level_list, save_file, encode_setting)
+            return
+    elif encode_setting.format == "tiff_g4":
+        level_list = get_gray_levels(result_img) if gray_flg else None
+        if gray_flg and len(level_list) <= 2:
+            write_tiff_g4(result_img, level_list, save_file)
+            return
+        ret, buf = cv2.imencode(".tif", result_img, [cv2.IMWRITE_TIFF_COMPRESSION, cv2.IMWRITE_TIFF_COMPRESSION_LZW])
+        if not ret:
+            raise IOError("tiff encode failed")
+        write_buffer(buf, save_file)
+        return
+    elif encode_setting.format == "pgm":
+        if isinstance(result_img, np.memmap) and isinstance(save_file, str) and (result_img.filename == os.path.abspath(save_file)):
+            # 変換時に保存ファイルへ直接書き込んだ画像
+            result_img.flush()
+            return
+        ret, buf = cv2.imencode(".pgm" if gray_flg else ".ppm", result_img)
+        if not ret:
+            raise IOError("pgm encode failed")
+        write_buffer(buf, save_file)
+        return
+    elif encode_setting.format == "webp":
+        # 品質101以上で可逆圧縮になる
+        ret, buf = cv2.imencode(".webp", result_img, [cv2.IMWRITE_WEBP_QUALITY, 101])
+        if not ret:
+            raise IOError("webp encode failed")
+        write_buffer(buf, save_file)
+        return
+
+    write_buffer(encode_png(result_img, encode_setting), save_file)
+
+
+def encode_image(result_img, encode_setting=None):
+    """ 変換後画像を保存形式のファイルのデータに圧縮する関数(ファイルを介さずに返す場合用)
+
+        Args:
+            result_img (img): 変換後画像(BGR、またはグレースケールの2次元)
+            encode_setting (EncodeSetting): 保存形式(Noneの場合は初期値)
+
+        Returns:
+            data (bytes): 保存形式のファイルのデータ
+    """
+    f = io.BytesIO()
+    write_image(result_img, f, encode_setting)
+    return f.getvalue()
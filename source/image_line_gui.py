@@ -1,12 +1,12 @@
 #-*- coding:utf-8 -*-
-from setting_data import SettingData
+from setting_data import SettingData, load_json_file
 from line_extraction import LineExtraction
+from preview_process import PreviewProcess
 from batch import BatchGui
+from sweep_gui import SweepGui
+from image_io import EncodeSetting, read_image, write_image
 
 import os, sys, copy, json
-import cv2
-import numpy as np
-from PIL import Image
 from PySide6.QtWidgets import *
 from PySide6.QtCore import *
 from PySide6.QtGui import *
@@ -22,7 +22,16 @@ class ImageLineGui(QDialog):
     NO_IMG_PATH = "img/no_image.png"
     PREVIEW_WIDTH  = 640
     PREVIEW_HEIGHT = 360
+    LIVE_PREVIEW_DELAY = 300 # 自動プレビューで値変更から変換開始までの待ち時間(ms)
     SAVE_FILE_DEFAULT = "./outline.png"
+    # 画像保存ダイアログのファイルの種類 → 保存形式(EncodeSetting.set_format)
+    SAVE_FILTER_DICT = {
+        "PNG形式 (*.png)"                : "png",
+        "PNG形式 1/2/4bit (*.png)"       : "png_packed",
+        "TIFF形式 白黒2値 G4 (*.tif)"    : "tiff_g4",
+        "WebP形式 可逆圧縮 (*.webp)"     : "webp",
+        "PGM形式 無圧縮 (*.pgm)"         : "pgm",
+    }
     SAVE_SETTING_FILE = "/setting.json"
     DEFAULT_SETTING_FILE = "json/default.json"
     CENTER = Qt.AlignmentFlag.AlignCenter
@@ -38,8 +47,24 @@ class ImageLineGui(QDialog):
             self.setWindowIcon(QPixmap(self.temp_path('img/icon.ico')))
 
         self.line_extraction = LineExtraction() # 画像変換用オブジェクト
+
+        # プレビュー変換を別スレッドで実行するプロセス
+        self.preview_process = PreviewProcess(self)
+        self.preview_process.set_pre_size(self.PREVIEW_WIDTH, self.PREVIEW_HEIGHT)
+        self.preview_process.preview_thread.connect(self.show_preview)
+        self.preview_process.start()
+        self.finished.connect(self.stop_preview_process) # 「×」やEscで閉じた時に停止
+        self.preview_no = 0 # 表示を待っているプレビューの要求番号
+
+        # 自動プレビュー用のタイマー(値の連続変更をまとめてから変換する)
+        self.live_timer = QTimer(self)
+        self.live_timer.setSingleShot(True)
+        self.live_timer.setInterval(self.LIVE_PREVIEW_DELAY)
+        self.live_timer.timeout.connect(self.img_preview)
         self.batch_form = BatchGui(self)
         self.batch_form.hide()
+        self.sweep_form = SweepGui(self)
+        self.sweep_form.hide()
 
         # 実行ファイルパスと設定ファイルパス
         self.my_dir_path = os.path.abspath(os.path.dirname(sys.argv[0]))
@@ -50,6 +75,8 @@ class ImageLineGui(QDialog):
 
         self.img_org = None # 加工元のオリジナルの画像
         self.img     = None # 加工後の画像
+        self.img_setting   = None  # 加工後の画像の変換に使った設定値
+        self.img_proxy_flg = False # 加工後の画像が縮小プレビューかどうか
 
         # Widgetsの設定(タイトル、固定横幅、固定縦幅)
         self.setWindowTitle(self.TITLE)
@@ -160,11 +187,10 @@ class ImageLineGui(QDialog):
         setting_element_layout.addLayout(checkbox_layout, 1)
 
         # 画像プレビュー部分
-        img_org = np.array(Image.open(self.temp_path(self.NO_IMG_PATH)))
-        # RGBに変換する
-        cv2_img = cv2.cvtColor(img_org, cv2.COLOR_BGR2RGB)
+        cv2_img = read_image(self.temp_path(self.NO_IMG_PATH))
         # 読み込んだオリジナル画像をクラス変数に代入
         self.img_org = copy.deepcopy(cv2_img)
+        self.preview_process.set_image(self.img_org)
         img = self.line_extraction.get_qpixmap(cv2_img, self.PREVIEW_WIDTH, self.PREVIEW_HEIGHT)
         img_layout = QHBoxLayout()
         self.img_label = QLabel()
@@ -185,12 +211,21 @@ class ImageLineGui(QDialog):
         self.batch_btn = QPushButton("一括処理")
         self.batch_btn.clicked.connect(self.batch_dialog)
         self.batch_btn.setEnabled(True)
+        self.sweep_btn = QPushButton("比較")
+        self.sweep_btn.clicked.connect(self.sweep_dialog)
+        self.live_checkbox = QCheckBox("自動")
+        self.live_checkbox.stateChanged.connect(self.live_preview)
+        self.proxy_checkbox = QCheckBox("縮小")
+        self.proxy_checkbox.stateChanged.connect(self.live_preview)
         btn_layout.addWidget(QLabel(""), 1)
         btn_layout.addWidget(self.pre_btn, 2)
+        btn_layout.addWidget(self.live_checkbox, 1)
+        btn_layout.addWidget(self.proxy_checkbox, 1)
         btn_layout.addWidget(QLabel(""), 1)
         btn_layout.addWidget(self.save_btn, 2)
         btn_layout.addWidget(QLabel(""), 1)
         btn_layout.addWidget(self.batch_btn, 2)
+        btn_layout.addWidget(self.sweep_btn, 1)
         btn_layout.addWidget(QLabel(""), 1)
 
         # レイアウトを作成して各要素を配置
@@ -209,6 +244,13 @@ class ImageLineGui(QDialog):
         # レイアウトを画面に設定
         self.setLayout(layout)
 
+        # 値が変更されたら自動プレビューを実行
+        for sp in [self.outline_low_sp, self.outline_high_sp, self.outline_rough_sp, self.outline_blur_sp,
+                   self.blur_sp, self.contrast_low_sp, self.contrast_high_sp]:
+            sp.valueChanged.connect(self.live_preview)
+        self.line_checkbox.stateChanged.connect(self.live_preview)
+        self.shadow_checkbox.stateChanged.connect(self.live_preview)
+
         # プルダウンの設定値を設定
         self.set_setting_list()
 
@@ -466,16 +508,17 @@ class ImageLineGui(QDialog):
     def img_dialog(self):
         """ 画像選択ダイアログを表示する関数
         """
-        file_open_flg = self.filedialog_clicked(self.img_path, "画像ファイル選択", "Images(*.png *.bmp *.jpg *.jpeg)")
+        file_open_flg = self.filedialog_clicked(self.img_path, "画像ファイル選択", "Images(*.png *.bmp *.jpg *.jpeg *.tif *.tiff *.pgm *.ppm *.pnm)")
 
         if (file_open_flg):
             try:
-                # OpenCVだとパスに日本語が入っているとダメなのでnumpyで開く
-                img_org = np.array(Image.open(self.img_path.text()))
-                # RGBに変換する
-                cv2_img = cv2.cvtColor(img_org, cv2.COLOR_BGR2RGB)
+                # 表示に元画像の色を使うのでカラーで読み込む
+                cv2_img = read_image(self.img_path.text())
                 # 読み込んだオリジナル画像をクラス変数に代入
                 self.img_org = copy.deepcopy(cv2_img)
+                # 縮小プレビューはファイルから縮小して読み込めるようにパスも渡す
+                self.preview_process.set_image(self.img_org, self.img_path.text())
+                self.live_preview()
                 # プレビューに表示できる形式にして表示
                 img = self.line_extraction.get_qpixmap(cv2_img, self.PREVIEW_WIDTH, self.PREVIEW_HEIGHT)
                 self.img_label.setPixmap(img)
@@ -518,15 +561,49 @@ class ImageLineGui(QDialog):
     def img_preview(self):
         """ プレビューを実行する関数
         """
-        self.img = copy.deepcopy(self.img_org)
-        # 画像を変換
-        self.line_extraction.set_image_setting(self.img, self.create_setting_data())
-        self.img = self.line_extraction.line_extraction()
+        self.live_timer.stop()
+        # 別スレッドに変換を要求(結果はshow_previewで受け取る)
+        self.preview_no = self.preview_process.request_preview(self.create_setting_data(), self.proxy_checkbox.isChecked())
+        # 変換が終わるまでは保存ボタンを非活性化
+        self.save_btn.setEnabled(False)
+
+
+    def live_preview(self):
+        """ 自動プレビューが有効な場合に、値変更をまとめてからプレビューを実行する関数
+        """
+        if self.live_checkbox.isChecked() and self.pre_btn.isEnabled():
+            self.live_timer.start() # 連続して変更された場合は待ち時間をリセット
+
+
+    def show_preview(self, result):
+        """ 別スレッドで変換したプレビューを表示する関数
+
+            Args:
+                result (PreviewResult): プレビュー処理の結果
+        """
+        # 最新の要求以外の結果は表示しない
+        if result.request_no != self.preview_no:
+            return
+
+        if result.error is not None:
+            QMessageBox.warning(self, "注意", "変換でエラーが発生しました。\n\n" + result.error)
+            return
+
+        self.img = result.result_img
+        self.img_setting = result.setting_data
+        self.img_proxy_flg = result.proxy_flg
         # プレビューに表示できる形式にして表示
-        img = self.line_extraction.get_qpixmap(self.img, self.PREVIEW_WIDTH, self.PREVIEW_HEIGHT)
+        img = self.line_extraction.get_qpixmap(result.pre_img, self.PREVIEW_WIDTH, self.PREVIEW_HEIGHT)
         self.img_label.setPixmap(img)
-        # プレビューを実行したら保存ボタンを活性化
-        self.save_btn.setEnabled(True)
+        # プレビューを実行したら保存ボタンを活性化(一括処理中は除く)
+        self.save_btn.setEnabled(self.batch_btn.isEnabled())
+
+
+    def stop_preview_process(self):
+        """ 画面が閉じられる時にプレビュー用のスレッドを停止する関数
+        """
+        self.preview_process.stop()
+        self.preview_process.wait()
 
 
     def create_setting_data(self):
@@ -555,6 +632,20 @@ class ImageLineGui(QDialog):
         return setting_data
 
 
+    def create_preset_dict(self):
+        """ 保存されている設定値から設定名ごとの変換用設定値のオブジェクトを作成する関数
+
+            Returns:
+                preset_dict (dict): 設定名 → 変換用設定値オブジェクトの辞書
+        """
+        preset_dict = {}
+        for name, setting_dict in self.setting_data.items():
+            setting_data = SettingData()
+            setting_data.set_setting_dict(setting_dict)
+            preset_dict[name] = setting_data
+        return preset_dict
+
+
     def load_json_file(self, json_path):
         """ jsonファイルを辞書型で読み込む関数
 
@@ -564,19 +655,7 @@ class ImageLineGui(QDialog):
             Returns:
                 json_data (dict): jsonファイルの辞書
         """
-        json_data = None
-
-        # ファイルのエンコードを設定
-        encording_str = "utf-8"
-        if sys.platform.startswith('win'):
-            encording_str = "utf-8_sig"
-
-        # jsonファイルを辞書として読み込み
-        if os.path.exists(json_path):
-            with open(json_path, "r", encoding=encording_str) as f:
-                json_data = json.load(f)
-
-        return json_data
+        return load_json_file(json_path)
 
 
     def save_json_file(self, json_path, json_data):
@@ -602,12 +681,27 @@ class ImageLineGui(QDialog):
         else:
             path = os.path.split(path)[0]
 
-        file_path, _ = QFileDialog.getSaveFileName(self, "画像保存", path + self.SAVE_FILE_DEFAULT, "PNG形式 (*.png)")
+        file_path, selected_filter = QFileDialog.getSaveFileName(self, "画像保存", path + self.SAVE_FILE_DEFAULT, ";;".join(self.SAVE_FILTER_DICT))
 
         if file_path != "":
             try:
-                pil_img = Image.fromarray(cv2.cvtColor(self.img, cv2.COLOR_BGR2RGB))
-                pil_img.save(file_path)
+                img = self.img
+                if self.img_proxy_flg:
+                    # 縮小プレビューの場合は保存時にフル解像度で変換する
+                    QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+                    try:
+                        self.line_extraction.set_image_setting(self.img_org, self.img_setting)
+                        img = self.line_extraction.line_extraction()
+                    finally:
+                        QApplication.restoreOverrideCursor()
+
+                encode_setting = EncodeSetting()
+                encode_setting.set_format(self.SAVE_FILTER_DICT.get(selected_filter, "png"))
+                # 拡張子を保存形式に合わせる(PGMでカラーの場合はPPM)
+                extension = encode_setting.get_extension(img.ndim == 3)
+                if os.path.splitext(file_path)[1].lower() != extension:
+                    file_path = os.path.splitext(file_path)[0] + extension
+                write_image(img, file_path, encode_setting)
                 QMessageBox.information(self, "正常終了", file_path + " に画像を保存しました。")
             except Exception as e:
                 QMessageBox.warning(self, "注意", "画像保存でエラーが発生しました。\n\n" + str(e))
@@ -619,11 +713,19 @@ class ImageLineGui(QDialog):
         # フォームを表示
         self.batch_form.clear_pre_log()
         self.batch_form.set_setting_data(self.create_setting_data())
+        self.batch_form.set_preset_dict(self.create_preset_dict())
         self.batch_form.set_close_fnc(self.set_gui_enabled, self.pre_btn.isEnabled(), self.save_btn.isEnabled())
         self.set_gui_enabled(False, False, False)
         self.batch_form.show()
 
 
+    def sweep_dialog(self):
+        """ 設定値の比較ダイアログを表示させる関数(現在の画像と設定値を基準にする)
+        """
+        self.sweep_form.set_image_setting(self.img_org, self.create_setting_data())
+        self.sweep_form.exec()
+
+
     def set_gui_enabled(self, flg, pre_flg, save_flg):
         """ GUIの有効/無効を設定する関数
 
@@ -646,7 +748,10 @@ class ImageLineGui(QDialog):
         self.contrast_high_sp.setEnabled(flg)
         self.line_checkbox.setEnabled(flg)
         self.shadow_checkbox.setEnabled(flg)
+        self.live_checkbox.setEnabled(flg)
+        self.proxy_checkbox.setEnabled(flg)
 
         self.pre_btn.setEnabled(pre_flg)
         self.save_btn.setEnabled(save_flg)
         self.batch_btn.setEnabled(flg)
+        self.sweep_btn.setEnabled(flg)
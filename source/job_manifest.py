@@ -0,0 +1,142 @@
+#-*- coding:utf-8 -*-
+import os, json
+
+
+class JobManifest():
+    """ 一括処理で変換が完了したファイルを記録して、中断した処理を続きから再開するためのクラス
+
+        保存フォルダのマニフェストファイルに、完了した1件ごとに
+        入力ファイル(パス、更新日時、サイズ)、設定名、設定値のハッシュ、保存ファイル名を1行のJSONで追記する。
+        追記するたびに書き出すため、途中で異常終了した場合もそれまでの記録は残る
+        (書きかけの最終行は読み込み時に無視する)。
+    """
+    MANIFEST_FILE = "manifest.jsonl"
+
+
+    def __init__(self, save_path):
+        """ コンストラクタ
+
+            Args:
+                save_path (str): 保存フォルダ
+        """
+        self.save_path     = save_path
+        self.manifest_file = os.path.join(save_path, self.MANIFEST_FILE)
+        self.record_dict   = {} # (入力ファイルパス, 設定名) → 記録の辞書
+        self.skip_num      = 0  # iter_remainingで飛ばした変換済みのファイル数
+        self.f             = None
+
+
+    def open(self, resume_flg):
+        """ マニフェストファイルを開く関数
+
+            Args:
+                resume_flg (bool): True/既存の記録を読み込んで追記する、False/記録を破棄して新しく作成する
+        """
+        self.close()
+        self.record_dict = {}
+        if resume_flg:
+            self.load()
+            self.f = open(self.manifest_file, "a", encoding="utf-8")
+        else:
+            self.f = open(self.manifest_file, "w", encoding="utf-8")
+
+
+    def close(self):
+        """ マニフェストファイルを閉じる関数
+        """
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+
+
+    def load(self):
+        """ マニフェストファイルの記録を読み込む関数(ファイルがない場合は何もしない)
+        """
+        if not os.path.exists(self.manifest_file):
+            return
+
+        with open(self.manifest_file, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    self.record_dict[(record["input"], record["preset"])] = record
+                except (ValueError, KeyError, TypeError):
+                    continue # 書きかけの行は無視
+
+
+    def get_input_info(self, img_file):
+        """ 入力ファイルを識別する情報を取得する関数
+
+            Args:
+                img_file (str): 入力ファイルパス
+
+            Returns:
+                input_path (str): 絶対パス
+                mtime (int)     : 更新日時(ns)
+                size (int)      : サイズ
+        """
+        stat = os.stat(img_file)
+        return os.path.abspath(img_file), stat.st_mtime_ns, stat.st_size
+
+
+    def add(self, result, setting_hash):
+        """ 変換が完了した1件を記録する関数
+
+            Args:
+                result (BatchResult): 変換結果(正常に保存できたもの)
+                setting_hash (str)  : 変換に使用した設定値のハッシュ
+        """
+        input_path, mtime, size = self.get_input_info(result.file_name)
+        record = {
+            "input"       : input_path,
+            "mtime"       : mtime,
+            "size"        : size,
+            "preset"      : result.preset,
+            "setting_hash": setting_hash,
+            "output"      : result.save_file_name,
+        }
+        self.record_dict[(input_path, result.preset)] = record
+        self.f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.f.flush()
+
+
+    def is_done(self, img_file, hash_dict):
+        """ 入力ファイルが同じ設定値ですべて変換済みかを判定する関数
+
+            Args:
+                img_file (str)  : 入力ファイルパス
+                hash_dict (dict): 設定名 → 設定値のハッシュの辞書(1つの設定値のみで変換する場合の設定名はNone)
+
+            Returns:
+                True/False (bool): 変換済みかどうか(入力ファイルが更新された場合や保存ファイルがない場合はFalse)
+        """
+        try:
+            input_path, mtime, size = self.get_input_info(img_file)
+        except OSError:
+            return False
+
+        for preset, setting_hash in hash_dict.items():
+            record = self.record_dict.get((input_path, preset))
+            if (record is None) or (record["setting_hash"] != setting_hash) or (record["mtime"] != mtime) or (record["size"] != size):
+                return False
+            if not os.path.exists(os.path.join(self.save_path, record["output"])):
+                return False
+        return True
+
+
+    def iter_remaining(self, file_iter, hash_dict):
+        """ 変換済みのファイルを飛ばして返すジェネレータ関数(飛ばした数はskip_numに数える)
+
+            Args:
+                file_iter (iterable): (変換画像ファイルパス, 保存フォルダからの相対フォルダ)の一覧
+                hash_dict (dict)    : 設定名 → 設定値のハッシュの辞書(1つの設定値のみで変換する場合の設定名はNone)
+
+            Yields:
+                item (tuple): まだ変換していない(変換画像ファイルパス, 保存フォルダからの相対フォルダ)
+        """
+        self.skip_num = 0
+        for item in file_iter:
+            if self.is_done(item[0], hash_dict):
+                self.skip_num += 1
+            else:
+                yield item
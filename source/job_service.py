@@ -0,0 +1,400 @@
+#-*- coding:utf-8 -*-
+from setting_data import SettingData, load_setting_data
+from line_extraction import LineExtraction
+from workspace import Workspace
+from image_io import EncodeSetting, read_image, decode_image, write_image, encode_image
+
+import os, sys, json, time, base64, asyncio, argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+# ワーカープロセスごとに保持する画像変換用オブジェクト
+worker_line_extraction = None
+
+
+def init_service_worker():
+    """ ワーカープロセスの初期化関数(プロセスごとにLineExtractionを作成する)
+    """
+    global worker_line_extraction
+    worker_line_extraction = LineExtraction()
+    # 同じサイズの画像が続く場合に作業用の配列を使い回す
+    worker_line_extraction.set_workspace(Workspace())
+
+
+def run_job(job_dict, setting_data, encode_setting):
+    """ 1件のジョブを変換する関数(ワーカープロセスで実行される)
+
+        Args:
+            job_dict (dict): ジョブの内容("input"/画像ファイルパス、または"data"/画像ファイルのデータ、
+                             "output"/保存ファイルパス(省略した場合は変換後画像のデータを返す))
+            setting_data (SettingData): 設定値オブジェクト
+            encode_setting (EncodeSetting): 保存形式
+
+        Returns:
+            ret_dict (dict): 変換結果("output"/保存ファイルパス、または"data"/変換後画像のデータ、
+                             "width"、"height"、"time"/段階名 → 処理時間(秒)の辞書)
+    """
+    time_dict = {}
+    # 変換後画像に色を使わない場合はグレースケールで読み込む
+    gray_flg = not setting_data.is_color_output()
+
+    start_time = time.perf_counter()
+    if job_dict.get("input") is not None:
+        cv2_img = read_image(job_dict["input"], gray_flg)
+    else:
+        cv2_img = decode_image(job_dict["data"], gray_flg)
+    time_dict["read"] = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    worker_line_extraction.set_image_setting(cv2_img, setting_data)
+    result_img = worker_line_extraction.line_extraction()
+    time_dict["process"] = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    ret_dict = {"width": result_img.shape[1], "height": result_img.shape[0]}
+    if job_dict.get("output") is not None:
+        write_image(result_img, job_dict["output"], encode_setting)
+        ret_dict["output"] = job_dict["output"]
+    else:
+        ret_dict["data"] = encode_image(result_img, encode_setting)
+    time_dict["write"] = time.perf_counter() - start_time
+
+    ret_dict["time"] = time_dict
+    return ret_dict
+
+
+class ServiceJob():
+    """ 受け付けた1件のジョブを保持するクラス
+    """
+
+    def __init__(self, job_id, job_dict, setting_data, encode_setting, send):
+        """ コンストラクタ
+
+            Args:
+                job_id (str)  : ジョブID
+                job_dict (dict): ワーカープロセスに渡すジョブの内容(run_jobを参照)
+                setting_data (SettingData): 設定値オブジェクト
+                encode_setting (EncodeSetting): 保存形式
+                send (function): 依頼元に応答を送るコルーチン関数
+        """
+        self.job_id         = job_id
+        self.job_dict       = job_dict
+        self.setting_data   = setting_data
+        self.encode_setting = encode_setting
+        self.send           = send
+        self.accept_time    = time.perf_counter() # 受付時刻
+
+
+class JobService():
+    """ ローカルのソケットで画像変換のジョブを受け付けて、プロセスプールで変換するサービスクラス
+
+        1行1ジョブのJSONで依頼を受け取り、受付・完了(または失敗)をそれぞれ1行のJSONで順に返す。
+        受け付けたジョブは上限付きのキューに入れ、キューがいっぱいの間は依頼元からの読込を止める
+        (依頼元の送信が詰まることで流量を抑える)。待たずに断る設定の場合は"rejected"を返す。
+        同時に変換するジョブの数は同時実行数までに制限する。
+
+        依頼の例:
+            {"id": "1", "input": "a.jpg", "output": "ol_a.png", "preset": "default"}
+            {"id": "2", "data": "<base64>", "setting": {...}, "format": "png_packed"}
+
+        応答の例:
+            {"id": "1", "status": "queued", "queue_num": 1}
+            {"id": "1", "status": "done", "output": "ol_a.png", "width": 640, "height": 480,
+             "time": {"queue": 0.0, "read": 0.01, "process": 0.05, "write": 0.02, "total": 0.09}}
+            {"id": "2", "status": "error", "error": "..."}
+            {"id": "3", "status": "rejected", "error": "queue is full"}
+    """
+    DEFAULT_HOST = "127.0.0.1"
+    DEFAULT_PORT = 8765
+    DEFAULT_QUEUE_SIZE = 16 # 変換待ちのジョブを溜めておける数
+    LINE_LIMIT = 256 * 1024 * 1024 # 1行(画像データを含む依頼・応答)の最大サイズ(byte)
+
+
+    def __init__(self, worker_num=None, concurrency=None, queue_size=DEFAULT_QUEUE_SIZE, setting_path=None, reject_flg=False):
+        """ コンストラクタ
+
+            Args:
+                worker_num (int) : ワーカープロセス数(Noneの場合はCPU数)
+                concurrency (int): 同時に変換するジョブの数(Noneの場合はワーカープロセス数)
+                queue_size (int) : 変換待ちのジョブを溜めておける数
+                setting_path (str): 設定名で指定された場合の設定ファイルパス(Noneの場合はsetting.json → default.json)
+                reject_flg (bool): True/キューがいっぱいの場合は待たずに断る、False/空くまで依頼元からの読込を止める
+        """
+        self.worker_num   = max(1, int(worker_num or os.cpu_count() or 1))
+        self.concurrency  = max(1, int(concurrency or self.worker_num))
+        self.queue_size   = max(1, queue_size)
+        self.setting_path = setting_path
+        self.reject_flg   = reject_flg
+        self.preset_dict  = {} # 読込済みの設定名 → 設定値オブジェクトの辞書
+        self.job_queue    = None
+        self.executor     = None
+        self.server       = None
+        self.task_list    = [] # ジョブを取り出して変換するタスクのリスト
+        self.client_set   = set() # 接続ごとの受付タスクのセット
+        self.job_num      = 0  # 受け付けたジョブの数(ジョブIDの採番用)
+        self.done_num     = 0  # 完了したジョブの数
+        self.error_num    = 0  # 失敗したジョブの数
+        self.reject_num   = 0  # キューがいっぱいで断ったジョブの数
+
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """ サービスを開始する関数
+
+            Args:
+                host (str): 待ち受けるアドレス(初期値はローカルのみ)
+                port (int): 待ち受けるポート番号(0の場合は空いているポート)
+
+            Returns:
+                port (int): 待ち受けているポート番号
+        """
+        self.job_queue = asyncio.Queue(maxsize=self.queue_size)
+        self.executor = ProcessPoolExecutor(max_workers=self.worker_num, initializer=init_service_worker)
+        self.task_list = [asyncio.create_task(self.dispatch()) for _ in range(self.concurrency)]
+        self.server = await asyncio.start_server(self.handle_client, host, port, limit=self.LINE_LIMIT)
+        return self.server.sockets[0].getsockname()[1]
+
+
+    async def stop(self):
+        """ サービスを停止する関数(変換中のジョブの完了は待たない)
+        """
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+        task_list = self.task_list + list(self.client_set)
+        for task in task_list:
+            task.cancel()
+        await asyncio.gather(*task_list, return_exceptions=True)
+        self.task_list = []
+        self.client_set.clear()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+
+    async def serve_forever(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """ サービスを開始して停止されるまで待ち受ける関数
+
+            Args:
+                host (str): 待ち受けるアドレス
+                port (int): 待ち受けるポート番号
+        """
+        port = await self.start(host, port)
+        print("listening on " + host + ":" + str(port), flush=True)
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.stop()
+
+
+    async def get_setting_data(self, request):
+        """ 依頼から設定値オブジェクトを取得する関数
+
+            設定ファイルの読込は受付を止めないように別スレッドで行い、読み込んだ設定名は使い回す。
+
+            Args:
+                request (dict): 依頼("setting"/設定値の辞書、または"preset"/設定名(省略した場合はdefault))
+
+            Returns:
+                setting_data (SettingData): 設定値オブジェクト
+        """
+        if request.get("setting") is not None:
+            setting_data = SettingData()
+            setting_data.set_setting_dict(request["setting"])
+            return setting_data
+
+        preset = request.get("preset", "default")
+        if preset not in self.preset_dict:
+            loop = asyncio.get_running_loop()
+            self.preset_dict[preset] = await loop.run_in_executor(None, load_setting_data, preset, self.setting_path)
+        return self.preset_dict[preset]
+
+
+    async def create_job(self, request, send):
+        """ 依頼からジョブを作成する関数
+
+            Args:
+                request (dict) : 依頼
+                send (function): 依頼元に応答を送るコルーチン関数
+
+            Returns:
+                job (ServiceJob): ジョブ
+
+            Raises:
+                ValueError: 依頼の内容が正しくない場合
+        """
+        if (request.get("input") is None) == (request.get("data") is None):
+            raise ValueError("either input or data is required")
+
+        job_dict = {"output": request.get("output")}
+        if request.get("input") is not None:
+            job_dict["input"] = request["input"]
+        else:
+            job_dict["data"] = base64.b64decode(request["data"])
+
+        encode_setting = EncodeSetting()
+        encode_setting.set_format(request.get("format", "png"))
+        try:
+            setting_data = await self.get_setting_data(request)
+        except KeyError as e:
+            raise ValueError("setting has no key " + str(e))
+        return ServiceJob(request["id"], job_dict, setting_data, encode_setting, send)
+
+
+    async def handle_client(self, reader, writer):
+        """ 接続ごとに依頼を1行ずつ受け付ける関数
+
+            Args:
+                reader (StreamReader): 受信用のストリーム
+                writer (StreamWriter): 送信用のストリーム
+        """
+        lock = asyncio.Lock()
+        task = asyncio.current_task()
+        self.client_set.add(task)
+
+        async def send(response):
+            # 複数のジョブの応答が混ざらないように1行ずつ送る
+            if writer.is_closing():
+                return
+            async with lock:
+                writer.write((json.dumps(response, ensure_ascii=False) + "\n").encode("utf-8"))
+                try:
+                    await writer.drain()
+                except ConnectionError:
+                    pass
+
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError as e:
+                    # 1行が最大サイズを超えた場合は以降の行の区切りが分からないので切断する
+                    await send({"id": None, "status": "error", "error": str(e)})
+                    break
+                if not line:
+                    break
+                if line.strip() == b"":
+                    continue
+
+                self.job_num += 1
+                request = {}
+                try:
+                    request = json.loads(line)
+                    request.setdefault("id", str(self.job_num))
+                    job = await self.create_job(request, send)
+                except Exception as e:
+                    self.error_num += 1
+                    await send({"id": request.get("id") if isinstance(request, dict) else None, "status": "error", "error": str(e)})
+                    continue
+
+                if self.reject_flg and self.job_queue.full():
+                    self.reject_num += 1
+                    await send({"id": job.job_id, "status": "rejected", "error": "queue is full"})
+                    continue
+
+                # キューがいっぱいの間はここで待つため、次の依頼を読まない
+                await self.job_queue.put(job)
+                await send({"id": job.job_id, "status": "queued", "queue_num": self.job_queue.qsize()})
+        except asyncio.CancelledError:
+            pass # サービスの停止
+        finally:
+            # 依頼元が切断した場合も受付済みのジョブは変換する(応答は送らない)
+            self.client_set.discard(task)
+            writer.close()
+
+
+    async def dispatch(self):
+        """ キューからジョブを取り出してワーカープロセスで変換するタスクの関数
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.job_queue.get()
+            start_time = time.perf_counter()
+            try:
+                ret_dict = await loop.run_in_executor(self.executor, run_job, job.job_dict, job.setting_data, job.encode_setting)
+            except Exception as e:
+                self.error_num += 1
+                await job.send({"id": job.job_id, "status": "error", "error": str(e)})
+                continue
+            finally:
+                self.job_queue.task_done()
+
+            self.done_num += 1
+            response = {"id": job.job_id, "status": "done"}
+            response.update(ret_dict)
+            if "data" in response:
+                response["data"] = base64.b64encode(response["data"]).decode("ascii")
+            # 受付から変換開始までの待ち時間と、受付から完了までの時間を加える
+            response["time"]["queue"] = start_time - job.accept_time
+            response["time"]["total"] = time.perf_counter() - job.accept_time
+            await job.send(response)
+
+
+async def submit_jobs(request_list, host=JobService.DEFAULT_HOST, port=JobService.DEFAULT_PORT):
+    """ サービスに依頼をまとめて送って、すべての完了(または失敗)の応答を受け取る関数
+
+        Args:
+            request_list (list): 依頼の辞書のリスト(idを省略した場合は連番を付ける)
+            host (str): サービスのアドレス
+            port (int): サービスのポート番号
+
+        Returns:
+            response_list (list): 完了・失敗の応答のリスト(完了した順)
+    """
+    reader, writer = await asyncio.open_connection(host, port, limit=JobService.LINE_LIMIT)
+
+    async def send_all():
+        for i, request in enumerate(request_list):
+            request = dict(request)
+            request.setdefault("id", str(i + 1))
+            writer.write((json.dumps(request, ensure_ascii=False) + "\n").encode("utf-8"))
+            await writer.drain()
+
+    # 受信しながら送信しないと、サービス側のキューが詰まった時にお互いに待ち続ける
+    send_task = asyncio.create_task(send_all())
+    response_list = []
+    try:
+        while len(response_list) < len(request_list):
+            line = await reader.readline()
+            if not line:
+                break
+            response = json.loads(line)
+            if response["status"] != "queued":
+                response_list.append(response)
+        await send_task
+    finally:
+        writer.close()
+    return response_list
+
+
+def main(argv=None):
+    """ コマンドラインからサービスを起動する関数
+
+        Args:
+            argv (list): コマンドライン引数(Noneの場合はsys.argv)
+
+        Returns:
+            exit_code (int): 終了コード
+    """
+    parser = argparse.ArgumentParser(description="画像変換のジョブをローカルのソケットで受け付けるサービスを起動する")
+    parser.add_argument("--host", default=JobService.DEFAULT_HOST, help="待ち受けるアドレス(デフォルト: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=JobService.DEFAULT_PORT, help="待ち受けるポート番号")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="ワーカープロセス数(デフォルト: CPU数)")
+    parser.add_argument("-c", "--concurrency", type=int, default=None, help="同時に変換するジョブの数(デフォルト: ワーカープロセス数)")
+    parser.add_argument("-q", "--queue", type=int, default=JobService.DEFAULT_QUEUE_SIZE, help="変換待ちのジョブを溜めておける数")
+    parser.add_argument("-s", "--setting", default=None, help="設定ファイルパス(デフォルト: setting.json → default.json)")
+    parser.add_argument("--reject", action="store_true", help="キューがいっぱいの場合は待たずに断る")
+    args = parser.parse_args(argv)
+
+    service = JobService(args.workers, args.concurrency, args.queue, args.setting, args.reject)
+    try:
+        asyncio.run(service.serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    # exe化した環境でワーカープロセスを起動するために必要
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -2,9 +2,62 @@
 from setting_data import SettingData
 import cv2
 import numpy as np
-import copy
+import time, functools
 
-from PySide6.QtGui import *
+
+TABLE_CACHE_SIZE = 1024 # 設定値ごとに保持するルックアップテーブルの数
+
+
+@functools.lru_cache(maxsize=TABLE_CACHE_SIZE)
+def get_threshold_table(low, high):
+    """ cv2.threshold(THRESH_BINARY)と同じ2値化を行うルックアップテーブルを取得する関数
+
+        Args:
+            low (int) : 閾値(この値より大きい画素をhighにする)
+            high (int): 最大値
+
+        Returns:
+            table (ndarray): 256要素のルックアップテーブル(書き込み禁止)
+    """
+    table = np.where(np.arange(256) > low, min(high, 255), 0).astype(np.uint8)
+    table.flags.writeable = False # キャッシュを共有するため書き換えを禁止
+    return table
+
+
+@functools.lru_cache(maxsize=TABLE_CACHE_SIZE)
+def get_contrast_table(low, high):
+    """ コントラストを低減させるルックアップテーブルを取得する関数
+
+        Args:
+            low (int) : コントラスト範囲の下限
+            high (int): コントラスト範囲の上限
+
+        Returns:
+            table (ndarray): 256要素のルックアップテーブル(書き込み禁止)
+    """
+    table = np.arange(256, dtype=np.uint8)
+    # 0～254を下限～上限に割り当てる(255は元の値のまま)
+    table[:255] = low + np.arange(255) * (high - low) / 255
+    table.flags.writeable = False # キャッシュを共有するため書き換えを禁止
+    return table
+
+
+@functools.lru_cache(maxsize=TABLE_CACHE_SIZE)
+def get_shadow_table(outline_low, outline_high, contrast_low, contrast_high):
+    """ 2値化とコントラスト低減をまとめて1回で行うルックアップテーブルを取得する関数
+
+        Args:
+            outline_low (int)  : 2値化の閾値
+            outline_high (int) : 2値化の最大値
+            contrast_low (int) : コントラスト範囲の下限
+            contrast_high (int): コントラスト範囲の上限
+
+        Returns:
+            table (ndarray): 256要素のルックアップテーブル(書き込み禁止)
+    """
+    table = get_contrast_table(contrast_low, contrast_high)[get_threshold_table(outline_low, outline_high)]
+    table.flags.writeable = False # キャッシュを共有するため書き換えを禁止
+    return table
 
 
 class LineExtraction():
@@ -16,6 +69,9 @@ class LineExtraction():
         """
         self.cv2_img      = None
         self.setting_data = None
+        self.strip_height = None # 帯状に分割して変換する場合の1帯の高さ(Noneの場合は分割しない)
+        self.profiler     = None # 段階ごとの処理時間の記録先(Noneの場合は記録しない)
+        self.workspace    = None # 作業用の配列を使い回す場合の保持先(Noneの場合は毎回作成する)
 
 
     def set_image_setting(self, cv2_img, setting_data: SettingData):
@@ -47,49 +103,278 @@ class LineExtraction():
         self.setting_data = setting_data
 
 
-    def line_extraction(self):
+    def set_strip_height(self, strip_height):
+        """ 帯状に分割して変換する場合の1帯の高さを設定する関数
+
+            Args:
+                strip_height (int): 1帯の高さ(Noneの場合は分割しない)
+        """
+        self.strip_height = strip_height
+
+
+    def set_profiler(self, profiler):
+        """ 段階ごとの処理時間の記録先を設定する関数
+
+            Args:
+                profiler (StageProfiler): 記録先(Noneの場合は記録しない)
+        """
+        self.profiler = profiler
+
+
+    def set_workspace(self, workspace):
+        """ 作業用の配列の保持先を設定する関数(同じサイズの画像を続けて変換する一括処理向け)
+
+            Args:
+                workspace (Workspace): 保持先(Noneの場合は毎回作成する)
+        """
+        self.workspace = workspace
+
+
+    def get_buffer(self, name, shape):
+        """ 作業用の配列を取得する関数
+
+            Args:
+                name (str)   : 用途の名前
+                shape (tuple): 配列のshape
+
+            Returns:
+                buffer (ndarray): 作業用のuint8の配列(保持先がない場合はNoneを返し、OpenCV側で作成させる)
+        """
+        if self.workspace is None:
+            return None
+        return self.workspace.get(name, shape)
+
+
+    def run_stage(self, name, func, *args, **kwargs):
+        """ 段階の処理を実行して、記録先があれば処理時間と出力サイズを記録する関数
+
+            Args:
+                name (str)     : 段階名
+                func (function): 処理関数
+                *args, **kwargs: 処理関数に渡す引数
+
+            Returns:
+                img (img): 処理関数の戻り値
+        """
+        if self.profiler is None:
+            return func(*args, **kwargs)
+
+        start_time = time.perf_counter()
+        img = func(*args, **kwargs)
+        self.profiler.record(name, time.perf_counter() - start_time, img.nbytes)
+        return img
+
+
+    def line_extraction(self, dst=None, create_buffer=None):
         """ 画像を変換する関数
 
+            Args:
+                dst (img): 変換後画像を書き込む配列(帯状に分割して変換する場合のみ使用、Noneの場合は作成する)
+                create_buffer (function): 帯状に分割して変換する場合の作業用の配列の作成関数(line_extraction_stripを参照)
+
             Returns:
                 result_img (img): 変換後画像
         """
+        if self.is_strip():
+            return self.line_extraction_strip(self.strip_height, dst, create_buffer)
+
+        line_state = self.setting_data.checkbox_line_flg
+        shadow_state = self.setting_data.checkbox_shadow_flg
+
+        if (not line_state) and (not shadow_state):
+            # 両方チェックがなかったらそのまま
+            return self.cv2_img
+
+        # 途中の画像はこの関数内で作成したもの(または作業用の配列)なので、上書きして新しい配列を作らないようにする
+        shape = self.cv2_img.shape[:2]
         # 1:グレースケール化
-        gray_img = cv2.cvtColor(self.cv2_img, cv2.COLOR_BGR2GRAY)
+        gray_img = self.run_stage("gray_scale", self.gray_scale, self.cv2_img, self.get_buffer("gray", shape))
         # 2:ぼかす
-        gray_img = self.img_blur(gray_img)
-        # 3:輪郭線抽出
-        outline_img = self.outine(gray_img)
+        gray_img = self.run_stage("img_blur", self.img_blur, gray_img, gray_img)
+
+        outline_img = None
+        if line_state:
+            # 3:輪郭線抽出
+            outline_img = self.run_stage("outine", self.outine, gray_img, self.get_buffer("outline", shape))
+            # 4:輪郭線をぼかす
+            outline_img = self.run_stage("line_blur", self.line_blur, outline_img, outline_img)
+
+        shadow_img = None
+        if shadow_state:
+            # 5:影部分をぼかす(輪郭線抽出後はぼかし後の画像は使わないので上書き)
+            shadow_img = self.run_stage("shadow_blur", self.img_blur, gray_img, gray_img)
+
+        # 6:輪郭線と影部分を2値化(影部分はコントラストも低減)して合成
+        # 作業用の配列は次の画像で上書きされるため、変換後画像だけは新しい配列に書き込む
+        dst = None
+        if self.workspace is not None:
+            dst = np.empty(shape, dtype=np.uint8)
+        return self.run_stage("threshold_merge", self.threshold_merge, outline_img, shadow_img, dst)
+
+
+    def is_strip(self):
+        """ 帯状に分割して変換するかを取得する関数
+
+            Returns:
+                True/False (bool): 1帯の高さが設定されていて、画像がそれより高いかどうか
+        """
+        return (self.strip_height is not None) and (self.cv2_img.shape[0] > self.strip_height)
+
+
+    def line_extraction_strip(self, strip_height, dst=None, create_buffer=None):
+        """ 画像を帯状に分割して変換する関数(line_extractionと同じ結果になる)
+
+            ぼかしや2値化などのフル解像度の処理は、ぼかしのカーネル半径分の重なり(ハロー)を
+            付けた帯ごとに行うため、帯の数に関係なく作業用の画像は帯1つ分で済む。
+            輪郭線抽出(縮小→Canny→拡大)は、Cannyのヒステリシス処理が画像全体に影響するため
+            縮小画像全体で行い、帯への分割はしない。
+            ぼかし後のグレースケール画像と輪郭線画像の2枚はフルサイズ(1byte/画素)で保持するので、
+            create_bufferでnp.memmapを返すようにすれば物理メモリの使用量を画像サイズに依存させずに済む。
+
+            Args:
+                strip_height (int): 1帯の高さ
+                dst (img): 変換後画像を書き込む配列(Noneの場合は作成する)
+                create_buffer (function): shapeを受け取りuint8の配列を返す関数(Noneの場合はnp.empty)
+
+            Returns:
+                result_img (img): 変換後画像
+        """
+        line_state = self.setting_data.checkbox_line_flg
+        shadow_state = self.setting_data.checkbox_shadow_flg
+
+        if (not line_state) and (not shadow_state):
+            # 両方チェックがなかったらそのまま
+            return self.cv2_img
+
+        if create_buffer is None:
+            create_buffer = lambda shape: np.empty(shape, dtype=np.uint8)
+
+        height, width = self.cv2_img.shape[:2]
+        # ぼかしのカーネル半径(blurサイズは奇数に補正される)
+        blur_halo = (self.setting_data.img_blur_blur | 1) // 2
+        line_halo = (self.setting_data.outline_rough | 1) // 2
+
+        # 1-2:グレースケール化してぼかす
+        blur_img = create_buffer((height, width))
+        for y0, y1, a0, a1 in self.get_strip_list(height, strip_height, blur_halo):
+            gray_img = self.run_stage("gray_scale", self.gray_scale, self.cv2_img[a0:a1])
+            blur_img[y0:y1] = self.run_stage("img_blur", self.img_blur, gray_img)[y0 - a0:y1 - a0]
+
+        # 3:輪郭線抽出(縮小画像全体で行う)
+        outline_img = None
+        if line_state:
+            outline_img = self.run_stage("outine", self.outine, blur_img, create_buffer((height, width)))
+
+        if dst is None:
+            dst = create_buffer((height, width))
+
+        # 4-7:帯ごとにぼかし・2値化・合成
+        halo = max(blur_halo, line_halo)
+        for y0, y1, a0, a1 in self.get_strip_list(height, strip_height, halo):
+            outline_strip = None
+            shadow_strip  = None
+
+            if line_state:
+                outline_strip = self.run_stage("line_blur", self.line_blur, outline_img[a0:a1])[y0 - a0:y1 - a0]
+
+            if shadow_state:
+                shadow_strip = self.run_stage("shadow_blur", self.img_blur, blur_img[a0:a1])[y0 - a0:y1 - a0]
+
+            # np.memmapの場合もOpenCVから直接書き込めるようにndarrayとして渡す
+            self.run_stage("threshold_merge", self.threshold_merge, outline_strip, shadow_strip, np.asarray(dst[y0:y1]))
+
+        return dst
+
+
+    def get_strip_list(self, height, strip_height, halo):
+        """ 帯の範囲のリストを取得する関数
+
+            Args:
+                height (int)      : 画像の高さ
+                strip_height (int): 1帯の高さ
+                halo (int)        : 上下に付ける重なりの行数
 
+            Returns:
+                strip_list (list): (出力開始行, 出力終了行, 入力開始行, 入力終了行)のリスト
+        """
+        strip_list = []
+        for y0 in range(0, height, strip_height):
+            y1 = min(height, y0 + strip_height)
+            strip_list.append((y0, y1, max(0, y0 - halo), min(height, y1 + halo)))
+        return strip_list
+
+
+    def gray_scale(self, cv2_img, dst=None):
+        """ 画像をグレースケール化する関数
+
+            Args:
+                cv2_img (img): 変換画像(BGR、またはグレースケールで読み込んだ2次元の画像)
+                dst (img): 処理後画像を書き込む配列(Noneの場合は作成する)
+
+            Returns:
+                img (img): 処理後画像
+        """
+        if cv2_img.ndim == 2:
+            # グレースケールで読み込んだ画像は後の段階で上書きされないように複製する
+            if dst is None:
+                return cv2_img.copy()
+            np.copyto(dst, cv2_img)
+            return dst
+        return cv2.cvtColor(cv2_img, cv2.COLOR_BGR2GRAY, dst=dst)
+
+
+    def line_blur(self, outline_img, dst=None):
+        """ 設定値(粗さ)で輪郭線をぼかす関数
+
+            Args:
+                outline_img (img): 輪郭線画像
+                dst (img): 処理後画像を書き込む配列(outline_imgと同じ配列も可、Noneの場合は作成する)
+
+            Returns:
+                img (img): 処理後画像
+        """
         line_blur_size = self.setting_data.outline_rough
         if line_blur_size % 2 == 0:
             line_blur_size = line_blur_size + 1 # blurサイズは奇数じゃないとエラーになる
 
-        # 4:輪郭線をぼかす
-        outline_img = cv2.GaussianBlur(outline_img, (line_blur_size, line_blur_size), line_blur_size)
-        outline_low  = self.setting_data.outline_low
-        outline_high = self.setting_data.outline_high
+        return cv2.GaussianBlur(outline_img, (line_blur_size, line_blur_size), line_blur_size, dst=dst)
+
+
+    def img_threshold(self, cv2_img):
+        """ 設定値(アウトライン範囲)の閾値で2値化する関数
+
+            Args:
+                cv2_img (img): 変換画像
+
+            Returns:
+                img (img): 処理後画像
+        """
+        _, img = cv2.threshold(cv2_img, self.setting_data.outline_low, self.setting_data.outline_high, cv2.THRESH_BINARY)
+        return img
+
 
-        # 5:閾値で2値化
-        _, outline_img = cv2.threshold(outline_img, outline_low, outline_high, cv2.THRESH_BINARY)
+    def merge_img(self, outline_img, shadow_img):
+        """ 変換内容のフラグに従って輪郭線と影部分の画像を合成する関数
 
+            Args:
+                outline_img (img): 輪郭線画像(線出力しない場合はNoneでも可)
+                shadow_img (img) : 影部分の画像(影出力しない場合はNoneでも可)
+
+            Returns:
+                result_img (img): 変換後画像
+        """
         line_state = self.setting_data.checkbox_line_flg
         shadow_state = self.setting_data.checkbox_shadow_flg
 
-        # 6:影部分の処理(ぼかして閾値で2値化)
-        gray_img = self.img_blur(gray_img) # ぼかす
-        _, gray_img = cv2.threshold(gray_img, outline_low, outline_high, cv2.THRESH_BINARY)
-        gray_img = self.low_contrast(gray_img)
-
         if line_state and shadow_state:
-            # 両方にチェックがあった場合
-            # 7:輪郭線と影部分の画像を合成
-            result_img = cv2.bitwise_and(outline_img, gray_img)
+            # 両方にチェックがあった場合は合成
+            result_img = cv2.bitwise_and(outline_img, shadow_img)
         elif line_state:
             # 線のみの場合は線だけ
             result_img = outline_img
         elif shadow_state:
             # 影のみの場合は影だけ
-            result_img = gray_img
+            result_img = shadow_img
         else:
             # 両方チェックがなかったらそのまま
             result_img = self.cv2_img
@@ -97,11 +382,53 @@ class LineExtraction():
         return result_img
 
 
-    def img_blur(self, cv2_img):
+    def threshold_merge(self, outline_img, shadow_img, dst=None):
+        """ 輪郭線の2値化・影部分の2値化とコントラスト低減・合成をまとめて行う関数
+            (img_threshold, shadow_threshold, merge_imgを順に行うのと同じ結果)
+
+            入力画像を上書きして作業用の配列を作らないため、キャッシュしている画像などは渡さないこと。
+
+            Args:
+                outline_img (img): ぼかした輪郭線画像(線出力しない場合はNoneでも可、上書きされる)
+                shadow_img (img) : ぼかした影部分の画像(影出力しない場合はNoneでも可、上書きされる)
+                dst (img): 変換後画像を書き込む配列(Noneの場合は入力画像に書き込む)
+
+            Returns:
+                result_img (img): 変換後画像
+        """
+        setting_data = self.setting_data
+        line_state = setting_data.checkbox_line_flg
+        shadow_state = setting_data.checkbox_shadow_flg
+
+        if (not line_state) and (not shadow_state):
+            # 両方チェックがなかったらそのまま
+            return self.cv2_img
+
+        if line_state:
+            # 線のみの場合は2値化した結果をそのまま出力先に書き込む
+            outline_dst = outline_img if shadow_state or (dst is None) else dst
+            cv2.threshold(outline_img, setting_data.outline_low, setting_data.outline_high, cv2.THRESH_BINARY, dst=outline_dst)
+            if not shadow_state:
+                return outline_dst
+
+        look_up_table = get_shadow_table(setting_data.outline_low, setting_data.outline_high, setting_data.contrast_low, setting_data.contrast_high)
+        shadow_dst = shadow_img if line_state or (dst is None) else dst
+        cv2.LUT(shadow_img, look_up_table, dst=shadow_dst)
+        if not line_state:
+            return shadow_dst
+
+        if dst is None:
+            dst = outline_img
+        cv2.bitwise_and(outline_img, shadow_img, dst=dst)
+        return dst
+
+
+    def img_blur(self, cv2_img, dst=None):
         """ 設定値で画像をぼかす関数
 
             Args:
                 cv2_img (img): 変換画像
+                dst (img): 処理後画像を書き込む配列(cv2_imgと同じ配列も可、Noneの場合は作成する)
     
             Returns:
                 img (img): 処理後画像
@@ -111,14 +438,15 @@ class LineExtraction():
         if blur_value % 2 == 0:
             blur_size = blur_size + 1 # blurサイズは奇数じゃないとエラーになる
 
-        return cv2.GaussianBlur(cv2_img, (blur_size, blur_size), blur_value) # ぼかす
+        return cv2.GaussianBlur(cv2_img, (blur_size, blur_size), blur_value, dst=dst) # ぼかす
 
 
-    def outine(self, cv2_gray_img):
+    def outine(self, cv2_gray_img, dst=None):
         """ 画像の輪郭線を抽出する関数
 
             Args:
                 cv2_img (img): 変換二値化画像
+                dst (img): 処理後画像を書き込む配列(Noneの場合は作成する)
 
             Returns:
                 img (img): 処理後画像
@@ -126,11 +454,12 @@ class LineExtraction():
         # リサイズ
         fx = int(cv2_gray_img.shape[1] / self.setting_data.outline_rough)
         fy = int(cv2_gray_img.shape[0] / self.setting_data.outline_rough)
-        gray_rezise_img = cv2.resize(cv2_gray_img, (fx, fy))
+        gray_rezise_img = self.run_stage("outine.resize", cv2.resize, cv2_gray_img, (fx, fy), dst=self.get_buffer("outine.resize", (fy, fx)))
 
-        # 輪郭線抽出
-        outline_img = 255 - cv2.Canny(gray_rezise_img, self.setting_data.outline_high, self.setting_data.outline_low)
-        return cv2.resize(outline_img, (cv2_gray_img.shape[1], cv2_gray_img.shape[0]))
+        # 輪郭線抽出(白黒を反転)
+        outline_img = self.run_stage("outine.canny", cv2.Canny, gray_rezise_img, self.setting_data.outline_high, self.setting_data.outline_low, edges=self.get_buffer("outine.canny", (fy, fx)))
+        outline_img = cv2.bitwise_not(outline_img, dst=outline_img)
+        return self.run_stage("outine.upscale", cv2.resize, outline_img, (cv2_gray_img.shape[1], cv2_gray_img.shape[0]), dst=dst)
 
 
     def low_contrast(self, cv2_img):
@@ -142,35 +471,58 @@ class LineExtraction():
             Returns:
                 img (img): 処理後画像
         """
-        # ルックアップテーブルの生成
-        min_table = self.setting_data.contrast_low
-        max_table = self.setting_data.contrast_high
-        diff_table = max_table - min_table
-        look_up_table = np.arange(256, dtype = 'uint8')
-    
-        for i in range(0, 255):
-            look_up_table[i] = min_table + i * (diff_table) / 255
-    
+        # ルックアップテーブルの取得(設定値ごとにキャッシュされる)
+        look_up_table = get_contrast_table(self.setting_data.contrast_low, self.setting_data.contrast_high)
+
         # コントラストを低減させた結果を返す
         return cv2.LUT(cv2_img, look_up_table)
 
 
-    def get_qpixmap(self, cv2_img, w, h):
-        """ 画像をプレビューに表示する形式であるQPixmapに変換する関数
+    def shadow_threshold(self, cv2_img):
+        """ 影部分を2値化してコントラストを低減させる関数(img_threshold → low_contrastと同じ結果)
+
+            Args:
+                cv2_img (img): 変換画像
+
+            Returns:
+                img (img): 処理後画像
+        """
+        setting_data = self.setting_data
+        look_up_table = get_shadow_table(setting_data.outline_low, setting_data.outline_high, setting_data.contrast_low, setting_data.contrast_high)
+
+        # 2つのテーブルを合成したテーブルで1回だけ変換する
+        return cv2.LUT(cv2_img, look_up_table)
+
+
+    def resize_preview(self, cv2_img, w, h, interpolation=cv2.INTER_LINEAR):
+        """ 画像をプレビュー画面に収まるサイズに縮小する関数
 
             Args:
                 cv2_img (img): 変換画像
                 w (int): width
                 h (int): height
+                interpolation (int): 補間方法
 
             Returns:
-                img (img): 変換後画像
+                img (img): 縮小後画像
         """
-        img = copy.deepcopy(cv2_img)
+        return cv2.resize(cv2_img, self.get_preview_size(cv2_img, w, h), interpolation=interpolation)
+
 
+    def get_preview_size(self, cv2_img, w, h):
+        """ 画像をプレビュー画面に収まるように縮小した時のサイズを取得する関数
+
+            Args:
+                cv2_img (img): 変換画像
+                w (int): width
+                h (int): height
+
+            Returns:
+                size (tuple): 縮小後の(width, height)
+        """
         # プレビュー画面に収まるように縮小
-        w_ratio = img.shape[1] / w
-        h_ratio = img.shape[0] / h
+        w_ratio = cv2_img.shape[1] / w
+        h_ratio = cv2_img.shape[0] / h
 
         if (w_ratio <= 1) and (h_ratio <= 1):
             ratio = 1
@@ -179,13 +531,46 @@ class LineExtraction():
         else:
             ratio = h_ratio
 
-        fx = int(img.shape[1]/ratio)
-        fy = int(img.shape[0]/ratio)
-        img = cv2.resize(img, (fx, fy))
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB) # QtはBGRなので順番を変更
+        fx = int(cv2_img.shape[1]/ratio)
+        fy = int(cv2_img.shape[0]/ratio)
+        return (fx, fy)
+
+
+    def get_qpixmap(self, cv2_img, w, h):
+        """ 画像をプレビューに表示する形式であるQPixmapに変換する関数
+
+            Args:
+                cv2_img (img): 変換画像
+                w (int): width
+                h (int): height
+
+            Returns:
+                img (img): 変換後画像
+        """
+        # Qtは表示時のみ必要なので、ヘッドレス実行時に読み込まないようここでインポート
+        from PySide6.QtGui import QImage, QPixmap
+
+        # プレビュー画面に収まるように先に縮小する(縮小結果は新しい配列なので元画像のコピーは不要)
+        size = self.get_preview_size(cv2_img, w, h)
+        scale = min(cv2_img.shape[1] // size[0], cv2_img.shape[0] // size[1])
+        img = cv2_img
+        if scale >= 2:
+            # 大きな画像は整数倍率の平均化(OpenCVの高速な処理になる)で先に小さくする
+            img = cv2.resize(cv2_img, None, fx=1 / scale, fy=1 / scale, interpolation=cv2.INTER_AREA)
+        img = cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+
+        if img.ndim == 2:
+            # 線や影の変換後画像は1チャンネルなのでRGBに変換せずにそのまま表示
+            img_format = QImage.Format.Format_Grayscale8
+        else:
+            if img.shape[2] == 4:
+                img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
+            # BGRの並びのまま表示
+            img_format = QImage.Format.Format_BGR888
 
-        height, width, _ = img.shape
-        bytePerLine = img.strides[0] # ⇒ 3*width相当
+        height, width = img.shape[:2]
+        bytePerLine = img.strides[0]
 
-        qimg = QImage(img.data, width, height, bytePerLine, QImage.Format.Format_RGB888)       
-        return QPixmap(QPixmap.fromImage(qimg))
\ No newline at end of file
+        # fromImageでQPixmap側にコピーされるため、imgはこの関数内だけ有効であればよい
+        qimg = QImage(img.data, width, height, bytePerLine, img_format)
+        return QPixmap.fromImage(qimg)
\ No newline at end of file
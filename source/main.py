@@ -2,6 +2,7 @@
 from image_line_gui import ImageLineGui
 
 import sys
+import multiprocessing
 from PySide6.QtWidgets import *
 
 
@@ -18,4 +19,6 @@ def main():
 
 
 if __name__ == '__main__':
+    # exe化した環境でワーカープロセスを起動するために必要
+    multiprocessing.freeze_support()
     main()
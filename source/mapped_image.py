@@ -0,0 +1,175 @@
+#-*- coding:utf-8 -*-
+import os, tempfile
+import numpy as np
+from PIL import Image
+
+
+PNM_EXTENSIONS  = (".pgm", ".ppm", ".pnm") # 無圧縮のPGM/PPM
+TIFF_EXTENSIONS = (".tif", ".tiff")
+PNM_HEADER_SIZE = 1024 # ヘッダーを探す範囲(byte)
+
+
+def map_raw(img_file, shape, offset=0, mode="r"):
+    """ ヘッダーのない無圧縮の画素データをnp.memmapで開く関数
+
+        Args:
+            img_file (str): ファイルパス
+            shape (tuple) : 画像のshape((height, width)、または(height, width, チャンネル数))
+            offset (int)  : 画素データの開始位置(byte)
+            mode (str)    : np.memmapのモード("r"/読込のみ、"r+"/書込可)
+
+        Returns:
+            mapped_img (memmap): 8bitの画像
+    """
+    return np.memmap(img_file, dtype=np.uint8, mode=mode, offset=offset, shape=shape)
+
+
+def read_pnm_header(img_file):
+    """ バイナリ形式のPGM/PPMのヘッダーを読み込む関数
+
+        Args:
+            img_file (str): ファイルパス
+
+        Returns:
+            magic (bytes): 形式(b"P5"/PGM、b"P6"/PPM、それ以外はNone)
+            width (int)  : 画像のwidth
+            height (int) : 画像のheight
+            maxval (int) : 画素の最大値
+            offset (int) : 画素データの開始位置(byte)
+    """
+    with open(img_file, "rb") as f:
+        header = f.read(PNM_HEADER_SIZE)
+
+    token_list = []
+    pos = 0
+    while (len(token_list) < 4) and (pos < len(header)):
+        c = header[pos:pos + 1]
+        if c == b"#":
+            # コメントは行末まで読み飛ばす
+            pos = header.find(b"\n", pos)
+            if pos < 0:
+                break
+        elif c.isspace():
+            pos += 1
+        else:
+            end = pos
+            while (end < len(header)) and (not header[end:end + 1].isspace()) and (header[end:end + 1] != b"#"):
+                end += 1
+            token_list.append(header[pos:end])
+            pos = end
+
+    if (len(token_list) < 4) or (token_list[0] not in (b"P5", b"P6")):
+        return None, 0, 0, 0, 0
+    # 最大値の後の空白1文字の次から画素データ
+    return token_list[0], int(token_list[1]), int(token_list[2]), int(token_list[3]), pos + 1
+
+
+def map_pnm(img_file):
+    """ 8bitのバイナリ形式のPGM/PPMをnp.memmapで開く関数
+
+        Args:
+            img_file (str): ファイルパス
+
+        Returns:
+            mapped_img (memmap): グレースケール、またはBGR(チャンネル順を入れ替えたビュー)の画像
+                                 (16bitやテキスト形式の場合はNone)
+    """
+    magic, width, height, maxval, offset = read_pnm_header(img_file)
+    if (magic is None) or (maxval > 255):
+        return None
+
+    if magic == b"P5":
+        return map_raw(img_file, (height, width), offset)
+    return map_raw(img_file, (height, width, 3), offset)[:, :, ::-1]
+
+
+def map_tiff(img_file):
+    """ 無圧縮の8bitのTIFFをnp.memmapで開く関数
+
+        ストリップがファイル内で連続している場合のみ対応する(タイル分割や圧縮されている場合は開かない)。
+
+        Args:
+            img_file (str): ファイルパス
+
+        Returns:
+            mapped_img (memmap): グレースケール、またはBGR(チャンネル順を入れ替えたビュー)の画像
+                                 (開けない場合はNone)
+    """
+    with Image.open(img_file) as pil_img:
+        mode = pil_img.mode
+        width, height = pil_img.size
+        tile_list = list(pil_img.tile)
+
+    if (mode not in ("L", "RGB")) or (len(tile_list) == 0):
+        return None
+
+    # タイル情報は(形式, 範囲, 開始位置, (展開モード, ...))
+    row_bytes = width * len(mode)
+    offset = tile_list[0][2]
+    for codec_name, (x0, y0, x1, y1), tile_offset, args in tile_list:
+        if (codec_name != "raw") or (args[0] != mode) or (x0 != 0) or (x1 != width):
+            return None
+        if tile_offset != offset + y0 * row_bytes:
+            return None
+
+    if mode == "L":
+        return map_raw(img_file, (height, width), offset)
+    return map_raw(img_file, (height, width, 3), offset)[:, :, ::-1]
+
+
+def map_image(img_file):
+    """ 無圧縮の画像ファイルをnp.memmapで開く関数
+
+        画素データを読み込まずにファイルに対応付けるため、大きな画像でも必要な部分だけがOSによって読み込まれる。
+
+        Args:
+            img_file (str): ファイルパス
+
+        Returns:
+            mapped_img (memmap): グレースケール、またはBGRの画像(対応していない形式の場合はNone)
+    """
+    ext = os.path.splitext(img_file)[1].lower()
+    try:
+        if ext in PNM_EXTENSIONS:
+            return map_pnm(img_file)
+        if ext in TIFF_EXTENSIONS:
+            return map_tiff(img_file)
+    except (OSError, ValueError):
+        # 壊れたファイルなどは通常の読込でエラーにする
+        return None
+    return None
+
+
+def create_temp_memmap(shape, temp_dir=None):
+    """ 一時ファイルに対応付けた作業用の配列を作成する関数
+
+        一時ファイルはすぐに削除されるため、配列を解放するとディスクからも消える。
+
+        Args:
+            shape (tuple) : 配列のshape
+            temp_dir (str): 一時ファイルを作成するフォルダ(Noneの場合はOSの一時フォルダ)
+
+        Returns:
+            buffer (memmap): uint8の配列(中身は初期化しない)
+    """
+    with tempfile.TemporaryFile(dir=temp_dir) as f:
+        # ファイルを閉じても対応付けは残る
+        return np.memmap(f, dtype=np.uint8, mode="w+", shape=shape)
+
+
+def create_pgm(save_file, shape):
+    """ PGMファイルを作成して画素データ部分をnp.memmapで開く関数(変換後画像を直接ファイルに書き込む用)
+
+        Args:
+            save_file (str): 保存ファイルパス
+            shape (tuple)  : 画像のshape(height, width)
+
+        Returns:
+            mapped_img (memmap): 書込可能な8bitの画像
+    """
+    height, width = shape
+    header = ("P5\n" + str(width) + " " + str(height) + "\n255\n").encode("ascii")
+    with open(save_file, "wb") as f:
+        f.write(header)
+        f.truncate(len(header) + width * height)
+    return map_raw(save_file, (height, width), len(header), "r+")
@@ -0,0 +1,350 @@
+#-*- coding:utf-8 -*-
+from setting_data import SettingData, load_setting_data
+from line_extraction import get_threshold_table, get_shadow_table
+from stage_pipeline import StagePipeline
+from image_io import read_image, write_image
+
+import sys, copy, itertools, argparse
+import cv2
+import numpy as np
+
+
+# 一括比較できる設定値(SettingDataの属性名 → 一覧画像に表示する略称)
+SWEEP_PARAM_DICT = {
+    "outline_low"  : "ol",
+    "outline_high" : "oh",
+    "outline_rough": "r",
+    "img_blur_blur": "b",
+    "contrast_low" : "cl",
+    "contrast_high": "ch",
+}
+# 途中結果を共有しやすい順(上流の段階が依存する設定値が先)
+SORT_PARAM_LIST = ["img_blur_blur", "outline_rough", "outline_low", "outline_high", "contrast_low", "contrast_high"]
+# 2値化までの結果が同じになる設定値(コントラストだけが違う設定値は一覧画像の1枠をまとめて計算できる)
+GROUP_PARAM_LIST = ["img_blur_blur", "outline_rough", "outline_low", "outline_high", "checkbox_line_flg", "checkbox_shadow_flg"]
+
+
+def create_setting_list(base_setting: SettingData, param_dict):
+    """ 基準の設定値から、指定した設定値の全組み合わせの設定値リストを作成する関数
+
+        Args:
+            base_setting (SettingData): 基準の設定値オブジェクト(指定しない設定値はこの値を使う)
+            param_dict (dict): SettingDataの属性名 → 値のリストの辞書
+
+        Returns:
+            setting_list (list): 設定値オブジェクトのリスト(param_dictの順に外側から組み合わせる)
+    """
+    name_list = list(param_dict)
+    setting_list = []
+    for value_list in itertools.product(*[param_dict[name] for name in name_list]):
+        setting_data = copy.copy(base_setting)
+        for name, value in zip(name_list, value_list):
+            setattr(setting_data, name, value)
+        setting_list.append(setting_data)
+    return setting_list
+
+
+def get_setting_label(setting_data: SettingData, name_list):
+    """ 一覧画像に表示する設定値の文字列を取得する関数
+
+        Args:
+            setting_data (SettingData): 設定値オブジェクト
+            name_list (list): 表示するSettingDataの属性名のリスト
+
+        Returns:
+            label (str): 設定値の文字列(例: "ol70 oh110")
+    """
+    return " ".join(SWEEP_PARAM_DICT.get(name, name) + str(getattr(setting_data, name)) for name in name_list)
+
+
+class ParameterSweep():
+    """ 1枚の画像を設定値の組み合わせごとに変換して、一覧画像(コンタクトシート)を作成するクラス
+
+        ぼかしや輪郭線抽出などの途中結果はStagePipelineのキャッシュで設定値の組み合わせ間で共有し、
+        最後の2値化とコントラスト低減は合成したルックアップテーブルで1回のLUTで計算する。
+
+        一覧画像では、2値化までが同じ設定値どうしは変換後画像の画素値が
+        「輪郭線の2値化結果 × 影の2値化結果」の4通りしかないことを利用して、
+        4通りの面積比を1枠のサイズに縮小しておき、各設定値の1枠を行列積でまとめて計算する。
+        (フル解像度の変換後画像を縮小した場合と丸めで1階調ずれることがある)
+    """
+    TILE_WIDTH  = 240
+    TILE_HEIGHT = 180
+    LABEL_HEIGHT = 20
+    MARGIN = 4
+    BACK_COLOR  = (255, 255, 255)
+    LABEL_COLOR = (0, 0, 255)
+
+
+    def __init__(self, max_bytes=StagePipeline.DEFAULT_MAX_BYTES):
+        """ コンストラクタ
+
+            Args:
+                max_bytes (int): キャッシュする途中結果の合計サイズの上限(byte)
+        """
+        self.pipeline = StagePipeline(max_bytes)
+
+
+    def set_image(self, cv2_img):
+        """ 変換する画像を設定する関数
+
+            Args:
+                cv2_img (img): 変換画像
+        """
+        self.pipeline.set_image(cv2_img)
+
+
+    def set_cancel_func(self, func):
+        """ 中断判定の関数を設定する関数
+
+            Args:
+                func (function): 引数なしでTrueを返したら段階の計算前に中断する関数
+        """
+        self.pipeline.set_cancel_func(func)
+
+
+    def line_extraction(self, setting_data: SettingData):
+        """ 1つの設定値で変換する関数(LineExtraction.line_extractionと同じ結果)
+
+            Args:
+                setting_data (SettingData): 設定値オブジェクト
+
+            Returns:
+                result_img (img): 変換後画像
+        """
+        pipeline = self.pipeline
+        pipeline.set_setting_data(setting_data)
+        outline_img = None
+        shadow_img  = None
+
+        if setting_data.checkbox_line_flg:
+            table = get_threshold_table(setting_data.outline_low, setting_data.outline_high)
+            outline_img = cv2.LUT(pipeline.get_stage("outline_blur"), table)
+
+        if setting_data.checkbox_shadow_flg:
+            table = get_shadow_table(setting_data.outline_low, setting_data.outline_high, setting_data.contrast_low, setting_data.contrast_high)
+            shadow_img = cv2.LUT(pipeline.get_stage("shadow_blur"), table)
+
+        return pipeline.extraction.merge_img(outline_img, shadow_img)
+
+
+    def run(self, setting_list):
+        """ 設定値のリストを順に変換して結果を1件ずつ返すジェネレータ関数
+
+            途中結果を共有しやすいように、上流の段階が依存する設定値の順に並べ替えて変換する。
+
+            Args:
+                setting_list (list): 設定値オブジェクトのリスト
+
+            Yields:
+                result (tuple): (setting_listでの番号, 変換後画像)
+        """
+        def sort_key(i):
+            return tuple(getattr(setting_list[i], name) for name in SORT_PARAM_LIST)
+
+        for i in sorted(range(len(setting_list)), key=sort_key):
+            yield i, self.line_extraction(setting_list[i])
+
+
+    def get_class_area(self):
+        """ 現在の設定値での輪郭線・影の2値化結果の組み合わせごとの面積比を1枠のサイズで取得する関数
+
+            Returns:
+                area_img (ndarray): (4, 高さ, 幅)の面積比(組み合わせの番号は 輪郭線の2値化結果 * 2 + 影の2値化結果)
+        """
+        pipeline = self.pipeline
+        setting_data = pipeline.setting_data
+        shape = pipeline.extraction.cv2_img.shape[:2]
+
+        # 出力しない方は常に0(閾値以下)として扱う
+        outline_mask = np.zeros(shape, dtype=bool)
+        shadow_mask  = np.zeros(shape, dtype=bool)
+        if setting_data.checkbox_line_flg:
+            outline_mask = pipeline.get_stage("outline_blur") > setting_data.outline_low
+        if setting_data.checkbox_shadow_flg:
+            shadow_mask = pipeline.get_stage("shadow_blur") > setting_data.outline_low
+
+        area_list = [None]
+        for mask in [~outline_mask & shadow_mask, outline_mask & ~shadow_mask, outline_mask & shadow_mask]:
+            area_list.append(pipeline.extraction.resize_preview(mask.astype(np.float32), self.TILE_WIDTH, self.TILE_HEIGHT, cv2.INTER_AREA))
+        # 両方とも閾値以下の面積比は残りから求める
+        area_list[0] = 1 - area_list[1] - area_list[2] - area_list[3]
+        return np.stack(area_list)
+
+
+    def get_class_value(self, setting_data: SettingData):
+        """ 輪郭線・影の2値化結果の組み合わせごとの変換後画像の画素値を取得する関数
+
+            Args:
+                setting_data (SettingData): 設定値オブジェクト
+
+            Returns:
+                value_list (list): 組み合わせの番号(輪郭線の2値化結果 * 2 + 影の2値化結果)順の画素値
+        """
+        outline_table = get_threshold_table(setting_data.outline_low, setting_data.outline_high)
+        shadow_table  = get_shadow_table(setting_data.outline_low, setting_data.outline_high, setting_data.contrast_low, setting_data.contrast_high)
+        outline_value_list = [int(outline_table[0]), int(outline_table[255])]
+        shadow_value_list  = [int(shadow_table[0]), int(shadow_table[255])]
+
+        value_list = []
+        for outline_value in outline_value_list:
+            for shadow_value in shadow_value_list:
+                if setting_data.checkbox_line_flg and setting_data.checkbox_shadow_flg:
+                    value_list.append(outline_value & shadow_value)
+                elif setting_data.checkbox_line_flg:
+                    value_list.append(outline_value)
+                else:
+                    value_list.append(shadow_value)
+        return value_list
+
+
+    def get_preview_dict(self, setting_list, progress_func=None):
+        """ 設定値のリストを変換して一覧画像の1枠分に縮小した変換後画像を取得する関数
+
+            Args:
+                setting_list (list): 設定値オブジェクトのリスト
+                progress_func (function): 変換が進むたびに(完了件数, 全件数)で呼ぶ関数
+
+            Returns:
+                pre_dict (dict): setting_listでの番号 → 縮小した変換後画像
+        """
+        # 2値化までが同じ設定値ごとにまとめる
+        group_dict = {}
+        for i, setting_data in enumerate(setting_list):
+            key = tuple(getattr(setting_data, name) for name in GROUP_PARAM_LIST)
+            group_dict.setdefault(key, []).append(i)
+
+        def sort_key(index_list):
+            return tuple(getattr(setting_list[index_list[0]], name) for name in SORT_PARAM_LIST)
+
+        pre_dict = {}
+        for index_list in sorted(group_dict.values(), key=sort_key):
+            setting_data = setting_list[index_list[0]]
+            self.pipeline.set_setting_data(setting_data)
+
+            if (not setting_data.checkbox_line_flg) and (not setting_data.checkbox_shadow_flg):
+                # 両方出力しない場合は元画像のまま
+                pre_img = self.pipeline.extraction.resize_preview(self.pipeline.extraction.cv2_img, self.TILE_WIDTH, self.TILE_HEIGHT, cv2.INTER_AREA)
+                for i in index_list:
+                    pre_dict[i] = pre_img
+            else:
+                area_img = self.get_class_area()
+                value_array = np.array([self.get_class_value(setting_list[i]) for i in index_list], dtype=np.float32)
+                # (設定値の数, 4) × (4, 高さ, 幅) → (設定値の数, 高さ, 幅)
+                pre_array = np.tensordot(value_array, area_img, axes=1)
+                pre_array = np.clip(np.rint(pre_array), 0, 255).astype(np.uint8)
+                for i, pre_img in zip(index_list, pre_array):
+                    pre_dict[i] = pre_img
+
+            if progress_func is not None:
+                progress_func(len(pre_dict), len(setting_list))
+
+        return pre_dict
+
+
+    def create_tile(self, pre_img, label):
+        """ 縮小した変換後画像に設定値の文字列を付けた一覧画像の1枠を作成する関数
+
+            Args:
+                pre_img (img): 1枠のサイズに縮小した変換後画像
+                label (str)  : 設定値の文字列
+
+            Returns:
+                tile_img (img): 一覧画像の1枠(BGR)
+        """
+        tile_img = np.full((self.TILE_HEIGHT + self.LABEL_HEIGHT, self.TILE_WIDTH, 3), self.BACK_COLOR, dtype=np.uint8)
+
+        if pre_img.ndim == 2:
+            pre_img = cv2.cvtColor(pre_img, cv2.COLOR_GRAY2BGR)
+
+        # 枠の中央に配置
+        y = (self.TILE_HEIGHT - pre_img.shape[0]) // 2
+        x = (self.TILE_WIDTH - pre_img.shape[1]) // 2
+        tile_img[y:y + pre_img.shape[0], x:x + pre_img.shape[1]] = pre_img
+
+        cv2.putText(tile_img, label, (2, self.TILE_HEIGHT + self.LABEL_HEIGHT - 6), cv2.FONT_HERSHEY_SIMPLEX, 0.4, self.LABEL_COLOR, 1, cv2.LINE_AA)
+        return tile_img
+
+
+    def create_contact_sheet(self, setting_list, col_num=None, name_list=None, progress_func=None):
+        """ 設定値のリストを変換して一覧画像を作成する関数
+
+            Args:
+                setting_list (list): 設定値オブジェクトのリスト
+                col_num (int): 1行に並べる数(Noneの場合は正方形に近くなる数)
+                name_list (list): 一覧画像に表示するSettingDataの属性名のリスト(Noneの場合は一括比較できる設定値すべて)
+                progress_func (function): 変換が進むたびに(完了件数, 全件数)で呼ぶ関数
+
+            Returns:
+                sheet_img (img): 一覧画像(BGR、setting_listの順に左上から並べる)
+        """
+        if name_list is None:
+            name_list = list(SWEEP_PARAM_DICT)
+        if col_num is None:
+            col_num = int(np.ceil(np.sqrt(len(setting_list))))
+        col_num = max(1, col_num)
+        row_num = max(1, int(np.ceil(len(setting_list) / col_num)))
+
+        tile_w = self.TILE_WIDTH + self.MARGIN
+        tile_h = self.TILE_HEIGHT + self.LABEL_HEIGHT + self.MARGIN
+        sheet_img = np.full((row_num * tile_h + self.MARGIN, col_num * tile_w + self.MARGIN, 3), self.BACK_COLOR, dtype=np.uint8)
+
+        for i, pre_img in self.get_preview_dict(setting_list, progress_func).items():
+            tile_img = self.create_tile(pre_img, get_setting_label(setting_list[i], name_list))
+            y = (i // col_num) * tile_h + self.MARGIN
+            x = (i % col_num) * tile_w + self.MARGIN
+            sheet_img[y:y + tile_img.shape[0], x:x + tile_img.shape[1]] = tile_img
+
+        return sheet_img
+
+
+def create_parser():
+    """ コマンドライン引数のパーサーを作成する関数
+
+        Returns:
+            parser (ArgumentParser): パーサー
+    """
+    parser = argparse.ArgumentParser(description="1枚の画像を設定値の組み合わせごとに変換して一覧画像を作成する")
+    parser.add_argument("-i", "--input", required=True, help="変換画像ファイルパス")
+    parser.add_argument("-o", "--output", required=True, help="一覧画像の保存ファイルパス")
+    parser.add_argument("-p", "--preset", default="default", help="基準にする設定名(デフォルト: default)")
+    parser.add_argument("-s", "--setting", default=None, help="設定ファイルパス(デフォルト: setting.json → default.json)")
+    parser.add_argument("--cols", type=int, default=None, help="1行に並べる数")
+    for name in SWEEP_PARAM_DICT:
+        parser.add_argument("--" + name.replace("_", "-"), type=int, nargs="+", default=None, help=name + "の値のリスト")
+    return parser
+
+
+def main(argv=None):
+    """ コマンドラインから一覧画像を作成する関数
+
+        Args:
+            argv (list): コマンドライン引数(Noneの場合はsys.argv)
+
+        Returns:
+            exit_code (int): 終了コード(0/正常終了、1/失敗)
+    """
+    args = create_parser().parse_args(argv)
+    param_dict = {name: getattr(args, name) for name in SWEEP_PARAM_DICT if getattr(args, name) is not None}
+    if len(param_dict) == 0:
+        print("比較する設定値を1つ以上指定してください。", file=sys.stderr)
+        return 1
+
+    try:
+        base_setting = load_setting_data(args.preset, args.setting)
+        setting_list = create_setting_list(base_setting, param_dict)
+
+        sweep = ParameterSweep()
+        sweep.set_image(read_image(args.input))
+        sheet_img = sweep.create_contact_sheet(setting_list, args.cols, list(param_dict))
+        write_image(sheet_img, args.output)
+    except Exception as e:
+        print(str(e), file=sys.stderr)
+        return 1
+
+    print(str(len(setting_list)) + " settings saved to " + args.output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
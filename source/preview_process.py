@@ -0,0 +1,196 @@
+#-*- coding:utf-8 -*-
+from setting_data import SettingData
+from stage_pipeline import StagePipeline, CancelError
+from image_io import read_image, get_reduce_num, is_jpeg_file
+
+import threading
+import cv2
+
+from PySide6.QtCore import *
+
+
+class PreviewResult():
+    """ プレビュー処理の結果を保持するクラス
+    """
+
+    def __init__(self, request_no=int, result_img=None, pre_img=None, error=None):
+        """ コンストラクタ
+
+            Args:
+                request_no (int): 要求番号
+                result_img (img): 変換後画像(縮小プレビューの場合は縮小画像)
+                pre_img (img)   : プレビューサイズに縮小した変換後画像
+                error (str)     : エラー内容(正常時はNone)
+        """
+        self.request_no   = request_no
+        self.result_img   = result_img
+        self.pre_img      = pre_img
+        self.error        = error
+        self.setting_data = None  # 変換に使った設定値(フル解像度の値)
+        self.proxy_flg    = False # 縮小プレビューで変換したかどうか
+
+
+class PreviewProcess(QThread):
+    """ プレビュー用の変換をGUIとは別スレッドで実行するプロセスクラス
+
+        要求は最新の1件だけを保持し、処理中に新しい要求が来た場合は
+        段階の区切りで処理を中断して最新の要求をやり直す。
+    """
+    preview_thread = Signal(PreviewResult)
+
+
+    def __init__(self, parent=None):
+        """ コンストラクタ
+        """
+        QThread.__init__(self, parent)
+        self.pipeline   = StagePipeline() # 途中結果をキャッシュする変換オブジェクト
+        self.pipeline.set_cancel_func(self.is_stale)
+        self.condition  = threading.Condition()
+        self.request    = None # 未処理の最新の要求(要求番号, 設定値, 縮小フラグ)
+        self.new_img    = None # 未反映の(変換画像, 画像ファイルパス)
+        self.org_img    = None # 変換画像(フル解像度)
+        self.img_file   = None # 変換画像のファイルパス(縮小プレビューの縮小読込に使う)
+        self.proxy_flg  = False # パイプラインに縮小画像を設定しているかどうか
+        self.scale      = 1.0   # パイプラインに設定している画像の縮小率
+        self.request_no = 0    # 最新の要求番号
+        self.stop_flg   = False
+        self.width      = 0
+        self.height     = 0
+
+
+    def set_pre_size(self, w, h):
+        """ プレビューサイズを設定する関数
+
+            Args:
+                w (int): width
+                h (int): height
+        """
+        self.width  = w
+        self.height = h
+
+
+    def set_image(self, cv2_img, img_file=None):
+        """ 変換する画像を設定する関数(次の要求から反映される)
+
+            Args:
+                cv2_img (img) : 変換画像
+                img_file (str): 変換画像のファイルパス(Noneの場合は縮小プレビューも変換画像を縮小して作成する)
+        """
+        with self.condition:
+            self.new_img = (cv2_img, img_file)
+
+
+    def request_preview(self, setting_data: SettingData, proxy_flg=False):
+        """ プレビューの変換を要求する関数(古い要求は破棄される)
+
+            Args:
+                setting_data (SettingData): 設定値オブジェクト
+                proxy_flg (bool): True/プレビューサイズに縮小した画像で変換、False/フル解像度で変換
+
+            Returns:
+                request_no (int): 要求番号
+        """
+        with self.condition:
+            self.request_no = self.request_no + 1
+            self.request = (self.request_no, setting_data, proxy_flg)
+            self.condition.notify()
+            return self.request_no
+
+
+    def is_stale(self):
+        """ 処理中の要求より新しい要求が来ているかを判定する関数
+
+            Returns:
+                True/False (bool): 新しい要求があるか、停止要求があればTrue
+        """
+        return (self.request is not None) or self.stop_flg
+
+
+    def update_pipeline_image(self, new_img, proxy_flg):
+        """ パイプラインに設定する画像を更新する関数(画像か縮小フラグが変わった場合のみ)
+
+            Args:
+                new_img (tuple) : 新しい(変換画像, 画像ファイルパス)(変更がない場合はNone)
+                proxy_flg (bool): 縮小画像を設定するかどうか
+        """
+        if (new_img is None) and (proxy_flg == self.proxy_flg):
+            return
+
+        if new_img is not None:
+            self.org_img, self.img_file = new_img
+
+        self.proxy_flg = proxy_flg
+        if proxy_flg:
+            # プレビューサイズ程度に縮小した画像で変換する
+            proxy_img = self.pipeline.extraction.resize_preview(self.read_proxy_image(), self.width, self.height, cv2.INTER_AREA)
+            self.scale = proxy_img.shape[1] / self.org_img.shape[1]
+            self.pipeline.set_image(proxy_img)
+        else:
+            self.scale = 1.0
+            self.pipeline.set_image(self.org_img)
+
+
+    def read_proxy_image(self):
+        """ 縮小プレビューの元にする画像を取得する関数
+
+            JPEGファイルの場合はプレビューサイズを下回らない範囲で縮小して読み込み直す
+            (フル解像度の画像を縮小するより速い)。それ以外の場合はフル解像度の画像をそのまま返す。
+
+            Returns:
+                cv2_img (img): 縮小プレビューの元にする画像
+        """
+        if (self.img_file is not None) and is_jpeg_file(self.img_file):
+            reduce_num = get_reduce_num(self.org_img.shape[1], self.org_img.shape[0], self.width, self.height)
+            if reduce_num > 1:
+                try:
+                    return read_image(self.img_file, False, reduce_num)
+                except Exception:
+                    pass # 読み込めない場合はフル解像度の画像を縮小する
+        return self.org_img
+
+
+    def stop(self):
+        """ スレッドを停止する関数
+        """
+        with self.condition:
+            self.stop_flg = True
+            self.condition.notify()
+
+
+    def run(self):
+        """ 要求を待ち受けてプレビューの変換を実行する関数
+        """
+        while True:
+            with self.condition:
+                while (self.request is None) and (not self.stop_flg):
+                    self.condition.wait()
+
+                if self.stop_flg:
+                    return
+
+                request_no, setting_data, proxy_flg = self.request
+                self.request = None
+                new_img = self.new_img
+                self.new_img = None
+
+            try:
+                self.update_pipeline_image(new_img, proxy_flg)
+                if self.proxy_flg:
+                    # ぼかしや粗さを縮小率に合わせて、フル解像度と同じ見た目にする
+                    self.pipeline.set_setting_data(setting_data.get_scaled(self.scale))
+                else:
+                    self.pipeline.set_setting_data(setting_data)
+                result_img = self.pipeline.line_extraction()
+                pre_img = self.pipeline.extraction.resize_preview(result_img, self.width, self.height)
+                result = PreviewResult(request_no, result_img, pre_img)
+                result.setting_data = setting_data
+                result.proxy_flg = self.proxy_flg
+            except CancelError:
+                # 新しい要求が来たので結果は返さずに次の要求へ
+                continue
+            except Exception as e:
+                result = PreviewResult(request_no, error=str(e))
+
+            # 処理中に新しい要求が来ていたら古い結果は捨てる
+            if not self.is_stale():
+                self.preview_thread.emit(result)
@@ -0,0 +1,112 @@
+#-*- coding:utf-8 -*-
+
+
+class StageCounter():
+    """ 段階ごとの処理件数・時間・バイト数を集計するクラス
+    """
+
+    def __init__(self, name=str):
+        """ コンストラクタ
+
+            Args:
+                name (str): 段階名
+        """
+        self.name    = name
+        self.count   = 0
+        self.seconds = 0.0
+        self.nbytes  = 0
+
+
+    def add(self, seconds, nbytes):
+        """ 1件分の処理時間とバイト数を加算する関数
+
+            Args:
+                seconds (float): 処理時間(秒)
+                nbytes (int)   : 処理したバイト数
+        """
+        self.count   = self.count + 1
+        self.seconds = self.seconds + seconds
+        self.nbytes  = self.nbytes + nbytes
+
+
+    def get_dict(self):
+        """ 集計結果を辞書で取得する関数
+
+            Returns:
+                counter_dict (dict): 件数・合計時間・合計バイト数・1秒あたりの件数とMB数
+        """
+        files_per_sec = 0.0
+        mb_per_sec    = 0.0
+        if self.seconds > 0:
+            files_per_sec = self.count / self.seconds
+            mb_per_sec    = self.nbytes / self.seconds / (1024 * 1024)
+
+        return {"count": self.count, "seconds": self.seconds, "nbytes": self.nbytes, "files_per_sec": files_per_sec, "mb_per_sec": mb_per_sec}
+
+
+class StageProfiler():
+    """ LineExtractionの段階ごとの処理時間と出力サイズを記録するクラス
+
+        LineExtraction.set_profilerで設定すると、line_extractionの各段階と
+        outineの縮小・Canny・拡大の処理時間と出力画像のバイト数が記録される。
+    """
+
+    def __init__(self):
+        """ コンストラクタ
+        """
+        self.counter_dict = {} # 段階名 → StageCounter
+
+
+    def record(self, name, seconds, nbytes):
+        """ 1回分の処理時間と出力サイズを記録する関数
+
+            Args:
+                name (str)     : 段階名
+                seconds (float): 処理時間(秒)
+                nbytes (int)   : 出力画像のバイト数
+        """
+        counter = self.counter_dict.get(name)
+        if counter is None:
+            counter = StageCounter(name)
+            self.counter_dict[name] = counter
+        counter.add(seconds, nbytes)
+
+
+    def clear(self):
+        """ 記録をクリアする関数
+        """
+        self.counter_dict = {}
+
+
+    def get_raw_dict(self):
+        """ 別プロセスに渡せる形式で記録を取得する関数
+
+            Returns:
+                raw_dict (dict): 段階名 → (件数, 合計時間, 合計バイト数)
+        """
+        return {name: (c.count, c.seconds, c.nbytes) for name, c in self.counter_dict.items()}
+
+
+    def merge(self, raw_dict):
+        """ 別の記録(get_raw_dictの結果)を加算する関数
+
+            Args:
+                raw_dict (dict): 段階名 → (件数, 合計時間, 合計バイト数)
+        """
+        for name, (count, seconds, nbytes) in raw_dict.items():
+            counter = self.counter_dict.get(name)
+            if counter is None:
+                counter = StageCounter(name)
+                self.counter_dict[name] = counter
+            counter.count   = counter.count + count
+            counter.seconds = counter.seconds + seconds
+            counter.nbytes  = counter.nbytes + nbytes
+
+
+    def get_dict(self):
+        """ 集計結果を辞書で取得する関数
+
+            Returns:
+                profile_dict (dict): 段階名 → 集計結果の辞書
+        """
+        return {name: counter.get_dict() for name, counter in self.counter_dict.items()}
@@ -0,0 +1,134 @@
+#-*- coding:utf-8 -*-
+import os, uuid, shutil, hashlib
+
+
+class ResultCache():
+    """ 変換結果をディスクに保存して、同じ入力・同じ設定値の再変換を省略するキャッシュクラス
+
+        キーは「入力ファイル(パス+更新日時+サイズ、または内容のハッシュ)」と
+        「設定値のハッシュ」から作成する。キャッシュファイルの更新日時を最終使用日時として扱い、
+        合計サイズが上限を超えたら古いものから削除する。
+        1エントリ1ファイルでos.replaceにより書き込むため、複数プロセスから同時に使用できる。
+        キャッシュファイルの拡張子は保存形式に合わせる。
+    """
+    TEMP_EXTENSION = ".tmp" # 書き込み途中の一時ファイルの拡張子
+    DEFAULT_MAX_BYTES = 1024 * 1024 * 1024 # キャッシュの上限サイズ
+    READ_SIZE = 1024 * 1024 # 内容のハッシュを計算する時の読込単位
+
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES, content_hash_flg=False):
+        """ コンストラクタ
+
+            Args:
+                cache_dir (str)        : キャッシュフォルダ
+                max_bytes (int)        : キャッシュの合計サイズの上限(byte)
+                content_hash_flg (bool): True/ファイル内容のハッシュをキーにする、False/パス+更新日時+サイズをキーにする
+        """
+        self.cache_dir        = cache_dir
+        self.max_bytes        = max_bytes
+        self.content_hash_flg = content_hash_flg
+        os.makedirs(cache_dir, exist_ok=True)
+
+
+    def get_key(self, img_file, setting_hash):
+        """ 入力ファイルと設定値からキャッシュのキーを取得する関数
+
+            Args:
+                img_file (str)    : 入力ファイルパス
+                setting_hash (str): 設定値のハッシュ(SettingData.get_hash)
+
+            Returns:
+                key (str): キー
+        """
+        sha = hashlib.sha1()
+        if self.content_hash_flg:
+            with open(img_file, "rb") as f:
+                for chunk in iter(lambda: f.read(self.READ_SIZE), b""):
+                    sha.update(chunk)
+        else:
+            stat = os.stat(img_file)
+            sha.update((os.path.abspath(img_file) + "|" + str(stat.st_mtime_ns) + "|" + str(stat.st_size)).encode("utf-8"))
+
+        sha.update(setting_hash.encode("utf-8"))
+        return sha.hexdigest()
+
+
+    def get_cache_file(self, key, extension):
+        """ キーに対応するキャッシュファイルパスを取得する関数
+
+            Args:
+                key (str)      : キー
+                extension (str): 保存形式の拡張子(EncodeSetting.get_extension)
+
+            Returns:
+                cache_file (str): キャッシュファイルパス
+        """
+        return os.path.join(self.cache_dir, key[:2], key + extension)
+
+
+    def fetch(self, key, save_file, extension):
+        """ キャッシュがあれば保存先にコピーする関数
+
+            Args:
+                key (str)      : キー
+                save_file (str): 保存ファイルパス
+                extension (str): 保存形式の拡張子(EncodeSetting.get_extension)
+
+            Returns:
+                True/False (bool): キャッシュがあったかどうか
+        """
+        cache_file = self.get_cache_file(key, extension)
+        try:
+            shutil.copyfile(cache_file, save_file)
+            os.utime(cache_file) # 最終使用日時を更新
+            return True
+        except FileNotFoundError:
+            return False
+
+
+    def store(self, key, save_file, extension):
+        """ 保存したファイルをキャッシュに追加する関数
+
+            Args:
+                key (str)      : キー
+                save_file (str): 保存ファイルパス
+                extension (str): 保存形式の拡張子(EncodeSetting.get_extension)
+        """
+        cache_file = self.get_cache_file(key, extension)
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+
+        # 書き込み途中のファイルが使われないように一時ファイルから置き換える
+        temp_file = cache_file + "." + uuid.uuid4().hex + self.TEMP_EXTENSION
+        shutil.copyfile(save_file, temp_file)
+        os.replace(temp_file, cache_file)
+
+
+    def evict(self):
+        """ 合計サイズが上限を超えている場合に、最終使用日時が古いものから削除する関数
+
+            Returns:
+                remove_num (int): 削除したファイル数
+        """
+        entry_list = []
+        total_bytes = 0
+        for sub_dir in os.scandir(self.cache_dir):
+            if not sub_dir.is_dir():
+                continue
+            for entry in os.scandir(sub_dir.path):
+                if not entry.name.endswith(self.TEMP_EXTENSION):
+                    stat = entry.stat()
+                    entry_list.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                    total_bytes = total_bytes + stat.st_size
+
+        remove_num = 0
+        for _, size, path in sorted(entry_list):
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total_bytes = total_bytes - size
+                remove_num = remove_num + 1
+            except OSError:
+                pass
+
+        return remove_num
@@ -0,0 +1,318 @@
+#-*- coding:utf-8 -*-
+import os, queue, fnmatch, threading
+
+
+IMG_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".pgm", ".ppm", ".pnm") # 変換対象の拡張子
+
+
+def is_image_file(file_path):
+    """ 変換対象の画像ファイルかどうかを判定する関数
+
+        Args:
+            file_path (str): ファイルパス
+
+        Returns:
+            True/False (bool): 変換対象かどうか
+    """
+    return file_path.lower().endswith(IMG_EXTENSIONS)
+
+
+def has_entry(dir_path):
+    """ フォルダ内にファイルやフォルダが1つでもあるかを判定する関数(一覧をすべては取得しない)
+
+        Args:
+            dir_path (str): フォルダパス
+
+        Returns:
+            True/False (bool): 1つでもあるかどうか
+    """
+    with os.scandir(dir_path) as entry_iter:
+        return next(entry_iter, None) is not None
+
+
+class FileScanner():
+    """ フォルダ内の変換対象の画像ファイルを順に返すクラス
+
+        os.scandirで1件ずつ取得するため、ファイル数の多いフォルダでも一覧の作成を待たずに変換を始められる。
+        ファイルの種類はscandirの結果で判定し、サイズや更新日時で絞り込む場合のみstatを取得する。
+        変換と並行して走査するため、保存フォルダは走査の対象から外す(保存したファイルを再び変換しないようにする)。
+    """
+
+    def __init__(self):
+        """ コンストラクタ
+        """
+        self.recursive_flg = False
+        self.include_list  = [] # 対象にするパターンのリスト(空の場合はすべて)
+        self.exclude_list  = [] # 除外するパターンのリスト(フォルダにも適用)
+        self.min_size      = None # 最小サイズ(byte)
+        self.max_size      = None # 最大サイズ(byte)
+        self.min_mtime     = None # 更新日時の下限(UNIX時間)
+        self.max_mtime     = None # 更新日時の上限(UNIX時間)
+        self.save_dir      = None # 保存フォルダの実パス(走査から除外する)
+
+
+    def set_recursive_flg(self, flg):
+        """ サブフォルダも対象にするかを設定する関数
+
+            Args:
+                flg (bool): True/サブフォルダも対象にする、False/直下のみ
+        """
+        self.recursive_flg = flg
+
+
+    def set_save_dir(self, save_dir):
+        """ 走査から除外する保存フォルダを設定する関数
+
+            Args:
+                save_dir (str): 保存フォルダ(Noneの場合は除外しない)
+        """
+        self.save_dir = None if save_dir is None else os.path.realpath(save_dir)
+
+
+    def is_save_dir(self, dir_path):
+        """ フォルダが保存フォルダかを判定する関数
+
+            Args:
+                dir_path (str): フォルダパス
+
+            Returns:
+                True/False (bool): 保存フォルダかどうか
+        """
+        return (self.save_dir is not None) and (os.path.realpath(dir_path) == self.save_dir)
+
+
+    def is_in_save_dir(self, dir_path):
+        """ フォルダが保存フォルダ、またはその中にあるかを判定する関数
+
+            Args:
+                dir_path (str): フォルダパス
+
+            Returns:
+                True/False (bool): 保存フォルダ、またはその中にあるかどうか
+        """
+        if self.save_dir is None:
+            return False
+        real_path = os.path.realpath(dir_path)
+        return (real_path == self.save_dir) or real_path.startswith(os.path.join(self.save_dir, ""))
+
+
+    def set_pattern(self, include_list, exclude_list):
+        """ 対象にするファイルと除外するファイル・フォルダのパターンを設定する関数
+
+            パターンはfnmatch形式で、ファイル名または変換フォルダからの相対パス("/"区切り)のどちらかに一致すればよい。
+
+            Args:
+                include_list (list): 対象にするパターンのリスト(空の場合はすべて)
+                exclude_list (list): 除外するパターンのリスト
+        """
+        self.include_list = list(include_list or [])
+        self.exclude_list = list(exclude_list or [])
+
+
+    def set_size_range(self, min_size, max_size):
+        """ 対象にするファイルサイズの範囲を設定する関数
+
+            Args:
+                min_size (int): 最小サイズ(byte、Noneの場合は制限なし)
+                max_size (int): 最大サイズ(byte、Noneの場合は制限なし)
+        """
+        self.min_size = min_size
+        self.max_size = max_size
+
+
+    def set_mtime_range(self, min_mtime, max_mtime):
+        """ 対象にする更新日時の範囲を設定する関数
+
+            Args:
+                min_mtime (float): 更新日時の下限(UNIX時間、Noneの場合は制限なし)
+                max_mtime (float): 更新日時の上限(UNIX時間、Noneの場合は制限なし)
+        """
+        self.min_mtime = min_mtime
+        self.max_mtime = max_mtime
+
+
+    def match_pattern(self, name, rel_path, pattern_list):
+        """ ファイル名または相対パスがパターンのどれかに一致するかを判定する関数
+
+            Args:
+                name (str)         : ファイル名
+                rel_path (str)     : 変換フォルダからの相対パス
+                pattern_list (list): パターンのリスト
+
+            Returns:
+                True/False (bool): 一致するかどうか
+        """
+        for pattern in pattern_list:
+            if fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(rel_path, pattern):
+                return True
+        return False
+
+
+    def is_target(self, name, rel_path, stat_func):
+        """ 変換対象のファイルかを判定する関数
+
+            Args:
+                name (str)          : ファイル名
+                rel_path (str)      : 変換フォルダからの相対パス
+                stat_func (function): ファイルのstatを取得する関数(サイズや更新日時で絞り込む場合のみ呼び出す)
+
+            Returns:
+                True/False (bool): 変換対象かどうか
+        """
+        if not is_image_file(name):
+            return False
+        if (len(self.include_list) > 0) and (not self.match_pattern(name, rel_path, self.include_list)):
+            return False
+        if self.match_pattern(name, rel_path, self.exclude_list):
+            return False
+
+        if (self.min_size is None) and (self.max_size is None) and (self.min_mtime is None) and (self.max_mtime is None):
+            return True
+
+        stat = stat_func()
+        if ((self.min_size is not None) and (stat.st_size < self.min_size)) or ((self.max_size is not None) and (stat.st_size > self.max_size)):
+            return False
+        if ((self.min_mtime is not None) and (stat.st_mtime < self.min_mtime)) or ((self.max_mtime is not None) and (stat.st_mtime > self.max_mtime)):
+            return False
+        return True
+
+
+    def scan(self, root):
+        """ 変換フォルダ内の変換対象のファイルを1件ずつ返すジェネレータ関数
+
+            保存フォルダが変換フォルダの中にある場合は、保存フォルダを走査しない。
+            変換フォルダが保存フォルダと同じ(またはその中にある)場合は、保存したファイルを拾わないように
+            最初の1件を返す前にすべて走査する(変換を始める前に一覧を作成していた従来と同じ動作)。
+
+            Args:
+                root (str): 変換フォルダ
+
+            Yields:
+                img_file (str): 変換画像ファイルパス
+                sub_dir (str) : 変換フォルダからの相対フォルダ("/"区切りで末尾に"/"を付ける、直下の場合は空文字)
+        """
+        if self.is_in_save_dir(root):
+            yield from list(self.scan_tree(root))
+        else:
+            yield from self.scan_tree(root)
+
+
+    def scan_tree(self, root):
+        """ 変換フォルダ内の変換対象のファイルを走査しながら1件ずつ返すジェネレータ関数
+
+            サブフォルダは親フォルダの一覧を閉じてから順に走査するため、同時に開くフォルダは1つだけ。
+
+            Args:
+                root (str): 変換フォルダ
+
+            Yields:
+                img_file (str): 変換画像ファイルパス
+                sub_dir (str) : 変換フォルダからの相対フォルダ("/"区切りで末尾に"/"を付ける、直下の場合は空文字)
+        """
+        dir_stack = [(root, "")]
+        while dir_stack:
+            dir_path, sub_dir = dir_stack.pop()
+            sub_dir_list = []
+            with os.scandir(dir_path) as entry_iter:
+                for entry in entry_iter:
+                    rel_path = sub_dir + entry.name
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if self.recursive_flg and (not self.match_pattern(entry.name, rel_path, self.exclude_list)) and (not self.is_save_dir(entry.path)):
+                                sub_dir_list.append((entry.path, rel_path + "/"))
+                        elif entry.is_file() and self.is_target(entry.name, rel_path, entry.stat):
+                            yield entry.path, sub_dir
+                    except OSError:
+                        continue # 走査中に削除されたファイルなどは飛ばす
+
+            # 一覧の順番どおりに走査するため逆順に積む
+            dir_stack.extend(reversed(sub_dir_list))
+
+
+class ScanThread():
+    """ ファイルの走査を別スレッドで行い、見つかったファイルを順に取り出せるようにするクラス
+
+        変換と並行して走査を進めるため、全件数が確定する前から変換を始めつつ、見つかった件数を随時取得できる。
+    """
+    END = None # キューの終端を表す値
+
+
+    def __init__(self, file_iter):
+        """ コンストラクタ
+
+            Args:
+                file_iter (iterable): 変換画像ファイルの一覧(FileScanner.scanなど)
+        """
+        self.file_iter  = file_iter
+        self.file_queue = queue.Queue()
+        self.stop_event = threading.Event()
+        self.found_num  = 0     # 見つかった件数
+        self.done_flg   = False # 走査が終わったかどうか
+        self.error      = None  # 走査中に発生した例外
+        self.thread     = None
+
+
+    def start(self):
+        """ 走査を開始する関数
+        """
+        self.thread = threading.Thread(target=self.worker, daemon=True)
+        self.thread.start()
+
+
+    def stop(self):
+        """ 走査を中止する関数
+        """
+        self.stop_event.set()
+
+
+    def worker(self):
+        """ 走査してキューに追加するスレッドの関数
+        """
+        try:
+            for item in self.file_iter:
+                if self.stop_event.is_set():
+                    break
+                self.file_queue.put(item)
+                self.found_num += 1
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done_flg = True
+            self.file_queue.put(self.END)
+
+
+    def get_found_num(self):
+        """ これまでに見つかった件数を取得する関数
+
+            Returns:
+                found_num (int): 件数
+        """
+        return self.found_num
+
+
+    def is_done(self):
+        """ 走査が終わったかを取得する関数
+
+            Returns:
+                True/False (bool): 走査が終わったかどうか
+        """
+        return self.done_flg
+
+
+    def __iter__(self):
+        """ 見つかったファイルを順に返すジェネレータ関数
+
+            Yields:
+                item (object): 変換画像ファイルの一覧の要素
+
+            Raises:
+                Exception: 走査中に例外が発生した場合はその例外
+        """
+        while True:
+            item = self.file_queue.get()
+            if item is self.END:
+                break
+            yield item
+
+        if self.error is not None:
+            raise self.error
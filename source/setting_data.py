@@ -1,4 +1,76 @@
 #-*- coding:utf-8 -*-
+import os, sys, copy, json, hashlib
+
+
+SAVE_SETTING_FILE = "setting.json"
+DEFAULT_SETTING_FILE = "json/default.json"
+
+
+def temp_path(relative_path):
+    """ 実行時のパスを取得する関数
+
+        Args:
+            relative_path (str): 相対ファイルパス
+
+        Returns:
+            実行時のパス文字列
+    """
+    try:
+        base_path = sys._MEIPASS
+    except Exception:
+        base_path = os.path.abspath(os.path.dirname(__file__))
+    return os.path.join(base_path, relative_path)
+
+
+def load_json_file(json_path):
+    """ jsonファイルを辞書型で読み込む関数
+
+        Args:
+            json_path (str): jsonファイルパス
+
+        Returns:
+            json_data (dict): jsonファイルの辞書(ファイルがない場合はNone)
+    """
+    json_data = None
+
+    # ファイルのエンコードを設定
+    encording_str = "utf-8"
+    if sys.platform.startswith('win'):
+        encording_str = "utf-8_sig"
+
+    # jsonファイルを辞書として読み込み
+    if os.path.exists(json_path):
+        with open(json_path, "r", encoding=encording_str) as f:
+            json_data = json.load(f)
+
+    return json_data
+
+
+def load_setting_data(preset, setting_path=None):
+    """ 設定ファイルから指定した名前の設定値を読み込む関数
+
+        Args:
+            preset (str)      : 設定名
+            setting_path (str): 設定ファイルパス(Noneの場合はsetting.json、default.jsonの順に探す)
+
+        Returns:
+            setting_data (SettingData): 設定値オブジェクト
+    """
+    if setting_path is None:
+        my_dir_path = os.path.abspath(os.path.dirname(sys.argv[0]))
+        path_list = [os.path.join(my_dir_path, SAVE_SETTING_FILE), temp_path(DEFAULT_SETTING_FILE)]
+    else:
+        path_list = [setting_path]
+
+    for path in path_list:
+        json_data = load_json_file(path)
+        if (json_data is not None) and (preset in json_data):
+            setting_data = SettingData()
+            setting_data.set_setting_dict(json_data[preset])
+            return setting_data
+
+    raise ValueError("設定値「 " + preset + " 」が見つかりません。")
+
 
 class SettingData():
     """ 設定値を保持するクラス
@@ -72,3 +144,68 @@ class SettingData():
         """
         self.checkbox_line_flg   = line_flg
         self.checkbox_shadow_flg = shadow_flg
+
+
+    def set_setting_dict(self, setting_dict):
+        """ 設定ファイルの1設定分の辞書から値を設定する関数
+
+            Args:
+                setting_dict (dict): 設定値の辞書(default.jsonの"default"と同じ形式)
+        """
+        self.set_outline_range(setting_dict['outline']['low'], setting_dict['outline']['high'])
+        self.set_outline_rough_blur(setting_dict['outline']['rough'], setting_dict['outline']['blur'])
+        self.set_img_blur_blur(setting_dict['img_blur']['blur'])
+        self.set_contrast_range(setting_dict['contrast']['low'], setting_dict['contrast']['high'])
+        self.set_checkbox_line_shadow(setting_dict['checkbox']['line'], setting_dict['checkbox']['shadow'])
+
+
+    def is_color_output(self):
+        """ 変換後画像に元画像の色を使うかを判定する関数
+
+            Returns:
+                True/False (bool): 線出力・影出力がどちらもない(元画像をそのまま出力する)場合はTrue
+        """
+        return (not self.checkbox_line_flg) and (not self.checkbox_shadow_flg)
+
+
+    def get_scaled(self, scale):
+        """ 縮小した画像用に、画素数に依存する設定値を拡縮したコピーを取得する関数
+
+            Args:
+                scale (float): 画像の拡縮率(縮小プレビューの場合は1未満)
+
+            Returns:
+                setting_data (SettingData): 拡縮後の設定値オブジェクト
+        """
+        setting_data = copy.copy(self)
+        # 粗さは縮小率と線ぼかしのサイズを兼ねているため、1未満にはしない
+        setting_data.outline_rough = max(1, int(round(self.outline_rough * scale)))
+        setting_data.img_blur_blur = int(round(self.img_blur_blur * scale))
+        return setting_data
+
+
+    def to_dict(self):
+        """ 設定ファイルの1設定分と同じ形式の辞書に変換する関数
+
+            Returns:
+                setting_dict (dict): 設定値の辞書(default.jsonの"default"と同じ形式)
+        """
+        return {
+            "outline" : {"low": self.outline_low, "high": self.outline_high, "rough": self.outline_rough, "blur": self.outline_blur},
+            "img_blur": {"blur": self.img_blur_blur},
+            "contrast": {"low": self.contrast_low, "high": self.contrast_high},
+            "checkbox": {"line": self.checkbox_line_flg, "shadow": self.checkbox_shadow_flg},
+        }
+
+
+    def get_hash(self):
+        """ 設定値のハッシュを取得する関数(変換結果のキャッシュや再開判定のキーに使う)
+
+            Returns:
+                hash (str): 設定値のハッシュ文字列
+        """
+        setting_dict = self.to_dict()
+        # 線ぼかしは変換に使われない(線ぼかしのサイズは粗さを使う)ため、変えてもキャッシュなどを無効にしない
+        del setting_dict["outline"]["blur"]
+        json_str = json.dumps(setting_dict, sort_keys=True)
+        return hashlib.sha1(json_str.encode("utf-8")).hexdigest()
@@ -0,0 +1,194 @@
+#-*- coding:utf-8 -*-
+from setting_data import SettingData
+from line_extraction import LineExtraction
+
+import copy
+from collections import OrderedDict
+
+
+class CancelError(Exception):
+    """ パイプラインの実行が中断されたことを表す例外クラス
+    """
+    pass
+
+
+class Stage():
+    """ パイプラインの1段階(処理内容・入力段階・依存する設定値)を保持するクラス
+    """
+
+    def __init__(self, name, input_name, param_list, func):
+        """ コンストラクタ
+
+            Args:
+                name (str)       : 段階名
+                input_name (str) : 入力となる段階名
+                param_list (list): 結果が依存するSettingDataの属性名のリスト
+                func (function)  : 入力画像を受け取り処理後画像を返す関数
+        """
+        self.name       = name
+        self.input_name = input_name
+        self.param_list = param_list
+        self.func       = func
+
+
+class StagePipeline():
+    """ 途中結果をキャッシュして、設定値が変わった段階以降だけを再計算する線抽出クラス
+
+        LineExtraction.line_extractionと同じ処理を段階ごとに分けて実行する。
+        各段階の結果は「元画像 + 上流の段階が依存する設定値」をキーにしてキャッシュされるため、
+        例えばコントラストのみを変更した場合はぼかしや輪郭線抽出は再計算されない。
+        キャッシュした画像は上書きしないこと。
+    """
+    SOURCE = "source"
+    DEFAULT_MAX_BYTES = 512 * 1024 * 1024 # キャッシュの上限サイズ
+
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        """ コンストラクタ
+
+            Args:
+                max_bytes (int): キャッシュする途中結果の合計サイズの上限(byte)
+        """
+        self.extraction      = LineExtraction() # 各段階の処理に使う画像変換用オブジェクト
+        self.setting_data    = SettingData()
+        self.max_bytes       = max_bytes
+        self.cache           = OrderedDict() # キー → 途中結果の画像(古い順)
+        self.cache_bytes     = 0
+        self.img_id          = 0 # 元画像が差し替えられたことを判定するための番号
+        self.cancel_func     = None # 中断判定の関数(Trueを返したら中断)
+
+        lx = self.extraction
+        self.stage_dict = {}
+        for stage in [
+            Stage("gray",         self.SOURCE,    [],                                               lx.gray_scale),
+            Stage("blur",         "gray",         ["img_blur_blur"],                                lx.img_blur),
+            Stage("outline",      "blur",         ["outline_rough", "outline_high", "outline_low"], lx.outine),
+            Stage("outline_blur", "outline",      ["outline_rough"],                                lx.line_blur),
+            Stage("outline_thr",  "outline_blur", ["outline_low", "outline_high"],                  lx.img_threshold),
+            Stage("shadow_blur",  "blur",         ["img_blur_blur"],                                lx.img_blur),
+            Stage("shadow",       "shadow_blur",  ["outline_low", "outline_high", "contrast_low", "contrast_high"], lx.shadow_threshold),
+        ]:
+            self.stage_dict[stage.name] = stage
+
+
+    def set_image(self, cv2_img):
+        """ 変換する画像を設定する関数(キャッシュはクリアされる)
+
+            Args:
+                cv2_img (img): 変換画像
+        """
+        self.clear()
+        self.img_id = self.img_id + 1
+        self.extraction.set_image(cv2_img)
+
+
+    def set_setting_data(self, setting_data: SettingData):
+        """ 設定値のオブジェクトを設定する関数
+
+            Args:
+                setting_data (SettingData) : 設定値オブジェクト
+        """
+        # 呼び出し元で値を変更されてもキャッシュのキーとずれないようにコピーを保持
+        self.setting_data = copy.copy(setting_data)
+        self.extraction.set_setting_data(self.setting_data)
+
+
+    def set_cancel_func(self, func):
+        """ 中断判定の関数を設定する関数
+
+            Args:
+                func (function): 引数なしでTrueを返したら段階の計算前に中断する関数
+        """
+        self.cancel_func = func
+
+
+    def clear(self):
+        """ キャッシュをクリアする関数
+        """
+        self.cache.clear()
+        self.cache_bytes = 0
+
+
+    def get_key(self, name):
+        """ 段階の結果を識別するキーを取得する関数
+
+            Args:
+                name (str): 段階名
+
+            Returns:
+                key (tuple): 段階名・依存する設定値・上流段階のキーを並べたタプル
+        """
+        if name == self.SOURCE:
+            return (self.SOURCE, self.img_id)
+
+        stage = self.stage_dict[name]
+        param_values = tuple(getattr(self.setting_data, param) for param in stage.param_list)
+        return (name, param_values, self.get_key(stage.input_name))
+
+
+    def get_stage(self, name):
+        """ 段階の結果を取得する関数(キャッシュがなければ上流から計算する)
+
+            Args:
+                name (str): 段階名
+
+            Returns:
+                img (img): 段階の処理結果
+
+            Raises:
+                CancelError: 中断判定の関数がTrueを返した場合
+        """
+        if name == self.SOURCE:
+            return self.extraction.cv2_img
+
+        key = self.get_key(name)
+        if key in self.cache:
+            self.cache.move_to_end(key) # 最近使ったものとして末尾に移動
+            return self.cache[key]
+
+        stage = self.stage_dict[name]
+        input_img = self.get_stage(stage.input_name)
+
+        # 計算済みの段階はキャッシュに残したまま中断する
+        if (self.cancel_func is not None) and self.cancel_func():
+            raise CancelError()
+
+        img = stage.func(input_img)
+        self.add_cache(key, img)
+        return img
+
+
+    def add_cache(self, key, img):
+        """ 途中結果をキャッシュに追加して、上限を超えた分を古い順に削除する関数
+
+            Args:
+                key (tuple): キー
+                img (img)  : 途中結果の画像
+        """
+        if img.nbytes > self.max_bytes:
+            return
+
+        self.cache[key] = img
+        self.cache_bytes = self.cache_bytes + img.nbytes
+
+        while self.cache_bytes > self.max_bytes:
+            _, old_img = self.cache.popitem(last=False)
+            self.cache_bytes = self.cache_bytes - old_img.nbytes
+
+
+    def line_extraction(self):
+        """ 画像を変換する関数(出力に必要な段階だけを計算する)
+
+            Returns:
+                result_img (img): 変換後画像
+        """
+        outline_img = None
+        shadow_img  = None
+
+        if self.setting_data.checkbox_line_flg:
+            outline_img = self.get_stage("outline_thr")
+
+        if self.setting_data.checkbox_shadow_flg:
+            shadow_img = self.get_stage("shadow")
+
+        return self.extraction.merge_img(outline_img, shadow_img)
@@ -0,0 +1,238 @@
+#-*- coding:utf-8 -*-
+from setting_data import SettingData
+from line_extraction import LineExtraction
+from parameter_sweep import ParameterSweep, SWEEP_PARAM_DICT, create_setting_list
+from stage_pipeline import CancelError
+from image_io import write_image
+
+import os, sys
+
+from PySide6.QtWidgets import *
+from PySide6.QtCore import *
+from PySide6.QtGui import *
+
+
+class SweepProcess(QThread):
+    """ 設定値の組み合わせの一覧画像を作成するプロセスクラス
+    """
+    progress_thread = Signal(int, int)
+    error = None
+
+
+    def __init__(self, parent=None):
+        """ コンストラクタ
+        """
+        QThread.__init__(self, parent)
+        self.sweep        = ParameterSweep()
+        self.sweep.set_cancel_func(self.isInterruptionRequested)
+        self.cv2_img      = None
+        self.setting_list = []
+        self.name_list    = []
+        self.sheet_img    = None # 作成した一覧画像
+
+
+    def set_image(self, cv2_img):
+        """ 変換する画像を設定する関数
+
+            Args:
+                cv2_img (img): 変換画像
+        """
+        self.cv2_img = cv2_img
+
+
+    def set_setting_list(self, setting_list, name_list):
+        """ 変換する設定値のリストを設定する関数
+
+            Args:
+                setting_list (list): 設定値オブジェクトのリスト
+                name_list (list)   : 一覧画像に表示するSettingDataの属性名のリスト
+        """
+        self.setting_list = setting_list
+        self.name_list    = name_list
+
+
+    def run(self):
+        """ 一覧画像の作成を実行する関数
+        """
+        self.error = None
+        self.sheet_img = None
+        try:
+            self.sweep.set_image(self.cv2_img)
+            self.sheet_img = self.sweep.create_contact_sheet(self.setting_list, None, self.name_list, self.progress_thread.emit)
+        except CancelError:
+            self.error = "中断しました。"
+        except Exception as e:
+            self.error = str(e)
+
+
+class SweepGui(QDialog):
+    """ 設定値の組み合わせを一覧画像で比較するGUIクラス
+    """
+    TITLE = "設定値の比較"
+    WINDOW_WIDTH  = 800
+    WINDOW_HEIGHT = 640
+    SAVE_FILE_DEFAULT = "./sweep.png"
+    # 入力欄に表示する名前
+    PARAM_LABEL_DICT = {
+        "outline_low"  : "アウトライン下限",
+        "outline_high" : "アウトライン上限",
+        "outline_rough": "粗さ",
+        "img_blur_blur": "ぼかし値",
+        "contrast_low" : "コントラスト下限",
+        "contrast_high": "コントラスト上限",
+    }
+
+
+    def __init__(self, parent=None):
+        """ コンストラクタ
+        """
+        super(SweepGui, self).__init__(parent)
+
+        self.setting_data = SettingData()
+        self.cv2_img      = None
+        self.my_dir_path  = os.path.abspath(os.path.dirname(sys.argv[0]))
+        self.line_extraction = LineExtraction()
+
+        # Widgetsの設定(タイトル、横幅、縦幅)
+        self.setWindowTitle(self.TITLE)
+        self.resize(self.WINDOW_WIDTH, self.WINDOW_HEIGHT)
+
+        # 設定値の入力部分(空欄の場合は現在の設定値のまま)
+        param_layout = QGridLayout()
+        self.param_edit_dict = {}
+        for i, name in enumerate(SWEEP_PARAM_DICT):
+            line_edit = QLineEdit("")
+            line_edit.setPlaceholderText("例: 50 70 90")
+            self.param_edit_dict[name] = line_edit
+            param_layout.addWidget(QLabel(self.PARAM_LABEL_DICT[name] + "(" + SWEEP_PARAM_DICT[name] + "):"), i // 2, (i % 2) * 2)
+            param_layout.addWidget(line_edit, i // 2, (i % 2) * 2 + 1)
+
+        # 一覧画像部分
+        self.img_label = QLabel()
+        self.img_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        scroll_area = QScrollArea()
+        scroll_area.setWidget(self.img_label)
+        scroll_area.setWidgetResizable(True)
+
+        # プログレスバー・ボタン部分
+        btn_layout = QHBoxLayout()
+        self.pb = QProgressBar()
+        self.run_btn = QPushButton("作成")
+        self.run_btn.clicked.connect(self.create_sheet)
+        self.save_btn = QPushButton("保存")
+        self.save_btn.clicked.connect(self.save_img_dialog)
+        self.save_btn.setEnabled(False)
+        btn_layout.addWidget(self.pb, 4)
+        btn_layout.addWidget(self.run_btn, 1)
+        btn_layout.addWidget(self.save_btn, 1)
+
+        # レイアウトを作成して各要素を配置
+        layout = QVBoxLayout()
+        layout.addLayout(param_layout)
+        layout.addSpacing(6)
+        layout.addWidget(scroll_area, 1)
+        layout.addSpacing(6)
+        layout.addLayout(btn_layout)
+        self.setLayout(layout)
+
+        # 一覧画像作成プロセスの準備
+        self.sp = SweepProcess(self)
+        self.sp.progress_thread.connect(self.update_progress)
+        self.sp.finished.connect(self.show_result)
+        self.finished.connect(self.stop_process) # 「×」やEscで閉じた時に中断
+
+
+    def set_image_setting(self, cv2_img, setting_data: SettingData):
+        """ 変換する画像と基準の設定値を設定する関数
+
+            Args:
+                cv2_img (img): 変換画像
+                setting_data (SettingData): 基準の設定値オブジェクト(入力欄が空欄の設定値はこの値を使う)
+        """
+        self.cv2_img = cv2_img
+        self.setting_data = setting_data
+
+
+    def get_param_dict(self):
+        """ 入力欄から比較する設定値を取得する関数
+
+            Returns:
+                param_dict (dict): SettingDataの属性名 → 値のリストの辞書
+
+            Raises:
+                ValueError: 数値以外が入力されていた場合
+        """
+        param_dict = {}
+        for name, line_edit in self.param_edit_dict.items():
+            value_list = [int(value) for value in line_edit.text().replace(",", " ").split()]
+            if len(value_list) > 0:
+                param_dict[name] = value_list
+        return param_dict
+
+
+    def create_sheet(self):
+        """ 一覧画像の作成を開始する関数
+        """
+        try:
+            param_dict = self.get_param_dict()
+        except ValueError:
+            QMessageBox.warning(self, "注意", "数値をスペースかカンマ区切りで入力してください。")
+            return
+
+        if len(param_dict) == 0:
+            QMessageBox.warning(self, "注意", "比較する設定値を1つ以上入力してください。")
+            return
+
+        self.sp.set_image(self.cv2_img)
+        self.sp.set_setting_list(create_setting_list(self.setting_data, param_dict), list(param_dict))
+
+        self.run_btn.setEnabled(False)
+        self.save_btn.setEnabled(False)
+        self.pb.setValue(0)
+        self.sp.start()
+
+
+    def update_progress(self, done_num, total_num):
+        """ プログレスバーを更新する関数
+
+            Args:
+                done_num (int) : 完了件数
+                total_num (int): 全件数
+        """
+        self.pb.setMaximum(total_num)
+        self.pb.setValue(done_num)
+
+
+    def show_result(self):
+        """ 作成した一覧画像を表示する関数
+        """
+        self.run_btn.setEnabled(True)
+        if self.sp.error is not None:
+            if self.isVisible():
+                QMessageBox.warning(self, "注意", "一覧画像の作成に失敗しました。\n\n" + self.sp.error)
+            return
+
+        sheet_img = self.sp.sheet_img
+        self.img_label.setPixmap(self.line_extraction.get_qpixmap(sheet_img, sheet_img.shape[1], sheet_img.shape[0]))
+        self.save_btn.setEnabled(True)
+
+
+    def stop_process(self):
+        """ 一覧画像の作成を中断する関数
+        """
+        if self.sp.isRunning():
+            self.sp.requestInterruption()
+            self.sp.wait()
+
+
+    def save_img_dialog(self):
+        """ 一覧画像を保存する関数
+        """
+        file_path, _ = QFileDialog.getSaveFileName(self, "保存", os.path.join(self.my_dir_path, self.SAVE_FILE_DEFAULT), "PNG (*.png)")
+        if not file_path:
+            return
+
+        try:
+            write_image(self.sp.sheet_img, file_path)
+        except Exception as e:
+            QMessageBox.warning(self, "注意", "保存に失敗しました。\n\n" + str(e))
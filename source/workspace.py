@@ -0,0 +1,49 @@
+#-*- coding:utf-8 -*-
+import numpy as np
+
+
+class Workspace():
+    """ 同じサイズの画像を続けて変換する時に、作業用の配列を使い回すためのクラス
+
+        配列は用途の名前ごとに1つだけ保持し、サイズか型が変わった場合は作り直す。
+        そのため、サイズの違う画像が混ざっていても保持する配列が増え続けることはない。
+        取得した配列は次の画像の変換で上書きされるので、変換後画像として外に渡さないこと。
+    """
+
+    def __init__(self):
+        """ コンストラクタ
+        """
+        self.buffer_dict = {} # 用途の名前 → 作業用の配列
+
+
+    def get(self, name, shape, dtype=np.uint8):
+        """ 作業用の配列を取得する関数(中身は初期化しない)
+
+            Args:
+                name (str)   : 用途の名前
+                shape (tuple): 配列のshape
+                dtype (type) : 配列の型
+
+            Returns:
+                buffer (ndarray): 作業用の配列
+        """
+        buffer = self.buffer_dict.get(name)
+        if (buffer is None) or (buffer.shape != tuple(shape)) or (buffer.dtype != dtype):
+            buffer = np.empty(shape, dtype=dtype)
+            self.buffer_dict[name] = buffer
+        return buffer
+
+
+    def clear(self):
+        """ 保持している配列をすべて解放する関数
+        """
+        self.buffer_dict.clear()
+
+
+    def get_nbytes(self):
+        """ 保持している配列の合計サイズを取得する関数
+
+            Returns:
+                nbytes (int): 合計サイズ(byte)
+        """
+        return sum(buffer.nbytes for buffer in self.buffer_dict.values())
@@ -0,0 +1,70 @@
+#-*- coding:utf-8 -*-
+import os, sys, shutil, tempfile, threading, unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "source"))
+import numpy as np
+from setting_data import load_setting_data
+from image_io import write_image
+from batch_engine import BatchEngine
+
+
+class TestBatchEngineFileListError(unittest.TestCase):
+    """ ファイルリストの取得中に例外が起きた場合に、止まらずに例外を送出することのテスト
+    """
+    TIMEOUT = 60 # 止まったと判定するまでの秒数
+
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.save_path = os.path.join(self.root, "out")
+        os.makedirs(self.save_path)
+        self.img_file = os.path.join(self.root, "a.png")
+        write_image(np.full((40, 60, 3), 200, dtype=np.uint8), self.img_file)
+
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+
+    def iter_raise(self):
+        """ 1件返した後にOSErrorを送出するファイルリスト
+        """
+        yield (self.img_file, "")
+        raise OSError("scan failed")
+
+
+    def run_engine(self, worker_num):
+        """ 別スレッドで一括変換を実行して、(変換結果のリスト, 送出された例外)を返す
+        """
+        engine = BatchEngine(worker_num)
+        ret_dict = {"result_list": [], "error": None}
+
+        def target():
+            try:
+                for result in engine.run(self.iter_raise(), self.save_path, load_setting_data("default"), None, None):
+                    ret_dict["result_list"].append(result)
+            except Exception as e:
+                ret_dict["error"] = e
+
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        thread.join(self.TIMEOUT)
+        self.assertFalse(thread.is_alive(), "batch engine did not finish")
+        return ret_dict["result_list"], ret_dict["error"]
+
+
+    def test_stream_pipeline_raises(self):
+        result_list, error = self.run_engine(1)
+        self.assertIsInstance(error, OSError)
+        # 例外の前に取得できたファイルは変換して返す
+        self.assertEqual([result.error for result in result_list], [None])
+        self.assertTrue(os.path.isfile(os.path.join(self.save_path, "ol_a.png")))
+
+
+    def test_pool_raises(self):
+        _, error = self.run_engine(2)
+        self.assertIsInstance(error, OSError)
+
+
+if __name__ == "__main__":
+    unittest.main()
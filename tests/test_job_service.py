@@ -0,0 +1,98 @@
+#-*- coding:utf-8 -*-
+import os, sys, base64, shutil, asyncio, tempfile, unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "source"))
+import numpy as np
+from image_io import read_image, write_image, decode_image
+from job_service import JobService, submit_jobs
+
+
+class TestJobService(unittest.TestCase):
+    """ ローカルで起動したサービスにジョブを依頼して、応答と保存ファイルを確認するテスト
+    """
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.img_file = os.path.join(self.root, "a.png")
+        img = np.zeros((40, 60, 3), dtype=np.uint8)
+        img[10:30, 20:40] = 255
+        write_image(img, self.img_file)
+
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+
+    def submit(self, request_list, **kwargs):
+        """ 空いているポートでサービスを起動して依頼を送り、(応答のリスト, サービス)を返す
+        """
+        service = JobService(worker_num=1, **kwargs)
+
+        async def run():
+            port = await service.start("127.0.0.1", 0)
+            try:
+                return await asyncio.wait_for(submit_jobs(request_list, "127.0.0.1", port), 60)
+            finally:
+                await service.stop()
+
+        return asyncio.run(run()), service
+
+
+    def test_file_job(self):
+        save_file = os.path.join(self.root, "ol_a.png")
+        response_list, service = self.submit([{"id": "a", "input": self.img_file, "output": save_file, "preset": "default"}])
+
+        self.assertEqual(len(response_list), 1)
+        response = response_list[0]
+        self.assertEqual(response["id"], "a")
+        self.assertEqual(response["status"], "done")
+        self.assertEqual(response["output"], save_file)
+        self.assertEqual((response["width"], response["height"]), (60, 40))
+        self.assertEqual(set(response["time"]), {"queue", "read", "process", "write", "total"})
+        self.assertEqual(read_image(save_file).shape[:2], (40, 60))
+        self.assertEqual((service.done_num, service.error_num), (1, 0))
+
+
+    def test_data_job(self):
+        with open(self.img_file, "rb") as f:
+            data = base64.b64encode(f.read()).decode("ascii")
+        response_list, _ = self.submit([{"data": data, "format": "png_packed"}])
+
+        self.assertEqual(response_list[0]["status"], "done")
+        result_img = decode_image(base64.b64decode(response_list[0]["data"]), True)
+        self.assertEqual(result_img.shape[:2], (40, 60))
+
+
+    def test_invalid_request(self):
+        response_list, service = self.submit([{"id": "x", "preset": "default"}, {"id": "y", "input": self.img_file, "preset": "no_such_preset"}])
+
+        self.assertEqual([(response["id"], response["status"]) for response in response_list], [("x", "error"), ("y", "error")])
+        self.assertEqual(service.error_num, 2)
+
+
+    def test_back_pressure(self):
+        # キューの上限を超えて依頼しても、空くまで待ってすべて変換する
+        request_list = [{"input": self.img_file} for _ in range(6)]
+        response_list, service = self.submit(request_list, concurrency=1, queue_size=1)
+
+        self.assertEqual([response["status"] for response in response_list], ["done"] * 6)
+        self.assertEqual(service.reject_num, 0)
+
+
+    def test_reject_full_queue(self):
+        request_list = [{"input": self.img_file} for _ in range(10)]
+        response_list, service = self.submit(request_list, concurrency=1, queue_size=1, reject_flg=True)
+
+        status_list = [response["status"] for response in response_list]
+        self.assertEqual(len(status_list), 10)
+        self.assertGreater(status_list.count("done"), 0)
+        self.assertGreater(status_list.count("rejected"), 0)
+        self.assertEqual(status_list.count("done") + status_list.count("rejected"), 10)
+        self.assertEqual(service.reject_num, status_list.count("rejected"))
+        for response in response_list:
+            if response["status"] == "rejected":
+                self.assertEqual(response["error"], "queue is full")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,215 @@
+#-*- coding:utf-8 -*-
+import os, sys, time, shutil, tempfile, unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "source"))
+from scanner import FileScanner, ScanThread
+
+
+class TestFileScannerSaveDir(unittest.TestCase):
+    """ 走査と並行して保存フォルダに書き込んでも、保存したファイルを再び変換対象にしないことのテスト
+    """
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        for rel_path in ["a.png", "b.jpg", "sub/c.png", "sub/deep/d.png"]:
+            path = os.path.join(self.root, rel_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(b"\0")
+
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+
+    def scan_and_write(self, save_path):
+        """ 1件見つかるごとに保存フォルダへ変換後のファイルを書き込みながら走査する
+        """
+        scanner = FileScanner()
+        scanner.set_recursive_flg(True)
+        scanner.set_save_dir(save_path)
+        found_list = []
+        for img_file, sub_dir in scanner.scan(self.root):
+            found_list.append(sub_dir + os.path.basename(img_file))
+            os.makedirs(os.path.join(save_path, sub_dir), exist_ok=True)
+            with open(os.path.join(save_path, sub_dir, "ol_" + os.path.splitext(os.path.basename(img_file))[0] + ".png"), "wb") as f:
+                f.write(b"\0")
+        return sorted(found_list)
+
+
+    def test_save_dir_inside_recursive_target(self):
+        save_path = os.path.join(self.root, "out")
+        os.makedirs(save_path)
+        self.assertEqual(self.scan_and_write(save_path), ["a.png", "b.jpg", "sub/c.png", "sub/deep/d.png"])
+        # 2回目も前回の保存ファイルは対象にならない
+        self.assertEqual(self.scan_and_write(save_path), ["a.png", "b.jpg", "sub/c.png", "sub/deep/d.png"])
+
+
+    def test_save_dir_is_target(self):
+        self.assertEqual(self.scan_and_write(self.root), ["a.png", "b.jpg", "sub/c.png", "sub/deep/d.png"])
+
+
+    def test_save_dir_symlink(self):
+        save_path = os.path.join(self.root, "out")
+        os.makedirs(save_path)
+        link_path = os.path.join(tempfile.gettempdir(), "scanner_link_" + str(os.getpid()))
+        os.symlink(save_path, link_path)
+        try:
+            self.assertEqual(self.scan_and_write(link_path), ["a.png", "b.jpg", "sub/c.png", "sub/deep/d.png"])
+        finally:
+            os.remove(link_path)
+
+
+class TestFileScannerFilter(unittest.TestCase):
+    """ 再帰の有無・パターン・サイズ・更新日時による絞り込みと、1件ずつ返す走査のテスト
+    """
+    # 相対パス → ファイルサイズ(byte)
+    FILE_DICT = {
+        "a.png"         : 10,
+        "b.jpg"         : 100,
+        "note.txt"      : 10,
+        "sub/c.png"     : 1000,
+        "sub/deep/d.tif": 100,
+        "skip/e.png"    : 10,
+    }
+
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        for rel_path, size in self.FILE_DICT.items():
+            path = os.path.join(self.root, rel_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(b"\0" * size)
+
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+
+    def scan(self, scanner):
+        """ 走査結果を(相対フォルダ+ファイル名)のソート済みリストで返す
+        """
+        return sorted(sub_dir + os.path.basename(img_file) for img_file, sub_dir in scanner.scan(self.root))
+
+
+    def create_scanner(self, recursive_flg=True):
+        """ 絞り込みなしのFileScannerを作成する
+        """
+        scanner = FileScanner()
+        scanner.set_recursive_flg(recursive_flg)
+        return scanner
+
+
+    def test_not_recursive(self):
+        self.assertEqual(self.scan(self.create_scanner(False)), ["a.png", "b.jpg"])
+
+
+    def test_recursive(self):
+        self.assertEqual(self.scan(self.create_scanner()), ["a.png", "b.jpg", "skip/e.png", "sub/c.png", "sub/deep/d.tif"])
+
+
+    def test_include_pattern(self):
+        scanner = self.create_scanner()
+        scanner.set_pattern(["*.png"], [])
+        self.assertEqual(self.scan(scanner), ["a.png", "skip/e.png", "sub/c.png"])
+        # 相対パスのパターン
+        scanner.set_pattern(["sub/*"], [])
+        self.assertEqual(self.scan(scanner), ["sub/c.png", "sub/deep/d.tif"])
+
+
+    def test_exclude_pattern(self):
+        scanner = self.create_scanner()
+        # フォルダに一致した場合はフォルダごと走査しない
+        scanner.set_pattern([], ["skip", "b.*"])
+        self.assertEqual(self.scan(scanner), ["a.png", "sub/c.png", "sub/deep/d.tif"])
+
+
+    def test_size_range(self):
+        scanner = self.create_scanner()
+        scanner.set_size_range(50, 500)
+        self.assertEqual(self.scan(scanner), ["b.jpg", "sub/deep/d.tif"])
+        scanner.set_size_range(None, 50)
+        self.assertEqual(self.scan(scanner), ["a.png", "skip/e.png"])
+
+
+    def test_mtime_range(self):
+        now = time.time()
+        os.utime(os.path.join(self.root, "a.png"), (now - 3600, now - 3600))
+        os.utime(os.path.join(self.root, "sub/c.png"), (now - 7200, now - 7200))
+        scanner = self.create_scanner()
+        scanner.set_mtime_range(None, now - 1800)
+        self.assertEqual(self.scan(scanner), ["a.png", "sub/c.png"])
+        scanner.set_mtime_range(now - 5400, now - 1800)
+        self.assertEqual(self.scan(scanner), ["a.png"])
+        scanner.set_mtime_range(now - 1800, None)
+        self.assertEqual(self.scan(scanner), ["b.jpg", "skip/e.png", "sub/deep/d.tif"])
+
+
+    def test_stat_only_with_filter(self):
+        def stat_func():
+            raise AssertionError("stat called")
+
+        scanner = self.create_scanner()
+        self.assertTrue(scanner.is_target("a.png", "a.png", stat_func))
+        scanner.set_size_range(1, None)
+        with self.assertRaises(AssertionError):
+            scanner.is_target("a.png", "a.png", stat_func)
+
+
+    def test_lazy_scan(self):
+        scanner = self.create_scanner()
+        file_iter = scanner.scan(self.root)
+        first_file, sub_dir = next(file_iter)
+        # 直下のファイルを返した時点ではサブフォルダはまだ走査していない
+        self.assertEqual(sub_dir, "")
+        with open(os.path.join(self.root, "sub", "late.png"), "wb") as f:
+            f.write(b"\0")
+        rest_list = [sub_dir + os.path.basename(img_file) for img_file, sub_dir in file_iter]
+        self.assertIn("sub/late.png", rest_list)
+        self.assertNotIn(os.path.basename(first_file), rest_list)
+
+
+class TestScanThread(unittest.TestCase):
+    """ 別スレッドでの走査結果の受け渡しと、走査中の例外を取り出し側に送出することのテスト
+    """
+
+    def iter_raise(self):
+        """ 2件返した後にOSErrorを送出するファイルリスト
+        """
+        yield ("a.png", "")
+        yield ("b.png", "")
+        raise OSError("scan failed")
+
+
+    def test_items(self):
+        scan_thread = ScanThread(iter([("a.png", ""), ("b.png", "sub/")]))
+        scan_thread.start()
+        self.assertEqual(list(scan_thread), [("a.png", ""), ("b.png", "sub/")])
+        self.assertTrue(scan_thread.is_done())
+        self.assertEqual(scan_thread.get_found_num(), 2)
+
+
+    def test_error(self):
+        scan_thread = ScanThread(self.iter_raise())
+        scan_thread.start()
+        item_list = []
+        with self.assertRaises(OSError):
+            for item in scan_thread:
+                item_list.append(item)
+        # 例外の前に見つかったファイルは取り出せる
+        self.assertEqual(item_list, [("a.png", ""), ("b.png", "")])
+        self.assertTrue(scan_thread.is_done())
+
+
+    def test_scan_error(self):
+        root = tempfile.mkdtemp()
+        shutil.rmtree(root)
+        scan_thread = ScanThread(FileScanner().scan(root))
+        scan_thread.start()
+        with self.assertRaises(FileNotFoundError):
+            list(scan_thread)
+
+
+if __name__ == "__main__":
+    unittest.main()